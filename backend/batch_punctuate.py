@@ -0,0 +1,425 @@
+import os
+import sys
+import json
+import time
+import types
+import uuid
+
+import metrics
+from cache import atomic_write, file_digest
+from process import process, punctuation_request, openai_client
+from transcript import FORMATS, iter_chunks, iter_text
+
+# Bulk punctuation through the OpenAI Batch API, for large overnight ingests.
+# Instead of one chat.completions call per chunk, every chunk of every transcript becomes a line of a batch
+# request file. The files are uploaded and run by the Batch API (cheaper, no rate-limit juggling), and when
+# they complete the results are matched back to their chunks by custom_id and fed through process(), which
+# tags, writes and indexes them exactly as in a normal run.
+#
+# All progress is kept in <state_dir>/state.json, saved after every step, so an interrupted run picks up
+# where it stopped: chunks already submitted are not submitted again, finished batches are not polled again
+# and transcripts already written are not written again. Chunks that fail are resubmitted in a new batch,
+# up to MAX_ROUNDS times. A transcript that cannot be written is recorded as failed and the others go on.
+#
+# state.json: {"mode", "output_path", "title", "instruction", "model",
+#              "items": [{"path", "digest", "title", "parts", "written", "error"}],
+#              "batches": [{"requests", "count", "file_id", "batch_id", "status", "results", "errors"}]}
+# custom_id of a chunk: "<item index>-<part index>"
+# written: False until done, then True, or why it was not written: "empty" (no text), "changed" (edited since
+# it was prepared) or "failed" (process() raised; the message is in "error")
+#
+# With --local (or MEMORY_FORGE_BATCH_LOCAL=1) a LocalBatchClient that mimics the Batch endpoints on disk is
+# used instead of OpenAI, e.g. to try a run end to end without spending anything.
+#
+# Usage: python batch_punctuate.py run <state_dir> <mode> <output.jsonl> <title or instruction> <transcripts or folders>... [--local]
+#        python batch_punctuate.py resume <state_dir> [--local]
+#        python batch_punctuate.py status <state_dir>
+
+ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# Batch API input limits (requests and bytes per file)
+MAX_REQUESTS = 50000
+MAX_BYTES = 190 * 1024 * 1024
+POLL_SECONDS = 60
+MAX_ROUNDS = 3
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+# --- State ---
+def state_path(state_dir):
+    return os.path.join(state_dir, "state.json")
+
+
+def load_state(state_dir):
+    with open(state_path(state_dir), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state_dir, state):
+    atomic_write(state_path(state_dir), json.dumps(state, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+# Transcripts in the given files and folders (folders are searched recursively), in a stable order
+def collect_transcripts(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, names in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+                found += [os.path.join(dirpath, n) for n in sorted(names)
+                          if not n.startswith(".") and os.path.splitext(n)[1].lower() in FORMATS]
+        else:
+            found.append(path)
+    return list(dict.fromkeys(os.path.abspath(p) for p in found))
+
+
+# Chunks of one transcript, as process() will produce them
+def item_chunks(item):
+    return iter_chunks(iter_text(item["path"]))
+
+
+# --- Prepare ---
+# Writes request files for the chunks of transcripts not written yet (only the custom_ids in todo, if given)
+# Inputs: state_dir (string), state (dict), todo (set of custom_ids or None for all chunks)
+# Output: number of requests written
+def prepare(state_dir, state, todo=None):
+    batch = None
+    size = 0
+    written = 0
+
+    def close():
+        if batch is not None:
+            batch["handle"].close()
+            del batch["handle"]
+
+    for index, item in enumerate(state["items"]):
+        if item["written"]:
+            continue
+        parts = 0
+        for part, chunk in enumerate(item_chunks(item)):
+            parts += 1
+            custom_id = f"{index}-{part}"
+            if todo is not None and custom_id not in todo:
+                continue
+            body = punctuation_request(chunk)
+            if state.get("model"):
+                body["model"] = state["model"]
+            line = json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body},
+                              ensure_ascii=False) + "\n"
+            encoded = line.encode("utf-8")
+            if batch is None or batch["count"] >= MAX_REQUESTS or size + len(encoded) > MAX_BYTES:
+                close()
+                name = f"requests-{len(state['batches']):03d}.jsonl"
+                batch = {"requests": name, "count": 0, "file_id": None, "batch_id": None, "status": "prepared",
+                         "results": None, "errors": None}
+                batch["handle"] = open(os.path.join(state_dir, name), "wb")
+                state["batches"].append(batch)
+                size = 0
+            batch["handle"].write(encoded)
+            batch["count"] += 1
+            size += len(encoded)
+            written += 1
+        item["parts"] = parts
+        if parts == 0:
+            # Nothing to punctuate; without this the item would wait forever for results that never come
+            print(f"Skipping {item['path']}: no transcript text")
+            item["written"] = "empty"
+    close()
+    save_state(state_dir, state)
+    return written
+
+
+# --- Submit ---
+# Uploads request files and creates batches for them; each id is saved as soon as it exists
+def submit(state_dir, state, client):
+    for batch in state["batches"]:
+        if batch["file_id"] is None:
+            with open(os.path.join(state_dir, batch["requests"]), "rb") as f:
+                batch["file_id"] = client.files.create(file=f, purpose="batch").id
+            save_state(state_dir, state)
+        if batch["batch_id"] is None:
+            created = client.batches.create(input_file_id=batch["file_id"], endpoint=ENDPOINT,
+                                            completion_window=COMPLETION_WINDOW)
+            batch["batch_id"] = created.id
+            batch["status"] = created.status
+            save_state(state_dir, state)
+            print(f"Submitted {batch['requests']} ({batch['count']} requests) as {batch['batch_id']}")
+
+
+# --- Poll and download ---
+# Waits until every batch is final and downloads its output and error files
+def wait(state_dir, state, client, poll_seconds=POLL_SECONDS):
+    while True:
+        pending = 0
+        for number, batch in enumerate(state["batches"]):
+            if batch["status"] in FINAL_STATUSES and batch["results"] is not None:
+                continue
+            info = client.batches.retrieve(batch["batch_id"])
+            if info.status != batch["status"]:
+                print(f"{batch['batch_id']}: {info.status}")
+                batch["status"] = info.status
+                save_state(state_dir, state)
+            if info.status not in FINAL_STATUSES:
+                pending += 1
+                continue
+            for field, file_id in (("results", info.output_file_id), ("errors", info.error_file_id)):
+                name = f"{field}-{number:03d}.jsonl"
+                if file_id:
+                    atomic_write(os.path.join(state_dir, name), _file_bytes(client.files.content(file_id)))
+                    batch[field] = name
+                else:
+                    batch[field] = ""
+            save_state(state_dir, state)
+        if pending == 0:
+            return
+        time.sleep(poll_seconds)
+
+
+def _file_bytes(content):
+    if hasattr(content, "read"):
+        return content.read()
+    return content.content if hasattr(content, "content") else bytes(content)
+
+
+# --- Results ---
+# Indexes the successful results of all batches by custom_id without loading them: {custom_id: (file, offset)}
+def index_results(state_dir, state):
+    found = {}
+    for batch in state["batches"]:
+        if not batch["results"]:
+            continue
+        path = os.path.join(state_dir, batch["results"])
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    result = None
+                response = (result or {}).get("response") or {}
+                if response.get("status_code") == 200:
+                    found[result["custom_id"]] = (path, offset)
+                offset += len(line)
+    return found
+
+
+# Reads one result line and returns the punctuated text and its token usage
+def read_result(location):
+    path, offset = location
+    with open(path, "rb") as f:
+        f.seek(offset)
+        body = json.loads(f.readline())["response"]["body"]
+    return body["choices"][0]["message"]["content"].strip(), body.get("usage") or {}
+
+
+# --- Reconcile ---
+# Feeds every transcript whose chunks all have results through process(); returns the custom_ids still missing
+def reconcile(state_dir, state):
+    results = index_results(state_dir, state)
+    missing = set()
+    for index, item in enumerate(state["items"]):
+        if item["written"]:
+            continue
+        ids = [f"{index}-{part}" for part in range(item["parts"])]
+        absent = [custom_id for custom_id in ids if custom_id not in results]
+        if absent:
+            missing.update(absent)
+            continue
+        if file_digest(item["path"]) != item["digest"]:
+            print(f"Skipping {item['path']}: it changed since the batch was prepared")
+            item["written"] = "changed"
+            save_state(state_dir, state)
+            continue
+
+        # process() punctuates the chunks in order; hand it the batch results in the same order
+        punctuated = iter(ids)
+
+        def from_batch(chunk):
+            text, usage = read_result(results[next(punctuated)])
+            metrics.add(tokens_in=usage.get("prompt_tokens", 0), tokens_out=usage.get("completion_tokens", 0))
+            return text
+
+        try:
+            process(item["path"], item["title"], state["instruction"], state["mode"], state["output_path"],
+                    punctuate_fn=from_batch)
+        except Exception as e:
+            # One bad transcript must not block the rest of the run on every resume
+            print(f"Error: {item['path']} could not be written: {e}")
+            item["written"] = "failed"
+            item["error"] = str(e) or type(e).__name__
+            save_state(state_dir, state)
+            continue
+        item["written"] = True
+        save_state(state_dir, state)
+        print(f"Wrote {item['path']} ({item['parts']} parts)")
+    return missing
+
+
+# --- Run ---
+# Prepares (on the first call), submits, waits and reconciles; failed chunks go into a new batch, up to
+# MAX_ROUNDS batches per chunk
+def run(state_dir, client, poll_seconds=POLL_SECONDS):
+    state = load_state(state_dir)
+    if not state["batches"]:
+        count = prepare(state_dir, state)
+        print(f"Prepared {count} requests for {len(state['items'])} transcripts")
+
+    while True:
+        submit(state_dir, state, client)
+        wait(state_dir, state, client, poll_seconds)
+        missing = reconcile(state_dir, state)
+        if not missing:
+            skipped = sum(1 for item in state["items"] if item["written"] is not True)
+            print(f"All transcripts written ({skipped} skipped, see status)" if skipped else "All transcripts written")
+            return state
+        state["rounds"] = state.get("rounds", 1) + 1
+        if state["rounds"] > MAX_ROUNDS:
+            print(f"{len(missing)} chunks still failed after {MAX_ROUNDS} rounds; see the errors-*.jsonl files")
+            save_state(state_dir, state)
+            return state
+        count = prepare(state_dir, state, todo=missing)
+        print(f"Resubmitting {count} failed chunks")
+
+
+# --- New run ---
+# Inputs: state_dir (string, must not hold a run yet), paths (transcripts and/or folders), mode, output_path,
+#         title_or_instruction (title prefix in rag mode, the instruction in sft mode), model (string or None)
+def create(state_dir, paths, mode, output_path, title_or_instruction, model=None):
+    if os.path.exists(state_path(state_dir)):
+        raise RuntimeError(f"{state_dir} already holds a batch run; use resume")
+    os.makedirs(state_dir, exist_ok=True)
+    items = []
+    for path in collect_transcripts(paths):
+        name = os.path.splitext(os.path.basename(path))[0]
+        title = f"{title_or_instruction}: {name}" if mode != "sft" and title_or_instruction else name
+        items.append({"path": path, "digest": file_digest(path), "title": title, "parts": 0, "written": False})
+    if not items:
+        raise RuntimeError("No transcripts found")
+    state = {
+        "mode": mode,
+        "output_path": os.path.abspath(output_path),
+        "title": title_or_instruction if mode != "sft" else "",
+        "instruction": title_or_instruction if mode == "sft" else "",
+        "model": model,
+        "items": items,
+        "batches": [],
+    }
+    save_state(state_dir, state)
+    return state
+
+
+def status(state_dir):
+    state = load_state(state_dir)
+    written = sum(1 for item in state["items"] if item["written"] is True)
+    print(f"{written} of {len(state['items'])} transcripts written to {state['output_path']}")
+    for item in state["items"]:
+        if item["written"] not in (True, False):
+            print(f"  {item['written']}: {item['path']}" + (f" ({item['error']})" if item.get("error") else ""))
+    for batch in state["batches"]:
+        print(f"  {batch['requests']}: {batch['count']} requests, {batch['batch_id'] or 'not submitted'}, {batch['status']}")
+
+
+# --- Local stand-in for the Batch API ---
+# Implements files.create/content and batches.create/retrieve on disk. A batch completes after `polls`
+# retrieve calls; `complete` maps a request body to the reply text (default: echo the transcript part of
+# the prompt) and `fail` decides which custom_ids fail (to exercise resubmission).
+class LocalBatchClient:
+    def __init__(self, directory, complete=None, fail=None, polls=1):
+        self.directory = directory
+        self.complete = complete or _echo_transcript
+        self.fail = fail or (lambda custom_id: False)
+        self.polls = polls
+        os.makedirs(directory, exist_ok=True)
+        self.files = types.SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = types.SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _path(self, object_id):
+        return os.path.join(self.directory, object_id)
+
+    def _create_file(self, file, purpose):
+        file_id = "file-" + uuid.uuid4().hex[:16]
+        atomic_write(self._path(file_id), file.read())
+        return types.SimpleNamespace(id=file_id, purpose=purpose)
+
+    def _file_content(self, file_id):
+        with open(self._path(file_id), "rb") as f:
+            return types.SimpleNamespace(content=f.read())
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        batch = {"id": "batch_" + uuid.uuid4().hex[:16], "input_file_id": input_file_id, "status": "validating",
+                 "polls": 0, "output_file_id": None, "error_file_id": None}
+        self._save_batch(batch)
+        return types.SimpleNamespace(**batch)
+
+    def _save_batch(self, batch):
+        atomic_write(self._path(batch["id"]) + ".json", json.dumps(batch).encode("utf-8"))
+
+    def _retrieve_batch(self, batch_id):
+        with open(self._path(batch_id) + ".json", encoding="utf-8") as f:
+            batch = json.load(f)
+        batch["polls"] += 1
+        if batch["status"] != "completed":
+            batch["status"] = "in_progress"
+            if batch["polls"] >= self.polls:
+                self._run(batch)
+        self._save_batch(batch)
+        return types.SimpleNamespace(**batch)
+
+    def _run(self, batch):
+        outputs, errors = [], []
+        with open(self._path(batch["input_file_id"]), encoding="utf-8") as f:
+            for line in f:
+                request = json.loads(line)
+                if self.fail(request["custom_id"]):
+                    errors.append({"custom_id": request["custom_id"], "response": {"status_code": 500, "body": {}},
+                                   "error": {"code": "server_error", "message": "Simulated failure"}})
+                    continue
+                text = self.complete(request["body"])
+                body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": len(request["body"]["messages"][0]["content"]) // 4,
+                                  "completion_tokens": len(text) // 4}}
+                outputs.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body},
+                                "error": None})
+        for field, records in (("output_file_id", outputs), ("error_file_id", errors)):
+            if records:
+                file_id = "file-" + uuid.uuid4().hex[:16]
+                data = "".join(json.dumps(record) + "\n" for record in records)
+                atomic_write(self._path(file_id), data.encode("utf-8"))
+                batch[field] = file_id
+        batch["status"] = "completed"
+
+
+# The transcript part of a punctuation prompt (what process() would have asked the model to format)
+def _echo_transcript(body):
+    prompt = body["messages"][0]["content"]
+    return prompt.split(":\n\n", 1)[-1].rsplit("\n\nFormatted version:", 1)[0]
+
+
+# --- CLI usage ---
+if __name__ == "__main__":
+    local = "--local" in sys.argv or os.getenv("MEMORY_FORGE_BATCH_LOCAL") == "1"
+    args = [arg for arg in sys.argv[1:] if arg != "--local"]
+    usage = (
+        "Usage: python batch_punctuate.py run <state_dir> <mode> <output.jsonl> <title or instruction> <transcripts or folders>... [--local]\n"
+        "       python batch_punctuate.py resume <state_dir> [--local]\n"
+        "       python batch_punctuate.py status <state_dir>"
+    )
+    if not args or args[0] not in ("run", "resume", "status") or len(args) < (6 if args[0] == "run" else 2):
+        print(usage)
+        sys.exit(1)
+
+    command, state_dir = args[0], args[1]
+    try:
+        if command == "status":
+            status(state_dir)
+            sys.exit(0)
+        if command == "run":
+            create(state_dir, args[5:], args[2], args[3], args[4])
+        elif not os.path.exists(state_path(state_dir)):
+            raise RuntimeError(f"No batch run in {state_dir}")
+        client = LocalBatchClient(os.path.join(state_dir, "local_api"), polls=2) if local else openai_client()
+        with metrics.job("batch_punctuate"):
+            run(state_dir, client, poll_seconds=1 if local else POLL_SECONDS)
+    except (RuntimeError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
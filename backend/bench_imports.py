@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+# Import-time benchmark for the backend entry points.
+# Every spawned backend process pays its import time before doing any work, so this guards against
+# heavy dependencies creeping back into module scope. Each check runs in a fresh interpreter; the time
+# reported is the median over several runs minus the cost of starting an empty interpreter.
+# Exits with status 1 if a check goes over its budget or imports a module it must not.
+#
+# Usage: python bench_imports.py [runs]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY = ["openai", "dotenv", "numpy", "torch", "whisper"]
+
+# (name, code run in a fresh interpreter, modules that must not be imported, budget in ms)
+CHECKS = [
+    ("import tagger", "import tagger", HEAVY, 150),
+    ("import process", "import process", HEAVY, 200),
+    ("import transcribe", "import transcribe", HEAVY, 200),
+    ("import server", "import server", HEAVY, 200),
+    ("process.py usage error", "import runpy, sys; sys.argv = ['process.py']; runpy.run_path('process.py', run_name='__main__')", HEAVY, 250),
+    ("transcribe.py usage error", "import runpy, sys; sys.argv = ['transcribe.py']; runpy.run_path('transcribe.py', run_name='__main__')", HEAVY, 250),
+]
+
+# Appended to each check to report which modules ended up loaded (runs even after sys.exit)
+REPORT = "\nimport atexit, json, sys\natexit.register(lambda: sys.stderr.write('\\n@@MODULES@@' + json.dumps(sorted(sys.modules)) + '\\n'))\n"
+
+
+# Runs `code` in a fresh interpreter inside the backend directory
+# Output: (wall seconds, set of loaded module names)
+def run(code):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", REPORT + code],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("@@MODULES@@"):
+            modules = set(json.loads(line[len("@@MODULES@@"):]))
+    return elapsed, modules
+
+
+def median_ms(code, runs):
+    times = []
+    modules = set()
+    for _ in range(runs):
+        elapsed, modules = run(code)
+        times.append(elapsed * 1000)
+    return statistics.median(times), modules
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    baseline, _ = median_ms("pass", runs)
+    print(f"Empty interpreter: {baseline:.0f} ms (subtracted below)\n")
+
+    failed = False
+    for name, code, forbidden, budget in CHECKS:
+        total, modules = median_ms(code, runs)
+        cost = total - baseline
+        heavy = [m for m in forbidden if m in modules]
+        ok = cost <= budget and not heavy
+        failed |= not ok
+        status = "ok  " if ok else "FAIL"
+        print(f"{status} {name:28s} {cost:7.0f} ms  (budget {budget} ms)")
+        if heavy:
+            print(f"     imported heavy modules: {', '.join(heavy)}")
+
+    sys.exit(1 if failed else 0)
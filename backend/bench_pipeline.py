@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import statistics
+import subprocess
+import tempfile
+
+# Regression benchmark for the offline text pipeline.
+# Runs process() in RAG mode (clean -> punctuate -> chunk -> suggest_tags -> JSONL write -> index sync) over a
+# synthetic Whisper transcript at several sizes and reports chunks/s, MB/s, peak memory and the time spent in
+# each stage. Punctuation is replaced by a local stub (stub_punctuate), so no network or OpenAI key is needed
+# and the time measured is the pipeline's own. The transcript is generated from a fixed seed, so every run
+# sees the same text and must write the same output.
+# Each run happens in a fresh interpreter so peak memory is per run; the numbers kept are medians over the
+# runs. Results are compared with two stored files, and the benchmark exits with status 1 when:
+#   - the output of a size differs from bench_pipeline.baseline.json (chunk count, record count or the
+#     digest of the written JSONL: tags, chunking or dedup changed behaviour). This file does not depend on
+#     the machine and is committed; every run checks it.
+#   - chunks/s drops, or peak memory grows, by more than the threshold (default 20%) compared with the
+#     timings recorded for this machine in bench_pipeline.timings.json (not committed). Without timings for
+#     this machine only the outputs are checked.
+# --update rewrites the baseline with the current outputs (after an intended change) and records this
+# machine's timings.
+#
+# Usage: python bench_pipeline.py [runs] [--sizes MB,MB,...] [--threshold 0.2] [--baseline PATH] [--timings PATH] [--update]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "bench_pipeline.baseline.json")
+DEFAULT_TIMINGS = os.path.join(BACKEND_DIR, "bench_pipeline.timings.json")
+
+# Transcript sizes in MB
+SIZES = [0.1, 0.4, 1.6]
+THRESHOLD = 0.2
+SEED = 1234
+# Bump when the generated transcript changes, so old baselines are not compared with new text
+CORPUS_VERSION = 1
+STAGES = ["clean", "punctuate", "tag", "write", "index"]
+# What the baseline keeps per size; the rest of measure()'s result are timings
+OUTPUT_FIELDS = ["mb", "corpus_sha256", "chunks", "records", "output_sha256"]
+
+# Material for the synthetic transcript: everyday filler plus phrases the tagger has rules for (people,
+# places, school, work, the military, music, emotions), lower-case and unpunctuated like raw Whisper output
+FILLER = [
+    "you know", "like", "i mean", "so", "and then", "basically", "honestly", "i guess", "kind of", "anyway",
+    "and", "but", "because", "right", "okay", "actually", "it was", "there was", "we were", "i was",
+]
+PHRASES = [
+    "my little brother caleb", "my mom was so mad", "my dad worked nights", "we skipped school",
+    "the principal called my parents", "we drove to brooklyn", "back in new york", "my best friend jameson",
+    "basic training at fort benning", "when i was deployed", "my drill sergeant", "i got my first job",
+    "my boss fired me", "we started a band", "i learned to play guitar", "i was really scared",
+    "i felt so proud", "we moved to california", "grandma eileen made dinner", "my girlfriend broke up with me",
+    "the cops showed up", "we got in trouble", "i started college", "i failed the test", "we went camping",
+    "my uncle had a truck", "we went to church every sunday", "i was so angry", "it was the best summer",
+    "i bought my first car", "we lost the game", "the coach yelled at us", "i moved out at eighteen",
+]
+# Made-up words mixed in so chunks differ enough that the near-duplicate check keeps every one of them
+SYLLABLES = ["ka", "lo", "mi", "ten", "ru", "sa", "vel", "do", "pra", "nu", "ex", "bor", "li", "ta", "gen", "os"]
+
+
+# --- Synthetic transcript ---
+# Writes a Whisper-style transcript ("[mm:ss.000 --> mm:ss.000] text" lines) of about `megabytes` MB
+# Inputs: path (string), megabytes (float)
+# Output: sha256 of the written file
+def generate_transcript(path, megabytes):
+    rng = random.Random(f"{SEED}:{CORPUS_VERSION}:{megabytes}")
+    target = int(megabytes * 1024 * 1024)
+    digest = hashlib.sha256()
+    written = 0
+    seconds = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        while written < target:
+            words = []
+            for _ in range(rng.randint(2, 4)):
+                words.append(rng.choice(FILLER))
+                words.append(rng.choice(PHRASES))
+                words.append("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+            length = rng.randint(3, 8)
+            line = (f"[{seconds // 60:02d}:{seconds % 60:02d}.000 --> "
+                    f"{(seconds + length) // 60:02d}:{(seconds + length) % 60:02d}.000] {' '.join(words)}\n")
+            seconds += length
+            f.write(line)
+            digest.update(line.encode("utf-8"))
+            written += len(line.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# --- Punctuation stub ---
+# Stands in for the OpenAI call: capitalises the text into sentences of 8-14 words, so the tagger sees text
+# shaped like the real punctuated output. Deterministic for a given chunk.
+# Input: text (string)
+# Output: punctuated text
+def stub_punctuate(text):
+    words = text.split()
+    rng = random.Random(len(words))
+    sentences = []
+    start = 0
+    while start < len(words):
+        end = start + rng.randint(8, 14)
+        sentence = " ".join(words[start:end])
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+        start = end
+    return " ".join(sentences)
+
+
+# --- One run ---
+# Processes a transcript into a fresh output in work_dir and measures it (runs inside the child interpreter)
+# Inputs: txt_path (string), work_dir (string)
+# Output: dict with seconds, records, peak_rss_mb, per-stage seconds and the output's sha256
+def run_once(txt_path, work_dir):
+    os.environ["MEMORY_FORGE_METRICS"] = os.path.join(work_dir, "metrics.jsonl")
+    import metrics
+    from process import process
+
+    output_path = os.path.join(work_dir, "out.jsonl")
+    start = time.perf_counter()
+    with metrics.job("process", mode="rag", source="bench"):
+        process(txt_path, "Benchmark", "", "rag", output_path, embed=False, punctuate_fn=stub_punctuate)
+    seconds = time.perf_counter() - start
+
+    stages = {}
+    with open(os.environ["MEMORY_FORGE_METRICS"], encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            stages[record["stage"]] = stages.get(record["stage"], 0.0) + record["wall"]
+    with open(output_path, "rb") as f:
+        data = f.read()
+    return {
+        "seconds": seconds,
+        "records": data.count(b"\n"),
+        "peak_rss_mb": metrics.peak_rss_mb(),
+        "stages": {name: round(stages.get(name, 0.0), 4) for name in STAGES},
+        "output_sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+# Runs run_once() in a fresh interpreter inside the backend directory
+def run_child(txt_path, work_dir):
+    code = f"import json, bench_pipeline; print(json.dumps(bench_pipeline.run_once({txt_path!r}, {work_dir!r})))"
+    env = dict(os.environ, MEMORY_FORGE_EMBEDDINGS="0")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# --- Measure one size ---
+# Inputs: megabytes (float), runs (int), tmp_dir (string)
+# Output: dict of medians over the runs, plus chunk and record counts and the output digest (which must
+#         agree between runs)
+def measure(megabytes, runs, tmp_dir):
+    from transcript import iter_chunks, iter_text
+    txt_path = os.path.join(tmp_dir, f"transcript_{megabytes}.txt")
+    corpus_sha256 = generate_transcript(txt_path, megabytes)
+    size_mb = os.path.getsize(txt_path) / (1024 * 1024)
+    chunks = sum(1 for _ in iter_chunks(iter_text(txt_path)))
+
+    results = []
+    for run in range(runs):
+        work_dir = os.path.join(tmp_dir, f"run_{megabytes}_{run}")
+        os.makedirs(work_dir)
+        results.append(run_child(txt_path, work_dir))
+    digests = {result["output_sha256"] for result in results}
+    if len(digests) > 1:
+        raise RuntimeError(f"Output of the {megabytes} MB transcript differs between runs")
+
+    seconds = statistics.median(result["seconds"] for result in results)
+    return {
+        "mb": round(size_mb, 3),
+        "corpus_sha256": corpus_sha256,
+        "chunks": chunks,
+        "records": results[0]["records"],
+        "seconds": round(seconds, 4),
+        "chunks_per_s": round(chunks / seconds, 2),
+        "mb_per_s": round(size_mb / seconds, 4),
+        "peak_rss_mb": statistics.median(result["peak_rss_mb"] or 0 for result in results),
+        "stages": {name: round(statistics.median(result["stages"][name] for result in results), 4) for name in STAGES},
+        "output_sha256": results[0]["output_sha256"],
+    }
+
+
+# --- Compare with the baseline ---
+# Inputs: current (dict from measure()), baseline (its OUTPUT_FIELDS from the baseline file)
+# Output: list of problems (empty if none)
+def output_changes(current, baseline):
+    if current["corpus_sha256"] != baseline["corpus_sha256"]:
+        return ["transcript differs from the baseline's (generator changed); update the baseline"]
+    problems = []
+    if (current["chunks"], current["records"]) != (baseline["chunks"], baseline["records"]):
+        problems.append(f"chunks/records {baseline['chunks']}/{baseline['records']} -> "
+                        f"{current['chunks']}/{current['records']}")
+    if current["output_sha256"] != baseline["output_sha256"]:
+        problems.append("output changed")
+    return problems
+
+
+# Inputs: current (dict from measure()), timings (this machine's recorded result for the size), threshold
+# Output: list of problems (empty if none)
+def timing_regressions(current, timings, threshold):
+    problems = []
+    if current["chunks_per_s"] < timings["chunks_per_s"] * (1 - threshold):
+        problems.append(f"chunks/s {timings['chunks_per_s']:.1f} -> {current['chunks_per_s']:.1f}")
+    if timings["peak_rss_mb"] and current["peak_rss_mb"] > timings["peak_rss_mb"] * (1 + threshold):
+        problems.append(f"peak memory {timings['peak_rss_mb']:.0f} -> {current['peak_rss_mb']:.0f} MB")
+    return problems
+
+
+# Key of this machine in the timings file
+def machine():
+    return f"{platform.node()} {platform.machine()} Python {platform.python_version()}"
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Removes "--name VALUE" from args
+# Output: the value, or default if the flag is absent
+def _pop_option(args, name, default):
+    if name not in args:
+        return default
+    index = args.index(name)
+    if index + 1 >= len(args):
+        print(f"Error: {name} needs a value")
+        sys.exit(1)
+    value = args[index + 1]
+    del args[index:index + 2]
+    return value
+
+
+# --- CLI usage ---
+# python bench_pipeline.py [runs] [--sizes MB,MB,...] [--threshold 0.2] [--baseline PATH] [--timings PATH] [--update]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    try:
+        sizes = [float(size) for size in _pop_option(args, "--sizes", ",".join(map(str, SIZES))).split(",")]
+        threshold = float(_pop_option(args, "--threshold", THRESHOLD))
+        baseline_path = _pop_option(args, "--baseline", DEFAULT_BASELINE)
+        timings_path = _pop_option(args, "--timings", DEFAULT_TIMINGS)
+        update = "--update" in args
+        if update:
+            args.remove("--update")
+        runs = int(args[0]) if args else 3
+    except ValueError:
+        runs = 0
+    if runs < 1 or len(args) > 1 or not all(size > 0 for size in sizes):
+        print("Usage: python bench_pipeline.py [runs] [--sizes MB,MB,...] [--threshold 0.2] [--baseline PATH] "
+              "[--timings PATH] [--update]")
+        sys.exit(1)
+
+    baseline = _load_json(baseline_path)
+    if not baseline and not update:
+        print(f"Error: no baseline at {baseline_path}; run with --update to create one")
+        sys.exit(1)
+    all_timings = _load_json(timings_path)
+    timings = all_timings.get(machine(), {})
+    if not timings and not update:
+        print(f"Note: no timings recorded for {machine()}; only outputs are checked (--update records them)\n")
+
+    print(f"{'size':>7s} {'chunks':>7s} {'seconds':>8s} {'chunks/s':>9s} {'MB/s':>7s} {'peak MB':>8s}  "
+          + " ".join(f"{name:>9s}" for name in STAGES))
+    results = {}
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp_dir:
+        for megabytes in sizes:
+            result = measure(megabytes, runs, tmp_dir)
+            results[str(megabytes)] = result
+            print(f"{result['mb']:5.2f}MB {result['chunks']:7d} {result['seconds']:8.2f} {result['chunks_per_s']:9.1f} "
+                  f"{result['mb_per_s']:7.3f} {result['peak_rss_mb']:8.0f}  "
+                  + " ".join(f"{result['stages'][name]:8.2f}s" for name in STAGES))
+            if update:
+                continue
+
+            expected = baseline.get("sizes", {}).get(str(megabytes))
+            if expected is None:
+                print("        not in the baseline; outputs not checked")
+                continue
+            problems = output_changes(result, expected)
+            summary = "output unchanged" if not problems else ""
+            recorded = timings.get(str(megabytes))
+            if recorded is not None:
+                problems += timing_regressions(result, recorded, threshold)
+                summary += f", {result['chunks_per_s'] / recorded['chunks_per_s'] - 1:+.0%} chunks/s"
+            failed |= bool(problems)
+            status = "FAIL" if problems else "ok  "
+            print(f"        {status} {'; '.join(problems) if problems else summary}")
+
+    if update:
+        # Sizes that were not run keep their entries
+        if baseline.get("corpus_version") != CORPUS_VERSION:
+            baseline = {"corpus_version": CORPUS_VERSION, "sizes": {}}
+        for size, result in results.items():
+            baseline["sizes"][size] = {field: result[field] for field in OUTPUT_FIELDS}
+            timings[size] = {"runs": runs, **{field: value for field, value in result.items() if field not in OUTPUT_FIELDS}}
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        all_timings[machine()] = timings
+        with open(timings_path, "w", encoding="utf-8") as f:
+            json.dump(all_timings, f, indent=2)
+        print(f"\nBaseline written to {baseline_path}, timings for {machine()} to {timings_path}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+
+from cache import SAMPLE_RATE
+from dedup import normalize
+from transcribe import MODEL_SIZE, load_audio, load_model, whisper_options
+
+# Whisper hint benchmark.
+# Transcribes a local reference set with and without the decoding hints transcribe.whisper_options() sets, to
+# show what they are worth:
+#   detect           no hints: Whisper detects the language of every file from its first 30 seconds
+#   language         the language is given, so detection is skipped
+#   language+prompt  the language plus the taxonomy prompt (the names and places the tagger looks for)
+# For each configuration it reports the word error rate against the references, how many of the taxonomy
+# names in the references came out spelled the same way, and the speed as a multiple of real time.
+# The reference set is a directory of audio files, each with a .txt file of the same name holding the
+# correct transcript. Audio is decoded once up front and Whisper runs once before timing starts, so only
+# model.transcribe() is measured; the transcript cache is not used.
+# Word errors are counted with a full edit-distance table per file, so keep the clips to a few minutes each.
+#
+# Usage: python bench_whisper.py <reference_dir> [model] [language] [--json results.json]
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".m4a")
+DEFAULT_LANGUAGE = "en"
+
+
+# --- Reference set ---
+# Input: directory (string)
+# Output: sorted list of (audio path, reference text) for every audio file that has a .txt next to it
+def load_references(directory):
+    pairs = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        reference_path = os.path.join(directory, stem + ".txt")
+        if ext.lower() in AUDIO_EXTENSIONS and os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                pairs.append((os.path.join(directory, name), f.read()))
+    return pairs
+
+
+# --- Word errors ---
+# Substitutions + deletions + insertions needed to turn the reference words into the hypothesis words
+# Inputs: reference, hypothesis (lists of words)
+# Output: int
+def word_errors(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+# --- Name recall ---
+# Inputs: names (list of word tuples), reference, hypothesis (lists of words)
+# Output: (names found in the reference, of those also found in the hypothesis)
+def name_hits(names, reference, hypothesis):
+    def phrases(words):
+        return {tuple(words[i:i + n]) for n in {len(name) for name in names} for i in range(len(words) - n + 1)}
+
+    present = phrases(reference)
+    in_reference = [name for name in names if name in present]
+    found = phrases(hypothesis)
+    return len(in_reference), sum(name in found for name in in_reference)
+
+
+# --- Run one configuration ---
+# Inputs: model, samples (list of (audio, reference words)), options (dict) Whisper options, names (list)
+# Output: dict of totals for the configuration
+def run_config(model, samples, options, names):
+    errors = reference_words = names_total = names_found = 0
+    seconds = 0.0
+    languages = {}
+    for audio, reference in samples:
+        start = time.perf_counter()
+        result = model.transcribe(audio, **options)
+        seconds += time.perf_counter() - start
+
+        hypothesis = normalize(result.get("text", ""))
+        errors += word_errors(reference, hypothesis)
+        reference_words += len(reference)
+        total, found = name_hits(names, reference, hypothesis)
+        names_total += total
+        names_found += found
+        language = result.get("language") or "?"
+        languages[language] = languages.get(language, 0) + 1
+
+    audio_seconds = sum(len(audio) for audio, _ in samples) / SAMPLE_RATE
+    return {
+        "options": {key: value for key, value in options.items() if key != "initial_prompt"},
+        "prompt": "initial_prompt" in options,
+        "wer": errors / reference_words if reference_words else 0.0,
+        "names": names_total,
+        "name_recall": names_found / names_total if names_total else None,
+        "seconds": seconds,
+        "realtime": audio_seconds / seconds if seconds else 0.0,
+        "languages": languages,
+    }
+
+
+# --- CLI usage ---
+# python bench_whisper.py <reference_dir> [model] [language] [--json results.json]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    json_path = None
+    if "--json" in args:
+        index = args.index("--json")
+        if index + 1 >= len(args):
+            print("Error: --json needs a value")
+            sys.exit(1)
+        json_path = args[index + 1]
+        del args[index:index + 2]
+    if not args:
+        print("Usage: python bench_whisper.py <reference_dir> [model] [language] [--json results.json]")
+        sys.exit(1)
+    if not os.path.isdir(args[0]):
+        print(f"Error: reference directory not found: {args[0]}")
+        sys.exit(1)
+
+    model_size = args[1] if len(args) > 1 else MODEL_SIZE
+    language = args[2] if len(args) > 2 else DEFAULT_LANGUAGE
+    pairs = load_references(args[0])
+    if not pairs:
+        print(f"Error: no audio files with a matching .txt reference in {args[0]}")
+        sys.exit(1)
+
+    from tagger import proper_nouns
+    names = [tuple(normalize(name)) for name in proper_nouns()]
+    configs = [
+        ("detect", whisper_options()),
+        ("language", whisper_options(language=language)),
+        ("language+prompt", whisper_options(language=language, initial_prompt="taxonomy")),
+    ]
+
+    print(f"Loading Whisper model {model_size} and decoding {len(pairs)} file(s)...")
+    model = load_model(model_size)
+    samples = [(load_audio(path), normalize(reference)) for path, reference in pairs]
+    audio_minutes = sum(len(audio) for audio, _ in samples) / SAMPLE_RATE / 60
+    # The first call pays one-off setup costs (kernels, caches) that would otherwise count against "detect"
+    model.transcribe(samples[0][0][:30 * SAMPLE_RATE], **configs[0][1])
+
+    print(f"{len(samples)} file(s), {audio_minutes:.1f} min of audio, {sum(len(r) for _, r in samples)} reference words\n")
+    print(f"{'config':16s} {'WER':>7s} {'names':>9s} {'seconds':>9s} {'x realtime':>11s} {'speedup':>8s}  languages")
+    results = {}
+    for name, options in configs:
+        result = run_config(model, samples, options, names)
+        results[name] = result
+        speedup = results["detect"]["seconds"] / result["seconds"] if result["seconds"] else 0.0
+        recall = f"{result['name_recall']:.0%}" if result["name_recall"] is not None else "-"
+        languages = ", ".join(f"{lang}:{count}" for lang, count in sorted(result["languages"].items()))
+        print(f"{name:16s} {result['wer']:7.2%} {recall:>9s} {result['seconds']:9.2f} "
+              f"{result['realtime']:10.1f}x {speedup:7.2f}x  {languages}")
+
+    names_seen = results["detect"]["names"]
+    print(f"\nnames = share of the {names_seen} taxonomy name(s) in the references (once per file) transcribed verbatim")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"model": model_size, "language": language, "files": len(samples),
+                       "audio_minutes": audio_minutes, "results": results}, f, indent=2)
+        print(f"Results written to {json_path}")
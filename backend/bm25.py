@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import regex as re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from corpus import (SEGMENT_RECORDS, iter_records, merge_window, read_records, record_text, save_concatenated,
+                    tail_digest, watermark_valid)
+from writer import file_lock
+
+# Offline BM25 full-text index over the `content` of the corpus records.
+# Like the tag index, it is kept in segments under <corpus>.bm25/ and caught up from a byte watermark,
+# so it can be updated after every process() run. Segments are merged in tiers (corpus.merge_window), and a
+# sync starts a new segment every SEGMENT_RECORDS records. Postings are plain .npy arrays opened with
+# mmap_mode="r": a query only pages in the postings of its own terms, which keeps corpora larger than
+# RAM searchable.
+#
+# Per segment:
+#   seg-NNNNNN.terms.json   term -> [start, count] into the postings arrays
+#   seg-NNNNNN.docs.npy     uint32 ordinal of the record for each posting
+#   seg-NNNNNN.tf.npy       uint16 term frequency for each posting
+#   seg-NNNNNN.lengths.npy  uint32 token count of each record in the segment
+#   seg-NNNNNN.offsets.npy  uint64 byte offset of each record in the segment
+# Ordinals are global (record number in corpus order), so they line up with the tag index.
+
+K1 = 1.2
+B = 0.75
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+# --- Tokenizer ---
+# Input: text (string)
+# Output: list of lowercase word tokens
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    # Inputs: corpus_path (string) JSONL corpus, index_dir (string) defaults to <corpus_path>.bm25
+    def __init__(self, corpus_path, index_dir=None):
+        self.corpus_path = str(corpus_path)
+        self.index_dir = index_dir or self.corpus_path + ".bm25"
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self._manifest = None
+        self._reset_caches()
+
+    def _reset_caches(self):
+        self._arrays = {}
+        self._terms = {}
+        self._lengths = None
+        self._offsets = None
+
+    # --- Manifest ---
+    def _read_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"indexed_bytes": 0, "tail_digest": "", "records": 0, "total_length": 0, "next_segment": 0, "segments": []}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    # Number of indexed records
+    def __len__(self):
+        return self.manifest["records"]
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _load(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self._path(name), mmap_mode="r")
+        return self._arrays[name]
+
+    def _segment_terms(self, segment):
+        name = segment["file"]
+        if name not in self._terms:
+            with open(self._path(name + ".terms.json"), encoding="utf-8") as f:
+                self._terms[name] = json.load(f)
+        return self._terms[name]
+
+    # --- Segments ---
+    # Inputs: postings {term: ([ordinals], [tfs])}, lengths/offsets per record, base ordinal
+    # Output: manifest entry for the new segment
+    def _write_segment(self, manifest, postings, lengths, offsets, base):
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        terms = {}
+        docs = []
+        tfs = []
+        start = 0
+        for term in sorted(postings):
+            term_docs, term_tfs = postings[term]
+            terms[term] = [start, len(term_docs)]
+            docs.append(np.asarray(term_docs, dtype=np.uint32))
+            tfs.append(np.minimum(np.asarray(term_tfs), np.iinfo(np.uint16).max).astype(np.uint16))
+            start += len(term_docs)
+        np.save(self._path(name + ".docs.npy"), np.concatenate(docs) if docs else np.zeros(0, np.uint32))
+        np.save(self._path(name + ".tf.npy"), np.concatenate(tfs) if tfs else np.zeros(0, np.uint16))
+        np.save(self._path(name + ".lengths.npy"), np.asarray(lengths, dtype=np.uint32))
+        np.save(self._path(name + ".offsets.npy"), np.asarray(offsets, dtype=np.uint64))
+        with open(self._path(name + ".terms.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        return {"file": name, "base": base, "count": len(offsets)}
+
+    # Merges the adjacent segments [start, stop) into one, a term at a time: the postings are copied from the
+    # memory-mapped segments straight into the memory-mapped output, so merging needs no more memory than
+    # the term directories
+    # Output: names of the replaced segments
+    def _merge(self, manifest, start, stop):
+        segments = manifest["segments"][start:stop]
+        directories = [self._segment_terms(segment) for segment in segments]
+        total = sum(len(self._load(segment["file"] + ".docs.npy")) for segment in segments)
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+
+        docs = np.lib.format.open_memmap(self._path(name + ".docs.npy"), mode="w+", dtype=np.uint32, shape=(total,))
+        tfs = np.lib.format.open_memmap(self._path(name + ".tf.npy"), mode="w+", dtype=np.uint16, shape=(total,))
+        terms = {}
+        position = 0
+        for term in sorted(set().union(*directories)):
+            first = position
+            for segment, directory in zip(segments, directories):
+                entry = directory.get(term)
+                if entry:
+                    begin, count = entry
+                    docs[position:position + count] = self._load(segment["file"] + ".docs.npy")[begin:begin + count]
+                    tfs[position:position + count] = self._load(segment["file"] + ".tf.npy")[begin:begin + count]
+                    position += count
+            terms[term] = [first, position - first]
+        docs.flush()
+        tfs.flush()
+        del docs, tfs
+
+        for suffix in (".lengths.npy", ".offsets.npy"):
+            save_concatenated(self._path(name + suffix), [self._load(segment["file"] + suffix) for segment in segments])
+        with open(self._path(name + ".terms.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+
+        merged = {"file": name, "base": segments[0]["base"], "count": sum(segment["count"] for segment in segments)}
+        manifest["segments"][start:stop] = [merged]
+        return [segment["file"] for segment in segments]
+
+    def _remove_segment(self, name):
+        for suffix in (".terms.json", ".docs.npy", ".tf.npy", ".lengths.npy", ".offsets.npy"):
+            os.remove(self._path(name + suffix))
+
+    # --- Catch up with the corpus ---
+    # Indexes records appended since the last sync (or rebuilds if the corpus was rewritten).
+    # Output: number of records indexed
+    def sync(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with file_lock(self.manifest_path):
+            manifest = self._read_manifest()
+            stale = []
+            if not watermark_valid(self.corpus_path, manifest["indexed_bytes"], manifest["tail_digest"]):
+                stale = [segment["file"] for segment in manifest["segments"]]
+                manifest.update(indexed_bytes=0, tail_digest="", records=0, total_length=0, segments=[])
+
+            added = 0
+            postings = defaultdict(lambda: ([], []))
+            lengths = []
+            offsets = []
+
+            # Writes the buffered records as a segment, merges if a tier is full and advances the watermark
+            def commit(end):
+                nonlocal postings, lengths, offsets, added
+                if offsets:
+                    base = manifest["records"]
+                    manifest["segments"].append(self._write_segment(manifest, postings, lengths, offsets, base))
+                    manifest["records"] = base + len(offsets)
+                    manifest["total_length"] += int(sum(lengths))
+                    added += len(offsets)
+                    window = merge_window([segment["count"] for segment in manifest["segments"]])
+                    while window:
+                        stale.extend(self._merge(manifest, *window))
+                        window = merge_window([segment["count"] for segment in manifest["segments"]])
+                manifest["indexed_bytes"] = end
+                manifest["tail_digest"] = tail_digest(self.corpus_path, end) if end else ""
+                self._write_manifest(manifest)
+                postings = defaultdict(lambda: ([], []))
+                lengths = []
+                offsets = []
+
+            end = manifest["indexed_bytes"]
+            if os.path.exists(self.corpus_path):
+                for offset, record, end in iter_records(self.corpus_path, manifest["indexed_bytes"]):
+                    ordinal = manifest["records"] + len(offsets)
+                    tokens = tokenize(record_text(record))
+                    for term, tf in Counter(tokens).items():
+                        postings[term][0].append(ordinal)
+                        postings[term][1].append(tf)
+                    lengths.append(len(tokens))
+                    offsets.append(offset)
+                    if len(offsets) >= SEGMENT_RECORDS:
+                        commit(end)
+            commit(end)
+
+            self._reset_caches()
+            for name in stale:
+                self._remove_segment(name)
+
+        self._manifest = manifest
+        return added
+
+    # --- Per-record arrays ---
+    def lengths(self):
+        if self._lengths is None:
+            parts = [self._load(s["file"] + ".lengths.npy") for s in self.manifest["segments"]]
+            self._lengths = np.concatenate(parts) if parts else np.zeros(0, np.uint32)
+        return self._lengths
+
+    # Output: uint64 array mapping record ordinal -> byte offset in the corpus
+    def offsets(self):
+        if self._offsets is None:
+            parts = [self._load(s["file"] + ".offsets.npy") for s in self.manifest["segments"]]
+            self._offsets = np.concatenate(parts) if parts else np.zeros(0, np.uint64)
+        return self._offsets
+
+    # Output: (ordinals, tfs) of one term across all segments
+    def _postings(self, term):
+        docs = []
+        tfs = []
+        for segment in self.manifest["segments"]:
+            entry = self._segment_terms(segment).get(term)
+            if entry:
+                start, count = entry
+                docs.append(self._load(segment["file"] + ".docs.npy")[start:start + count])
+                tfs.append(self._load(segment["file"] + ".tf.npy")[start:start + count])
+        if not docs:
+            return None, None
+        return np.concatenate(docs), np.concatenate(tfs)
+
+    # --- Search ---
+    # Ranks records by BM25 against the query.
+    # Inputs:
+    #   query (string): free text
+    #   k (int): number of results
+    #   tags (string or None): tag expression (see tag_index.TagIndex.query) restricting the candidates
+    # Output: list of (offset, score) sorted by descending score
+    def search(self, query, k=10, tags=None):
+        ordinals, scores = self.search_ordinals(query, k, tags)
+        offsets = self.offsets()[ordinals]
+        return list(zip(offsets.tolist(), scores.tolist()))
+
+    # Same as search() but returns (ordinals, scores) arrays
+    # allowed (sorted ordinals or None) restricts the candidates like tags, for callers that already resolved
+    # the tag expression
+    def search_ordinals(self, query, k=10, tags=None, allowed=None):
+        n = len(self)
+        empty = (np.zeros(0, np.uint32), np.zeros(0, np.float32))
+        if n == 0:
+            return empty
+
+        if allowed is not None and len(allowed) == 0:
+            return empty
+        if tags and allowed is None:
+            from tag_index import TagIndex
+            tag_index = TagIndex(self.corpus_path)
+            tag_index.sync()
+            allowed = tag_index.query_ordinals(tags)
+            if len(allowed) == 0:
+                return empty
+
+        lengths = self.lengths()
+        avgdl = self.manifest["total_length"] / n
+        hit_docs = []
+        hit_scores = []
+        for term in set(tokenize(query)):
+            docs, tfs = self._postings(term)
+            if docs is None:
+                continue
+            # idf uses the unfiltered document frequency so tag filters do not change the ranking scale
+            df = len(docs)
+            if allowed is not None:
+                mask = np.isin(docs, allowed, assume_unique=True)
+                docs, tfs = docs[mask], tfs[mask]
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = K1 * (1 - B + B * lengths[docs] / avgdl)
+            hit_docs.append(docs)
+            hit_scores.append((idf * tf * (K1 + 1) / (tf + norm)).astype(np.float32))
+        if not hit_docs or sum(len(d) for d in hit_docs) == 0:
+            return empty
+
+        # Sum the per-term scores of each record, then take the top k
+        unique_docs, inverse = np.unique(np.concatenate(hit_docs), return_inverse=True)
+        totals = np.zeros(len(unique_docs), dtype=np.float32)
+        np.add.at(totals, inverse, np.concatenate(hit_scores))
+        if len(totals) > k:
+            top = np.argpartition(-totals, k)[:k]
+        else:
+            top = np.arange(len(totals))
+        top = top[np.argsort(-totals[top], kind="stable")]
+        return unique_docs[top].astype(np.uint32), totals[top]
+
+
+# --- CLI usage ---
+# python bm25.py build <corpus.jsonl>
+# python bm25.py search <corpus.jsonl> "<query>" [k] [tag expression]
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "search") or (sys.argv[1] == "search" and len(sys.argv) < 4):
+        print("Usage: python bm25.py build <corpus.jsonl>")
+        print('       python bm25.py search <corpus.jsonl> "<query>" [k] ["<tag expression>"]')
+        sys.exit(1)
+
+    corpus_path = sys.argv[2]
+    if not os.path.exists(corpus_path):
+        print(f"Error: corpus not found: {corpus_path}")
+        sys.exit(1)
+
+    index = BM25Index(corpus_path)
+    added = index.sync()
+    if sys.argv[1] == "build":
+        print(f"Indexed {added} new records ({len(index)} total)")
+        sys.exit(0)
+
+    k = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    tags = sys.argv[5] if len(sys.argv) > 5 else None
+    try:
+        results = index.search(sys.argv[3], k, tags)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    records = read_records(corpus_path, [offset for offset, _ in results])
+    for (offset, score), record in zip(results, records):
+        print(json.dumps({"offset": offset, "score": round(score, 4), **record}, ensure_ascii=False))
@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# On-disk caches for the audio pipeline, so re-running a file (e.g. to change its title, mode or
+# instruction) skips the expensive steps.
+#   transcripts/  Whisper results keyed by audio content hash + model + decoding options, stored in Whisper's
+#                 JSON format ({"text", "segments": [{"start", "end", "text"}], "language"}) so process()
+#                 can read them directly
+#   pcm/          audio decoded to 16 kHz mono samples (.npy), memory-mapped when reused so ffmpeg runs once
+#                 per file. Limited to MEMORY_FORGE_PCM_CACHE_MB (default 2048); the least recently used
+#                 files are evicted first
+# The cache lives in ~/.memory_forge/cache; set MEMORY_FORGE_CACHE to move it, or to "off" to disable it.
+#
+# Usage: python cache.py stats | clear [transcripts|pcm]
+
+# Bump when the stored format or the way results are produced changes, to stop using old entries
+CACHE_VERSION = 1
+HASH_BLOCK = 1 << 20
+
+SAMPLE_RATE = 16000
+PCM_DTYPES = ("float32", "int16")
+# Samples converted per step when building a .npy, so decoding long audio needs little memory
+PCM_BLOCK = 1 << 20
+
+# Content hashes by (path, size, mtime), so a file is hashed once per process
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def cache_root():
+    root = os.getenv("MEMORY_FORGE_CACHE") or os.path.join(os.path.expanduser("~"), ".memory_forge", "cache")
+    return None if root == "off" else root
+
+
+# --- Content hash of a file ---
+# Input: path (string)
+# Output: hex sha256 of the file's bytes
+def file_digest(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    with _digests_lock:
+        _digests[memo_key] = digest.hexdigest()
+    return _digests[memo_key]
+
+
+# --- Cache key ---
+# Input: any JSON-serialisable values that determine the cached result
+# Output: hex sha256 of their canonical JSON form
+def cache_key(**parts):
+    canonical = json.dumps({"version": CACHE_VERSION, **parts}, sort_keys=True, ensure_ascii=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Writes a file via a temporary file and rename, so readers never see a partial entry
+def atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# --- Whisper result to stored transcript ---
+# Keeps only the text, language and segment text/timestamps of a whisper transcribe() result
+def transcript_entry(result):
+    return {
+        "text": result.get("text", ""),
+        "language": result.get("language"),
+        "segments": [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+            for segment in result.get("segments", [])
+        ],
+    }
+
+
+class TranscriptCache:
+    # Input: root (string or None) cache directory, defaults to cache_root()
+    def __init__(self, root=None):
+        root = root or cache_root()
+        self.directory = os.path.join(root, "transcripts") if root else None
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    # Input: audio_path (string), model (string) Whisper model size, options (dict) decoding options
+    # Output: the cache key for that combination
+    def key(self, audio_path, model, options=None):
+        return cache_key(kind="transcript", audio=file_digest(audio_path), model=model, options=options or {})
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    # Output: path of the cached Whisper JSON, or None on a miss (or if the cache is disabled)
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    # Stores a Whisper result (see transcript_entry)
+    # Output: path of the cached Whisper JSON
+    def put(self, key, result):
+        path = self.path(key)
+        atomic_write(path, json.dumps(transcript_entry(result), ensure_ascii=False).encode("utf-8"))
+        return path
+
+
+class PcmCache:
+    # Inputs:
+    #   root (string or None): cache directory, defaults to cache_root()
+    #   dtype (string): "float32" (default) is memory-mapped and handed to Whisper without a copy;
+    #       "int16" halves the disk use but is converted to float32 in memory on every load
+    #   limit_mb (float or None): total size limit, defaults to MEMORY_FORGE_PCM_CACHE_MB or 2048
+    def __init__(self, root=None, dtype=None, limit_mb=None):
+        root = root or cache_root()
+        self.directory = os.path.join(root, "pcm") if root else None
+        self.dtype = dtype or os.getenv("MEMORY_FORGE_PCM_DTYPE") or "float32"
+        if self.dtype not in PCM_DTYPES:
+            raise ValueError(f"Unsupported PCM dtype: {self.dtype} (use {' or '.join(PCM_DTYPES)})")
+        if limit_mb is None:
+            limit_mb = float(os.getenv("MEMORY_FORGE_PCM_CACHE_MB") or 2048)
+        self.limit_bytes = int(limit_mb * 1024 * 1024)
+
+    @property
+    def enabled(self):
+        return self.directory is not None and self.limit_bytes > 0
+
+    def key(self, audio_path):
+        return cache_key(kind="pcm", audio=file_digest(audio_path), sample_rate=SAMPLE_RATE, dtype=self.dtype)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    # --- Lookup ---
+    # Output: float32 samples (a copy-on-write memory map for float32 entries), or None on a miss
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            samples = self._load(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Recently used entries are evicted last
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return samples
+
+    # Maps a .npy entry as float32 samples
+    def _load(self, path):
+        import numpy as np
+        samples = np.load(path, mmap_mode="c")
+        if samples.dtype == np.int16:
+            return samples.astype(np.float32) / 32768.0
+        return samples
+
+    # --- Store ---
+    # Builds the .npy from raw little-endian 16-bit PCM (as ffmpeg writes it) block by block, then evicts
+    # old entries to stay under the size limit. The new entry is never evicted here, and it is mapped before
+    # eviction runs, so the samples stay readable even if another job removes the file afterwards.
+    # Inputs: key (string), raw_path (string) file of s16le samples
+    # Output: float32 samples of the new entry (as get() returns them)
+    def put_raw(self, key, raw_path):
+        import numpy as np
+        os.makedirs(self.directory, exist_ok=True)
+        count = os.path.getsize(raw_path) // 2
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy.tmp")
+        os.close(fd)
+        try:
+            target = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(count,))
+            raw = np.memmap(raw_path, dtype="<i2", mode="r", shape=(count,)) if count else np.zeros(0, "<i2")
+            for start in range(0, count, PCM_BLOCK):
+                block = raw[start:start + PCM_BLOCK]
+                target[start:start + len(block)] = block / 32768.0 if self.dtype == "float32" else block
+            target.flush()
+            del target, raw
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        samples = self._load(self.path(key))
+        self.evict(keep=key)
+        return samples
+
+    # --- Eviction ---
+    # Removes least recently used entries until the cache fits in the limit
+    # Input: keep (string or None) key of an entry that must stay, e.g. the one just written (even if it is
+    #   larger than the whole limit)
+    def evict(self, keep=None):
+        keep_name = keep + ".npy" if keep else None
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.limit_bytes:
+                break
+            if os.path.basename(path) == keep_name:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Already gone, or (on Windows) still mapped by a running job
+                continue
+            total -= size
+
+
+# Number of files and bytes under a directory
+def _usage(directory):
+    files = 0
+    size = 0
+    for dirpath, _, names in os.walk(directory):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, name))
+    return files, size
+
+
+# --- CLI usage ---
+# python cache.py stats | clear [transcripts|pcm]
+if __name__ == "__main__":
+    root = cache_root()
+    if len(sys.argv) < 2 or sys.argv[1] not in ("stats", "clear") or root is None:
+        print("Usage: python cache.py stats | clear [transcripts|pcm]  (cache must not be off)")
+        sys.exit(1)
+
+    kinds = sys.argv[2:] or ["transcripts", "pcm"]
+    for kind in kinds:
+        directory = os.path.join(root, kind)
+        if not os.path.isdir(directory):
+            print(f"{kind}: empty")
+            continue
+        if sys.argv[1] == "clear":
+            shutil.rmtree(directory)
+            print(f"{kind}: cleared")
+        else:
+            files, size = _usage(directory)
+            print(f"{kind}: {files} files, {size / (1024 * 1024):.1f} MB in {directory}")
@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+
+# Helpers for reading the JSONL corpus that JsonlWriter produces.
+# Records are addressed by the byte offset at which their line starts, which is what
+# JsonlWriter.flush() returns and what the sidecar indexes store.
+
+# Number of bytes before an index's watermark that are fingerprinted to detect rewrites
+TAIL_BYTES = 256
+
+
+# --- Iterate records ---
+# Streams the records of a JSONL file starting at byte offset `start`.
+# Blank lines and torn (unparseable) lines are skipped.
+# Inputs: path (string), start (int) byte offset to begin at (must be the start of a line)
+# Output: yields (offset, record, end) tuples, where end is the offset of the next line
+def iter_records(path, start=0):
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            end = offset + len(line)
+            if line.endswith(b"\n") and line.strip():
+                try:
+                    yield offset, json.loads(line), end
+                except ValueError:
+                    pass
+            elif not line.endswith(b"\n"):
+                # Partial last line (a writer is mid-commit); stop before it
+                break
+            offset = end
+
+
+# --- Read records by offset ---
+# Seeks directly to each offset and parses the line found there
+# Inputs: path (string), offsets (iterable of ints)
+# Output: list of records in the same order as offsets
+def read_records(path, offsets):
+    records = []
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(int(offset))
+            records.append(json.loads(f.readline()))
+    return records
+
+
+# --- Record text ---
+# The text a record is about: content for RAG chunks, instruction + response for SFT examples
+# Input: record (dict)
+# Output: string
+def record_text(record):
+    if "content" in record:
+        return record["content"]
+    return f"{record.get('instruction', '')}\n{record.get('response', '')}"
+
+
+# --- Watermarks ---
+# Sidecar indexes remember how far into the corpus they have indexed (`indexed_bytes`) together with a
+# digest of the bytes just before that point. If the corpus is later compacted or replaced, the digest no
+# longer matches and the index knows to rebuild instead of catching up from the watermark.
+
+# Digest of the TAIL_BYTES bytes that end at `end`
+def tail_digest(path, end):
+    start = max(0, end - TAIL_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(end - start)).hexdigest()
+
+
+# Returns True if the corpus still contains, unchanged, everything up to the stored watermark
+# Inputs: path (string), indexed_bytes (int), digest (string or None)
+def watermark_valid(path, indexed_bytes, digest):
+    if not os.path.exists(path):
+        return indexed_bytes == 0
+    if os.path.getsize(path) < indexed_bytes:
+        return False
+    if indexed_bytes == 0:
+        return True
+    return tail_digest(path, indexed_bytes) == digest
+
+
+# --- Segment merging ---
+# The tag and BM25 indexes add a segment per sync and merge adjacent segments by size, so the segments stay
+# in corpus order. A segment's tier is the number of digits its record count has in base MERGE_FACTOR.
+# The segments are split into groups, oldest first: each group runs up to the last segment of the highest
+# tier left, so it is made of one tier's segments plus the smaller ones between them. A group of
+# MERGE_FACTOR or more segments merges its oldest MERGE_FACTOR. That keeps fewer than MERGE_FACTOR segments
+# per tier, and a record is rewritten about once per tier it climbs (logarithmic in the corpus size) rather
+# than on every merge.
+MERGE_FACTOR = 8
+# Records per segment while a sync indexes a long stretch of the corpus (e.g. the first build), which
+# bounds the memory a sync needs
+SEGMENT_RECORDS = 100000
+
+
+def _tier(count):
+    tier = 0
+    while count >= MERGE_FACTOR:
+        count //= MERGE_FACTOR
+        tier += 1
+    return tier
+
+
+# Input: counts (list of ints) record count of each segment, in corpus order
+# Output: (start, stop) of the segments to merge next, or None if nothing needs merging
+def merge_window(counts):
+    tiers = [_tier(count) for count in counts]
+    start = 0
+    while start < len(tiers):
+        top = max(tiers[start:])
+        stop = len(tiers) - tiers[::-1].index(top)
+        if stop - start >= MERGE_FACTOR:
+            return start, start + MERGE_FACTOR
+        start = stop
+    return None
+
+
+# Writes the concatenation of 1-D arrays (e.g. memory-mapped segment arrays) to a .npy file, copying one
+# array at a time instead of building the result in memory
+# Inputs: path (string), parts (non-empty list of arrays of one dtype)
+def save_concatenated(path, parts):
+    import numpy as np
+
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=parts[0].dtype, shape=(sum(len(part) for part in parts),))
+    position = 0
+    for part in parts:
+        out[position:position + len(part)] = part
+        position += len(part)
+    out.flush()
@@ -0,0 +1,225 @@
+import os
+import hashlib
+import sqlite3
+import regex as re
+
+from corpus import iter_records, record_text, tail_digest, watermark_valid
+
+# Deduplication index for the JSONL corpus.
+# A SQLite sidecar (<corpus>.dedup.sqlite) stores, for every record in the corpus, a SHA-256 of its
+# normalized text and a 64-bit SimHash fingerprint. JsonlWriter consults it before appending so that
+# re-running the app on the same file does not grow the corpus. Exact hashes alone are not enough
+# because punctuate() samples at temperature 0.7 and rarely returns byte-identical text twice.
+
+# Two fingerprints within this many differing bits are treated as the same memory
+NEAR_DUPLICATE_DISTANCE = 3
+# The 64-bit SimHash is split into 16-bit bands for candidate lookup. Fingerprints within 3 bits of each
+# other must agree on at least one of the 4 bands (pigeonhole), so band equality finds every candidate.
+BANDS = 4
+BAND_BITS = 16
+# Words per shingle fed into the SimHash
+SHINGLE_SIZE = 3
+
+WORD_RE = re.compile(r"\w+")
+
+
+# --- Normalize text ---
+# Lowercases and drops punctuation/whitespace differences so formatting noise does not defeat hashing
+# Input: text (string)
+# Output: list of words
+def normalize(text):
+    return WORD_RE.findall(text.lower())
+
+
+# --- Content hash ---
+# Input: words (list of strings) from normalize()
+# Output: hex SHA-256 of the normalized text
+def content_hash(words):
+    return hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+
+
+# --- SimHash ---
+# Computes a 64-bit SimHash over word shingles; similar texts get fingerprints with a small Hamming distance
+# Input: words (list of strings) from normalize()
+# Output: unsigned 64-bit integer
+def simhash(words):
+    if len(words) < SHINGLE_SIZE:
+        shingles = words
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += 1
+            else:
+                weights[bit] -= 1
+
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+# --- Fingerprint a record ---
+# Output: (content_hash, simhash) for the record's text
+def fingerprint(record):
+    words = normalize(record_text(record))
+    return content_hash(words), simhash(words)
+
+
+# SQLite integers are signed 64-bit
+def _to_signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def _bands(value):
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+# --- Deduplication index ---
+# Inputs:
+#   corpus_path (string): the JSONL corpus the index describes
+#   on_duplicate (string): "skip" drops the new record, "replace" removes the old record and keeps the new one
+#   max_distance (int): maximum SimHash Hamming distance considered a near-duplicate
+#   index_path (string): SQLite file, defaults to <corpus_path>.dedup.sqlite
+# All methods expect the caller to hold the corpus file lock (JsonlWriter does this).
+class DedupIndex:
+    def __init__(self, corpus_path, on_duplicate="skip", max_distance=NEAR_DUPLICATE_DISTANCE, index_path=None):
+        if on_duplicate not in ("skip", "replace"):
+            raise ValueError(f"on_duplicate must be 'skip' or 'replace', got {on_duplicate!r}")
+        self.corpus_path = str(corpus_path)
+        self.on_duplicate = on_duplicate
+        self.max_distance = max_distance
+        self.index_path = index_path or self.corpus_path + ".dedup.sqlite"
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                offset INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                simhash INTEGER NOT NULL,
+                b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS records_offset ON records(offset);
+            CREATE INDEX IF NOT EXISTS records_hash ON records(content_hash);
+            CREATE INDEX IF NOT EXISTS records_b0 ON records(b0);
+            CREATE INDEX IF NOT EXISTS records_b1 ON records(b1);
+            CREATE INDEX IF NOT EXISTS records_b2 ON records(b2);
+            CREATE INDEX IF NOT EXISTS records_b3 ON records(b3);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # --- Catch up with the corpus ---
+    # Indexes any records appended since the last watermark (e.g. by writers that did not use dedup),
+    # or rebuilds from scratch if the corpus was rewritten underneath the index.
+    def sync(self):
+        indexed = int(self._get_meta("indexed_bytes", 0))
+        if not watermark_valid(self.corpus_path, indexed, self._get_meta("tail_digest")):
+            self.conn.execute("DELETE FROM records")
+            indexed = 0
+        if not os.path.exists(self.corpus_path):
+            return
+
+        end = indexed
+        for offset, record, end in iter_records(self.corpus_path, indexed):
+            self._insert(offset, fingerprint(record))
+        self.mark(end)
+
+    # Record that everything up to byte `end` of the corpus is indexed
+    def mark(self, end):
+        self._set_meta("indexed_bytes", end)
+        self._set_meta("tail_digest", tail_digest(self.corpus_path, end) if end else "")
+        self.conn.commit()
+
+    def _insert(self, offset, fp):
+        digest, value = fp
+        self.conn.execute(
+            "INSERT INTO records (offset, content_hash, simhash, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (offset, digest, _to_signed(value), *_bands(value)),
+        )
+
+    # --- Look up a duplicate ---
+    # Input: fp (content_hash, simhash) tuple
+    # Output: offset of an existing exact or near-duplicate record, or None
+    def lookup(self, fp):
+        digest, value = fp
+        row = self.conn.execute("SELECT offset FROM records WHERE content_hash = ? LIMIT 1", (digest,)).fetchone()
+        if row:
+            return row[0]
+        b = _bands(value)
+        rows = self.conn.execute(
+            "SELECT offset, simhash FROM records WHERE b0 = ? OR b1 = ? OR b2 = ? OR b3 = ?", b
+        )
+        for offset, other in rows:
+            if bin(value ^ _to_unsigned(other)).count("1") <= self.max_distance:
+                return offset
+        return None
+
+    # --- Filter a batch ---
+    # Decides which records of a batch should be written, also catching duplicates inside the batch itself
+    # Input: records (list of dicts)
+    # Output: (keep, fingerprints, replaced) where keep is a list of booleans aligned with records,
+    #         fingerprints the per-record fingerprints, and replaced the corpus offsets to remove ("replace" mode)
+    def filter(self, records):
+        fps = [fingerprint(record) for record in records]
+        keep = []
+        replaced = set()
+        for i, fp in enumerate(fps):
+            existing = self.lookup(fp)
+            earlier = next((j for j in range(i) if keep[j] and _same(fps[j], fp, self.max_distance)), None)
+            if existing is None and earlier is None:
+                keep.append(True)
+            elif self.on_duplicate == "replace":
+                if existing is not None:
+                    replaced.add(existing)
+                if earlier is not None:
+                    keep[earlier] = False
+                keep.append(True)
+            else:
+                keep.append(False)
+        return keep, fps, sorted(replaced)
+
+    # Adds freshly appended records to the index
+    # Inputs: offsets (list of ints), fps (matching fingerprints)
+    def add(self, offsets, fps):
+        for offset, fp in zip(offsets, fps):
+            self._insert(offset, fp)
+
+    # --- Account for removed lines ---
+    # After the writer compacts the corpus, drop the removed records and shift the offsets of later ones
+    # Input: removed (list of (offset, length) tuples)
+    def remove(self, removed):
+        for offset, length in sorted(removed, reverse=True):
+            self.conn.execute("DELETE FROM records WHERE offset = ?", (offset,))
+            self.conn.execute("UPDATE records SET offset = offset - ? WHERE offset > ?", (length, offset))
+
+
+def _same(a, b, max_distance):
+    return a[0] == b[0] or bin(a[1] ^ b[1]).count("1") <= max_distance
@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+from corpus import iter_records, read_records, record_text, tail_digest, watermark_valid
+from writer import file_lock
+
+# Local embeddings and approximate nearest-neighbour search for the corpus.
+# Records are embedded in batches with a CPU-only sentence-transformers model and appended to raw,
+# memory-mapped arrays under <corpus>.vectors/, one row per record in corpus order (the record's ordinal,
+# same numbering as the tag and BM25 indexes):
+#   manifest.json   watermark, model, dim, dtype, record count
+#   vectors.bin     float16 rows, or int8 rows when dtype is "int8"
+#   scales.bin      float32 per-row scale (int8 only)
+#   offsets.bin     uint64 byte offset of each record in the corpus
+#   ivf.npz         IVF coarse quantizer: centroids + records grouped by nearest centroid
+# Vectors are L2-normalized, so a dot product is the cosine similarity.
+# sentence-transformers is optional: pip install sentence-transformers
+
+DEFAULT_MODEL = os.getenv("MEMORY_FORGE_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+BATCH_SIZE = 64
+# Records embedded per append to disk during sync()
+SYNC_BATCH = 1024
+# Build the IVF once there are this many vectors; below it brute force is faster anyway
+IVF_MIN_RECORDS = 4096
+# Rebuild the IVF when more than this fraction of vectors were added after it was built
+IVF_REBUILD_FRACTION = 0.5
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+
+_models = {}
+
+
+# --- Load the embedding model ---
+# Loads (once per process) a sentence-transformers model on the CPU
+# Input: model_name (string)
+# Output: model with an encode() method
+def load_model(model_name=DEFAULT_MODEL):
+    if model_name not in _models:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError("Embeddings need the 'sentence-transformers' package: pip install sentence-transformers")
+        _models[model_name] = SentenceTransformer(model_name, device="cpu")
+    return _models[model_name]
+
+
+# --- Embed texts ---
+# Inputs: texts (list of strings), model_name (string), batch_size (int)
+# Output: float32 array of shape (len(texts), dim), rows L2-normalized
+def embed_texts(texts, model_name=DEFAULT_MODEL, batch_size=BATCH_SIZE):
+    model = load_model(model_name)
+    vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    # Inputs:
+    #   corpus_path (string): JSONL corpus
+    #   model_name (string): sentence-transformers model used for records and queries
+    #   dtype (string): "float16" or "int8" storage (only used when the index is created)
+    #   embed_fn (callable or None): replaces embed_texts(texts) -> float32 array, e.g. for offline benchmarks
+    #   index_dir (string): defaults to <corpus_path>.vectors
+    def __init__(self, corpus_path, model_name=DEFAULT_MODEL, dtype="float16", embed_fn=None, index_dir=None):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"dtype must be 'float16' or 'int8', got {dtype!r}")
+        self.corpus_path = str(corpus_path)
+        self.model_name = model_name
+        self.dtype = dtype
+        self.embed_fn = embed_fn or (lambda texts: embed_texts(texts, model_name))
+        self.index_dir = index_dir or self.corpus_path + ".vectors"
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self._manifest = None
+        self._ivf = None
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    # --- Manifest ---
+    def _read_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"indexed_bytes": 0, "tail_digest": "", "records": 0, "dim": None,
+                "model": self.model_name, "dtype": self.dtype, "ivf_records": 0}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    def __len__(self):
+        return self.manifest["records"]
+
+    # --- Storage ---
+    # Truncates the data files to `records` rows (drops anything a crashed sync left behind)
+    def _truncate(self, manifest):
+        n = manifest["records"]
+        dim = manifest["dim"] or 0
+        itemsize = 1 if manifest["dtype"] == "int8" else 2
+        for name, row_bytes in (("vectors.bin", dim * itemsize), ("scales.bin", 4), ("offsets.bin", 8)):
+            path = self._path(name)
+            if os.path.exists(path):
+                with open(path, "r+b") as f:
+                    f.truncate(n * row_bytes)
+
+    # Appends normalized float32 vectors and their corpus offsets
+    def _append(self, manifest, vectors, offsets):
+        if manifest["dtype"] == "int8":
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            rows = np.round(vectors / scales[:, None]).astype(np.int8)
+            with open(self._path("scales.bin"), "ab") as f:
+                f.write(scales.astype(np.float32).tobytes())
+        else:
+            rows = vectors.astype(np.float16)
+        with open(self._path("vectors.bin"), "ab") as f:
+            f.write(rows.tobytes())
+        with open(self._path("offsets.bin"), "ab") as f:
+            f.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+        manifest["records"] += len(offsets)
+
+    # Memory-mapped (records, dim) storage array
+    def vectors(self):
+        n, dim = len(self), self.manifest["dim"]
+        if not n:
+            return np.zeros((0, dim or 0), dtype=np.float32)
+        dtype = np.int8 if self.manifest["dtype"] == "int8" else np.float16
+        return np.memmap(self._path("vectors.bin"), dtype=dtype, mode="r", shape=(n, dim))
+
+    def scales(self):
+        return np.memmap(self._path("scales.bin"), dtype=np.float32, mode="r", shape=(len(self),))
+
+    # Output: uint64 array mapping record ordinal -> byte offset in the corpus
+    def offsets(self):
+        if not len(self):
+            return np.zeros(0, np.uint64)
+        return np.memmap(self._path("offsets.bin"), dtype=np.uint64, mode="r", shape=(len(self),))
+
+    # Dot products of `query` (float32, normalized) with the rows `ordinals` (all rows if None)
+    def _scores(self, query, ordinals=None):
+        rows = self.vectors() if ordinals is None else self.vectors()[ordinals]
+        scores = rows.astype(np.float32) @ query
+        if self.manifest["dtype"] == "int8":
+            scales = self.scales() if ordinals is None else self.scales()[ordinals]
+            scores *= scales
+        return scores
+
+    # Why the index cannot be used with this model, or None if it can
+    # Inputs: manifest (dict), dim (int or None) dimension of the model's vectors, if known
+    def mismatch(self, manifest, dim=None):
+        if not manifest["records"]:
+            return None
+        if manifest["model"] != self.model_name:
+            return f"vector index was built with model {manifest['model']}, not {self.model_name}"
+        if dim is not None and dim != manifest["dim"]:
+            return f"vector index has {manifest['dim']}-dimensional vectors, the model produces {dim}"
+        return None
+
+    # --- Catch up with the corpus ---
+    # Embeds records appended since the last sync in batches and appends them to the index.
+    # An index built with another model (or one producing vectors of another size) is rebuilt from scratch.
+    # Output: number of records embedded
+    def sync(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with file_lock(self.manifest_path):
+            manifest = self._read_manifest()
+            dim = None
+            if manifest["records"] and manifest["model"] == self.model_name:
+                # embed_fn may wrap a different model than the name says; one short text tells its size
+                dim = int(np.asarray(self.embed_fn(["dimension check"]), dtype=np.float32).shape[1])
+            rebuild = self.mismatch(manifest, dim) is not None
+            if rebuild:
+                manifest.update(dim=None, model=self.model_name)
+            if rebuild or not watermark_valid(self.corpus_path, manifest["indexed_bytes"], manifest["tail_digest"]):
+                manifest.update(indexed_bytes=0, tail_digest="", records=0, ivf_records=0)
+                if os.path.exists(self._path("ivf.npz")):
+                    os.remove(self._path("ivf.npz"))
+            self._truncate(manifest)
+
+            added = 0
+            if os.path.exists(self.corpus_path):
+                texts, offsets, end = [], [], manifest["indexed_bytes"]
+                for offset, record, record_end in iter_records(self.corpus_path, manifest["indexed_bytes"]):
+                    texts.append(record_text(record))
+                    offsets.append(offset)
+                    if len(texts) >= SYNC_BATCH:
+                        added += self._commit(manifest, texts, offsets, record_end)
+                        texts, offsets = [], []
+                    end = record_end
+                if texts:
+                    added += self._commit(manifest, texts, offsets, end)
+
+            self._manifest = manifest
+            self._ivf = None
+            n = manifest["records"]
+            if n >= IVF_MIN_RECORDS and n - manifest["ivf_records"] > IVF_REBUILD_FRACTION * manifest["ivf_records"]:
+                self.build_ivf()
+                manifest["ivf_records"] = n
+                self._write_manifest(manifest)
+        return added
+
+    # Embeds one batch, appends it and advances the watermark to `end`
+    def _commit(self, manifest, texts, offsets, end):
+        vectors = _normalize(np.asarray(self.embed_fn(texts), dtype=np.float32))
+        if manifest["dim"] is None:
+            manifest["dim"] = int(vectors.shape[1])
+        self._append(manifest, vectors, offsets)
+        manifest["indexed_bytes"] = end
+        manifest["tail_digest"] = tail_digest(self.corpus_path, end)
+        self._write_manifest(manifest)
+        return len(offsets)
+
+    # --- IVF ---
+    # Clusters the vectors with spherical k-means and stores, per cluster, the ordinals assigned to it
+    # Input: nlist (int or None) number of clusters, defaults to ~4*sqrt(records)
+    def build_ivf(self, nlist=None):
+        n = len(self)
+        nlist = nlist or max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(n, size=min(n, KMEANS_SAMPLE), replace=False))
+        sample = self._dense(sample_ids)
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=len(centroids)) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        # Assign every vector in blocks to bound memory
+        assignment = np.empty(n, dtype=np.int32)
+        for start in range(0, n, KMEANS_SAMPLE):
+            ids = np.arange(start, min(n, start + KMEANS_SAMPLE))
+            assignment[ids] = np.argmax(self._dense(ids) @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable").astype(np.uint32)
+        list_starts = np.searchsorted(assignment[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        np.savez(self._path("ivf.npz"), centroids=centroids.astype(np.float32), order=order, starts=list_starts)
+        self._ivf = None
+
+    # float32 copies of the given rows (int8 rows rescaled)
+    def _dense(self, ordinals):
+        rows = self.vectors()[ordinals].astype(np.float32)
+        if self.manifest["dtype"] == "int8":
+            rows *= self.scales()[ordinals][:, None]
+        return rows
+
+    def _load_ivf(self):
+        if self._ivf is None and os.path.exists(self._path("ivf.npz")):
+            with np.load(self._path("ivf.npz")) as data:
+                self._ivf = {key: data[key] for key in data.files}
+        return self._ivf
+
+    # --- Search ---
+    # Inputs:
+    #   query (string or float array): text to embed, or an already computed query vector
+    #   k (int): number of results
+    #   nprobe (int): IVF clusters to scan; vectors added after the IVF was built are always scanned
+    #   candidates (array or None): restrict the search to these ordinals (e.g. from a tag query)
+    # Output: (ordinals, scores) arrays sorted by descending cosine similarity
+    def search_ordinals(self, query, k=10, nprobe=8, candidates=None):
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, np.uint32), np.zeros(0, np.float32)
+        if isinstance(query, str):
+            query = self.embed_fn([query])[0]
+        query = _normalize(np.asarray(query, dtype=np.float32)[None, :])[0]
+        mismatch = self.mismatch(self.manifest, len(query))
+        if mismatch:
+            raise ValueError(f"{mismatch}; run sync() (python embeddings.py build) to rebuild it")
+
+        ivf = self._load_ivf()
+        if candidates is not None:
+            ids = np.asarray(candidates, dtype=np.int64)
+        elif ivf is not None:
+            covered = int(ivf["starts"][-1])
+            probes = np.argsort(-(ivf["centroids"] @ query))[:nprobe]
+            parts = [ivf["order"][ivf["starts"][c]:ivf["starts"][c + 1]] for c in probes]
+            parts.append(np.arange(covered, n))
+            ids = np.sort(np.concatenate(parts).astype(np.int64))
+        else:
+            ids = None
+
+        scores = self._scores(query, ids)
+        ids = np.arange(n) if ids is None else ids
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return ids[top].astype(np.uint32), scores[top]
+
+    # Same as search_ordinals() but returns (offset, score) pairs
+    def search(self, query, k=10, nprobe=8, candidates=None):
+        ordinals, scores = self.search_ordinals(query, k, nprobe, candidates)
+        return list(zip(self.offsets()[ordinals].tolist(), scores.tolist()))
+
+
+# --- CLI usage ---
+# python embeddings.py build <corpus.jsonl> [float16|int8]
+# python embeddings.py search <corpus.jsonl> "<query>" [k]
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "search") or (sys.argv[1] == "search" and len(sys.argv) < 4):
+        print("Usage: python embeddings.py build <corpus.jsonl> [float16|int8]")
+        print('       python embeddings.py search <corpus.jsonl> "<query>" [k]')
+        sys.exit(1)
+
+    corpus_path = sys.argv[2]
+    if not os.path.exists(corpus_path):
+        print(f"Error: corpus not found: {corpus_path}")
+        sys.exit(1)
+
+    dtype = sys.argv[3] if sys.argv[1] == "build" and len(sys.argv) > 3 else "float16"
+    try:
+        index = VectorIndex(corpus_path, dtype=dtype)
+        added = index.sync()
+        if sys.argv[1] == "build":
+            print(f"Embedded {added} new records ({len(index)} total)")
+            sys.exit(0)
+        k = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+        results = index.search(sys.argv[3], k)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    records = read_records(corpus_path, [offset for offset, _ in results])
+    for (offset, score), record in zip(results, records):
+        print(json.dumps({"offset": offset, "score": round(score, 4), **record}, ensure_ascii=False))
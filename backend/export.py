@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+
+from corpus import iter_records
+
+# Converts the JSONL corpus into compact formats that load without re-parsing every line:
+#   .arrow / .feather  Arrow IPC file, memory-mapped on load (fastest to open and filter)
+#   .parquet           Parquet with zstd compression (smallest on disk)
+#   .jsonl.zst         zstd-compressed JSONL (same records, for tools that only speak JSONL)
+# Tags are stored as a list column of dictionary-encoded strings, so a tag filter compares small
+# integer codes instead of strings. Each row keeps the byte offset of its source line in the JSONL,
+# matching the offsets used by the other corpus indexes.
+#
+# pyarrow (Arrow/Parquet) and zstandard (.jsonl.zst) are optional: pip install pyarrow zstandard
+
+# Records per Arrow record batch
+BATCH_SIZE = 10000
+FIELDS = ["title", "content", "instruction", "response"]
+
+
+def _require(module):
+    try:
+        return __import__(module)
+    except ImportError:
+        print(f"This export needs the '{module}' package. Install it with: pip install {module}")
+        sys.exit(1)
+
+
+# --- Output format ---
+# Works out the export format from the output file name
+# Input: output_path (string)
+# Output: "arrow", "parquet" or "jsonl.zst"
+def detect_format(output_path):
+    name = output_path.lower()
+    if name.endswith(".jsonl.zst") or name.endswith(".zst"):
+        return "jsonl.zst"
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith(".arrow") or name.endswith(".feather"):
+        return "arrow"
+    raise ValueError(f"Cannot tell export format from '{output_path}' (use .arrow, .parquet or .jsonl.zst)")
+
+
+# --- Arrow schema ---
+def _schema(pa):
+    return pa.schema(
+        [pa.field("offset", pa.uint64())]
+        + [pa.field(name, pa.string()) for name in FIELDS]
+        + [pa.field("tags", pa.list_(pa.dictionary(pa.int32(), pa.string())))]
+    )
+
+
+# Builds one record batch; every batch shares the same tag dictionary so the IPC file never has to
+# replace it mid-stream
+def _record_batch(pa, rows, tag_dictionary, tag_codes):
+    columns = [pa.array([offset for offset, _ in rows], type=pa.uint64())]
+    for name in FIELDS:
+        columns.append(pa.array([record.get(name) for _, record in rows], type=pa.string()))
+
+    list_offsets = [0]
+    codes = []
+    for _, record in rows:
+        codes.extend(tag_codes[tag] for tag in record.get("tags") or [])
+        list_offsets.append(len(codes))
+    values = pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()), tag_dictionary)
+    columns.append(pa.ListArray.from_arrays(pa.array(list_offsets, type=pa.int32()), values))
+    return pa.RecordBatch.from_arrays(columns, schema=_schema(pa))
+
+
+# Streams the corpus in groups of BATCH_SIZE (offset, record) pairs
+def _batches(corpus_path):
+    rows = []
+    for offset, record, _ in iter_records(corpus_path):
+        rows.append((offset, record))
+        if len(rows) >= BATCH_SIZE:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+# --- Export to Arrow / Parquet ---
+# Inputs: corpus_path (string) JSONL input, output_path (string), fmt ("arrow" or "parquet")
+# Output: number of rows written
+def export_columnar(corpus_path, output_path, fmt):
+    pa = _require("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    # First pass: collect the tag vocabulary (small) so every batch uses one fixed dictionary
+    tags = sorted({tag for _, record, _ in iter_records(corpus_path) for tag in record.get("tags") or []})
+    tag_dictionary = pa.array(tags, type=pa.string())
+    tag_codes = {tag: i for i, tag in enumerate(tags)}
+
+    schema = _schema(pa)
+    tmp_path = output_path + ".tmp"
+    rows_written = 0
+    if fmt == "arrow":
+        sink = pa.OSFile(tmp_path, "wb")
+        writer = pa.ipc.new_file(sink, schema)
+    else:
+        sink = None
+        writer = pa.parquet.ParquetWriter(tmp_path, schema, compression="zstd")
+    try:
+        for rows in _batches(corpus_path):
+            batch = _record_batch(pa, rows, tag_dictionary, tag_codes)
+            if fmt == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+            rows_written += len(rows)
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+    os.replace(tmp_path, output_path)
+    return rows_written
+
+
+# --- Export to zstd JSONL ---
+# Inputs: corpus_path (string) JSONL input, output_path (string), level (int) zstd compression level
+# Output: number of records written
+def export_jsonl_zst(corpus_path, output_path, level=10):
+    zstd = _require("zstandard")
+    count = 0
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        with zstd.ZstdCompressor(level=level).stream_writer(f) as out:
+            for _, record, _ in iter_records(corpus_path):
+                out.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                count += 1
+    os.replace(tmp_path, output_path)
+    return count
+
+
+# --- Export dispatcher ---
+# Inputs: corpus_path (string), output_path (string), fmt (string or None to infer from output_path)
+# Output: number of records written
+def export(corpus_path, output_path, fmt=None):
+    fmt = fmt or detect_format(output_path)
+    if fmt == "jsonl.zst":
+        return export_jsonl_zst(corpus_path, output_path)
+    return export_columnar(corpus_path, output_path, fmt)
+
+
+# --- Load an export ---
+# Opens an Arrow IPC export memory-mapped (no parsing, pages are read on demand) or a Parquet export
+# with memory mapping enabled.
+# Input: path (string) to a .arrow/.feather or .parquet export
+# Output: pyarrow.Table
+def load(path):
+    pa = _require("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    if detect_format(path) == "parquet":
+        return pa.parquet.read_table(path, memory_map=True, read_dictionary=["tags.list.element"])
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+# --- Filter by tag ---
+# Selects the rows that carry `tag`, comparing dictionary codes rather than strings
+# Inputs: table (pyarrow.Table) from load(), tag (string) e.g. "relationships.family"
+# Output: pyarrow.Table with only the matching rows
+def filter_by_tag(table, tag):
+    import numpy as np
+    import pyarrow.compute as pc
+
+    rows = []
+    row_base = 0
+    for chunk in table.column("tags").chunks:
+        values = chunk.flatten()
+        code = pc.index(values.dictionary, tag).as_py()
+        if code >= 0:
+            hits = pc.equal(values.indices, code)
+            parents = pc.filter(pc.list_parent_indices(chunk), hits).to_numpy()
+            rows.append(np.unique(parents) + row_base)
+        row_base += len(chunk)
+    if not rows:
+        return table.slice(0, 0)
+    return table.take(np.concatenate(rows))
+
+
+# --- CLI usage ---
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python export.py <corpus.jsonl> <output.arrow|output.parquet|output.jsonl.zst>")
+        sys.exit(1)
+
+    corpus_path = sys.argv[1]
+    output_path = sys.argv[2]
+    if not os.path.exists(corpus_path):
+        print(f"Error: corpus not found: {corpus_path}")
+        sys.exit(1)
+
+    try:
+        count = export(corpus_path, output_path)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Exported {count} records to {output_path}")
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager, nullcontext
+
+from profiling import profile_stage
+
+# Per-stage timing and resource telemetry for pipeline jobs.
+# A job (one process/transcribe run) is wrapped in job(); inside it, each pipeline stage is wrapped in
+# stage(). A stage may run many times in a job (once per chunk); its runs are added up, and when the job
+# ends one JSON line per stage is appended to the metrics log with:
+#   wall, cpu          seconds of wall-clock and CPU time (CPU is for the whole process, so it includes
+#                      Whisper's worker threads and, in the server, other jobs running at the same time)
+#   calls              how many times the stage ran
+#   peak_rss_mb        highest resident memory of the process seen while the stage ran, sampled every
+#                      RSS_INTERVAL seconds and when each run ends (from /proc on Linux, psutil
+#                      elsewhere if installed; otherwise not recorded). It is the process's memory, so in
+#                      the server it includes other jobs running at the same time and the models kept loaded.
+#   tokens_in/out      OpenAI usage, added by the stage with add()
+#   audio_seconds, rtf audio length and real-time factor (wall / audio_seconds) for transcription
+# When the job ends, a line with stage "total" covers the whole job. With no job active (library use),
+# nothing is recorded. If profiling is enabled (profiling.py), each stage also writes a cProfile dump.
+#
+# The log defaults to ~/.memory_forge/metrics.jsonl; set MEMORY_FORGE_METRICS to move it, or to "off".
+#
+# Usage: python metrics.py summary [metrics.jsonl] [job kind]
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+# Seconds between resident memory samples while stages run
+RSS_INTERVAL = 0.05
+
+# Fields summed over the stages of a job into its "total" line
+TOTALS = ["tokens_in", "tokens_out", "audio_seconds"]
+
+
+def metrics_path():
+    return os.getenv("MEMORY_FORGE_METRICS") or os.path.join(os.path.expanduser("~"), ".memory_forge", "metrics.jsonl")
+
+
+# Peak resident set size over this process's whole lifetime in MB (ru_maxrss is KB on Linux, bytes on macOS);
+# for the stage lines see rss_mb() and _RssSampler
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+# Current resident set size of this process in MB, or None where it cannot be read
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+
+
+# --- Resident memory sampling ---
+# One daemon thread per process samples rss_mb() every RSS_INTERVAL seconds while any stage is running and
+# raises the "peak" of every running stage record; it sleeps while no stage runs.
+class _RssSampler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.records = {}
+        self.thread = None
+
+    def start(self, record):
+        with self.lock:
+            self.records[id(record)] = record
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self.thread.start()
+            self.wake.notify()
+
+    # Stops sampling for the record after one last sample
+    def stop(self, record):
+        self._raise([record], rss_mb())
+        with self.lock:
+            self.records.pop(id(record), None)
+
+    @staticmethod
+    def _raise(records, rss):
+        if rss is None:
+            return
+        for record in records:
+            if record.get("peak") is None or rss > record["peak"]:
+                record["peak"] = rss
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.records:
+                    self.wake.wait()
+                records = list(self.records.values())
+            self._raise(records, rss_mb())
+            time.sleep(RSS_INTERVAL)
+
+
+_sampler = _RssSampler()
+
+
+def _append(record):
+    path = metrics_path()
+    if path == "off":
+        return
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _write_lock:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            # Telemetry must never fail a job
+            print(f"Could not write metrics to {path}: {e}", file=sys.stderr)
+
+
+# --- Record one job ---
+# Inputs: kind (string) e.g. "process" or "transcribe", **fields recorded on every line (e.g. mode)
+# Output: yields the job dict; stages run in this thread inside the block are recorded under it
+@contextmanager
+def job(kind, **fields):
+    previous = getattr(_local, "job", None)
+    current = {"job_id": uuid.uuid4().hex[:12], "job": kind, "fields": fields, "totals": {}, "stages": {}}
+    _local.job = current
+    status = "ok"
+    try:
+        with stage("total"):
+            try:
+                yield current
+            except BaseException as e:
+                status = type(e).__name__
+                raise
+            finally:
+                add(status=status, **current["totals"])
+                for name, line in current["stages"].items():
+                    _append(_line(current, name, line["wall"], line["cpu"], line["values"],
+                                  calls=line["calls"], peak_rss_mb=line["peak"]))
+    finally:
+        _local.job = previous
+
+
+# One metrics log line
+def _line(current, name, wall, cpu, values, **extra):
+    line = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "job_id": current["job_id"],
+        "job": current["job"],
+        "stage": name,
+        "wall": round(wall, 4),
+        "cpu": round(cpu, 4),
+    }
+    line.update((key, value) for key, value in extra.items() if value is not None)
+    line.update(current["fields"])
+    line.update(values)
+    if line.get("audio_seconds"):
+        line["rtf"] = round(wall / line["audio_seconds"], 4)
+    return line
+
+
+# --- Record one stage ---
+# Inputs: name (string) e.g. "clean", "punctuate", "tag", "write", "index", "transcribe"
+# Stages may nest; each is recorded separately. Runs of the same stage in a job are summed (numeric values
+# added, others kept from the last run, peak_rss_mb the highest of the runs) and written when the job ends; "total" is written right away.
+@contextmanager
+def stage(name):
+    current = getattr(_local, "job", None)
+    if current is None:
+        yield
+        return
+
+    stages = getattr(_local, "stages", [])
+    record = {"stage": name, "values": {}, "peak": None}
+    _local.stages = stages + [record]
+    _sampler.start(record)
+    profiler = nullcontext() if name == "total" else profile_stage(current["job_id"], current["job"], name)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        with profiler:
+            yield
+    finally:
+        _local.stages = stages
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        _sampler.stop(record)
+        if name == "total":
+            _append(_line(current, name, wall, cpu, record["values"], peak_rss_mb=record["peak"]))
+        else:
+            for key in TOTALS:
+                if key in record["values"]:
+                    current["totals"][key] = current["totals"].get(key, 0) + record["values"][key]
+            summed = current["stages"].setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0, "peak": None, "values": {}})
+            summed["wall"] += wall
+            summed["cpu"] += cpu
+            summed["calls"] += 1
+            if record["peak"] is not None and (summed["peak"] is None or record["peak"] > summed["peak"]):
+                summed["peak"] = record["peak"]
+            for key, value in record["values"].items():
+                if _is_number(value) and _is_number(summed["values"].get(key)):
+                    summed["values"][key] += value
+                else:
+                    summed["values"][key] = value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# --- Attach values to the innermost running stage ---
+# e.g. add(tokens_in=830, tokens_out=790) or add(audio_seconds=312.4); numbers accumulate
+def add(**values):
+    stages = getattr(_local, "stages", None)
+    if not stages:
+        return
+    target = stages[-1]["values"]
+    for key, value in values.items():
+        if _is_number(value) and key in target:
+            target[key] += value
+        else:
+            target[key] = value
+
+
+# --- Summary ---
+# Linear-interpolated percentile of a sorted list
+def percentile(values, p):
+    if len(values) == 1:
+        return values[0]
+    position = (len(values) - 1) * p / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+# Reads the metrics log and groups values by (job, stage)
+# Output: {(job, stage): {field: sorted list of numbers}}
+def load(path, kind=None):
+    groups = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if kind and record.get("job") != kind:
+                continue
+            group = groups.setdefault((record.get("job"), record.get("stage")), {})
+            for field in ["wall", "cpu", "peak_rss_mb", "tokens_in", "tokens_out", "rtf"]:
+                if isinstance(record.get(field), (int, float)):
+                    group.setdefault(field, []).append(record[field])
+    for group in groups.values():
+        for values in group.values():
+            values.sort()
+    return groups
+
+
+def summary(path, kind=None):
+    groups = load(path, kind)
+    print(f"{'job':10s} {'stage':12s} {'field':12s} {'n':>6s} {'p50':>10s} {'p90':>10s} {'p99':>10s} {'max':>10s}")
+    for (job_kind, name), group in sorted(groups.items(), key=lambda item: (str(item[0][0]), item[0][1] == "total", str(item[0][1]))):
+        for field, values in group.items():
+            row = [percentile(values, p) for p in (50, 90, 99)] + [values[-1]]
+            print(f"{str(job_kind):10s} {str(name):12s} {field:12s} {len(values):6d} " + " ".join(f"{v:10.3f}" for v in row))
+
+
+# --- CLI usage ---
+# python metrics.py summary [metrics.jsonl] [job kind]
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "summary":
+        print("Usage: python metrics.py summary [metrics.jsonl] [job kind]")
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else metrics_path()
+    if not os.path.exists(path):
+        print(f"Error: metrics log not found: {path}")
+        sys.exit(1)
+    summary(path, sys.argv[3] if len(sys.argv) > 3 else None)
@@ -0,0 +1,155 @@
+import os
+import sys
+import glob
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+# Optional per-stage profiling of pipeline jobs.
+# When a profile directory is configured (--profile DIR on process.py, transcribe.py or server.py, or the
+# MEMORY_FORGE_PROFILE environment variable), every stage recorded by metrics.stage() also runs under
+# cProfile and writes <DIR>/<time>-<job id>-<n>-<job>-<stage>.prof, n counting the stage runs (a stage
+# runs once per chunk, so there can be many per job and second). With MEMORY_FORGE_PROFILE_MEMORY=1 a
+# tracemalloc snapshot of the allocations still alive at the end of the stage is written next to it
+# (.tracemalloc); this slows the stage down noticeably. Tracing is process-wide, so with jobs running in
+# parallel (server.py) a snapshot also holds the other jobs' allocations.
+# cProfile only sees Python code of the thread running the stage; for native code (Whisper/torch) or a
+# live process use py-spy, e.g. `py-spy dump --pid <backend pid>` (server threads are named after the
+# request they run).
+#
+# Usage: python profiling.py report <DIR or .prof file> [top n] [stage]
+
+_local = threading.local()
+# Numbers the profile files, so stage runs within the same second do not overwrite each other
+_runs = itertools.count(1)
+
+# tracemalloc is process-wide: it is started by the first stage that wants it and stopped when the last
+# one still using it ends, so one job's stage does not stop tracing under another's
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    import tracemalloc
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users, _tracing_owned
+    import tracemalloc
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def profile_dir():
+    return os.getenv("MEMORY_FORGE_PROFILE") or None
+
+
+# --- Parse --profile from a command line ---
+# Removes "--profile DIR" from argv (so positional arguments keep their places) and enables profiling
+# Input: argv (list, modified in place)
+def enable_from_argv(argv):
+    if "--profile" not in argv:
+        return
+    index = argv.index("--profile")
+    if index + 1 >= len(argv):
+        print("Error: --profile needs a directory")
+        sys.exit(1)
+    os.environ["MEMORY_FORGE_PROFILE"] = argv[index + 1]
+    del argv[index:index + 2]
+
+
+# --- Profile one stage ---
+# Inputs: job_id, job, name (strings) used for the file name
+# Nested stages are not profiled separately: their time shows up in the enclosing stage's profile
+@contextmanager
+def profile_stage(job_id, job, name):
+    directory = profile_dir()
+    if directory is None or getattr(_local, "active", False):
+        yield
+        return
+
+    import cProfile
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{job_id}-{next(_runs):05d}-{job}-{name}")
+
+    trace_memory = os.getenv("MEMORY_FORGE_PROFILE_MEMORY") == "1"
+    if trace_memory:
+        _start_tracing()
+
+    profiler = cProfile.Profile()
+    _local.active = True
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (e.g. a debugger or coverage) already owns this thread
+        _local.active = False
+        profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _local.active = False
+            profiler.dump_stats(base + ".prof")
+        if trace_memory:
+            import tracemalloc
+            try:
+                tracemalloc.take_snapshot().dump(base + ".tracemalloc")
+            finally:
+                _stop_tracing()
+
+
+# --- Report ---
+# Prints the hottest functions of one .prof file or of all matching .prof files in a directory combined
+# Inputs: path (directory or file), top (int), stage (string or None) only include that stage
+def report(path, top=25, stage=None):
+    if os.path.isdir(path):
+        pattern = f"*-{stage}.prof" if stage else "*.prof"
+        files = sorted(glob.glob(os.path.join(path, pattern)))
+    else:
+        files = [path]
+    if not files:
+        print(f"No profiles found in {path}")
+        return
+
+    import pstats
+    stats = pstats.Stats(*files)
+    print(f"{len(files)} profile(s)\n")
+    print("Hottest by own time:")
+    stats.sort_stats("tottime").print_stats(top)
+    print("Hottest by cumulative time:")
+    stats.sort_stats("cumulative").print_stats(top)
+
+    # Largest allocations still alive at the end of the stage, if memory tracing was on
+    import tracemalloc
+    for prof in files:
+        snapshot_path = prof[:-len(".prof")] + ".tracemalloc"
+        if os.path.exists(snapshot_path):
+            print(f"Largest live allocations in {os.path.basename(snapshot_path)}:")
+            for stat in tracemalloc.Snapshot.load(snapshot_path).statistics("lineno")[:10]:
+                print(f"  {stat}")
+
+
+# --- CLI usage ---
+# python profiling.py report <DIR or .prof file> [top n] [stage]
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "report":
+        print("Usage: python profiling.py report <DIR or .prof file> [top n] [stage]")
+        sys.exit(1)
+
+    path = sys.argv[2]
+    if not os.path.exists(path):
+        print(f"Error: not found: {path}")
+        sys.exit(1)
+    report(path, int(sys.argv[3]) if len(sys.argv) > 3 else 25, sys.argv[4] if len(sys.argv) > 4 else None)
@@ -0,0 +1,100 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Structured progress events for long-running jobs.
+# Pipeline code calls report(stage, ...) at interesting points; where the events go depends on who runs it:
+#   - server.py binds a sink per request that forwards events to Electron as {"id": ..., "event": {...}}
+#   - the command-line scripts print them to stderr as JSON lines prefixed with "PROGRESS "
+#   - with no job bound (library use), events are dropped
+# Each event carries the stage name, the elapsed time of the job and, when a percentage is known,
+# an ETA extrapolated from the progress so far. Jobs can also be cancelled cooperatively: the next
+# report() of a cancelled job raises JobCancelled.
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    # Input: sink (callable taking an event dict, or None to drop events)
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        # Range of the overall job that the code currently running covers (see scope())
+        self.span = (0.0, 100.0)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+# --- Bind a job to the current thread ---
+# Inputs: job (Job)
+# Output: yields the job; report() calls made in this thread while inside go to its sink
+@contextmanager
+def bind(job):
+    previous = getattr(_local, "job", None)
+    _local.job = job
+    try:
+        yield job
+    finally:
+        _local.job = previous
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+# --- Nested progress ranges ---
+# Maps the 0-100 percentages reported inside the block onto [start, end] of the enclosing range, e.g.
+# transcribe_file() runs process() inside scope(50, 100) so its 0-100% becomes the second half of the job.
+@contextmanager
+def scope(start, end):
+    job = current_job()
+    if job is None:
+        yield
+        return
+    previous = job.span
+    lo, hi = previous
+    job.span = (lo + (hi - lo) * start / 100.0, lo + (hi - lo) * end / 100.0)
+    try:
+        yield
+    finally:
+        job.span = previous
+
+
+# --- Report progress ---
+# Inputs:
+#   stage (string): e.g. "clean", "punctuate", "tag", "write", "transcribe"
+#   percent (float or None): overall job progress 0-100 if known
+#   **fields: extra numbers such as segments=12, tokens_in=830, tokens_out=790
+# Raises JobCancelled if the current job has been cancelled.
+def report(stage, percent=None, **fields):
+    job = current_job()
+    if job is None:
+        return
+    if job.cancelled.is_set():
+        raise JobCancelled(f"Job cancelled during {stage}")
+
+    elapsed = time.monotonic() - job.started
+    event = {"stage": stage, "elapsed": round(elapsed, 2)}
+    if percent is not None:
+        lo, hi = job.span
+        percent = lo + (hi - lo) * percent / 100.0
+        event["percent"] = round(percent, 1)
+        if 0 < percent < 100:
+            event["eta"] = round(elapsed * (100 - percent) / percent, 1)
+    event.update(fields)
+    if job.sink is not None:
+        job.sink(event)
+
+
+# Sink used by the command-line scripts
+def stderr_sink(event):
+    sys.stderr.write("PROGRESS " + json.dumps(event) + "\n")
+    sys.stderr.flush()
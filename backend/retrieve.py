@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+
+import numpy as np
+
+from corpus import read_records, watermark_valid
+from tag_index import TagIndex
+from bm25 import BM25Index
+from tagger import suggest_tags
+
+# Hybrid retrieval over the corpus: fuses three rankings with reciprocal rank fusion (RRF)
+#   tags    chunks carrying the tags suggest_tags() finds in the query, ranked by how many (and how
+#           strongly) they match
+#   bm25    lexical score of the chunk content (bm25.py)
+#   vector  cosine similarity of local embeddings (embeddings.py), when the vector index exists
+# Each stage only produces its top `depth` candidates. Because RRF contributions shrink with rank, a chunk
+# missing from a stage that was cut off at `depth` can gain at most weight/(RRF_K+depth+1) from it. Once no
+# chunk outside the top k (seen by some stages or by none) can reach the k-th fused score, and no chunk in
+# the top k can overtake the one above it, the result is final; otherwise depth is doubled while the latency
+# budget allows.
+
+RRF_K = 60
+DEFAULT_WEIGHTS = {"tags": 1.0, "bm25": 1.0, "vector": 1.0}
+QUERY_TAGS = 5
+
+
+# --- Vector index check ---
+# The vector index is only synced by embedding runs, so it can lag behind or, after the corpus was rewritten
+# (e.g. dedup="replace" compaction), point at records that moved. Its ordinals must also be the tag index's,
+# since tag filters are passed to it as ordinals.
+# Inputs: vectors (VectorIndex), tag_index (synced TagIndex)
+# Output: why the vector index cannot be used, or None
+def vector_index_problem(vectors, tag_index):
+    manifest = vectors.manifest
+    if not watermark_valid(vectors.corpus_path, manifest["indexed_bytes"], manifest["tail_digest"]):
+        return "the corpus was rewritten after it was built"
+    n = len(vectors)
+    if n > len(tag_index) or not np.array_equal(vectors.offsets(), tag_index.offsets()[:n]):
+        return "its records do not match the tag index"
+    return vectors.mismatch(manifest)
+
+
+# --- Tag stage ---
+# Ranks chunks by tag match strength: each query tag contributes more the higher suggest_tags ranked it
+# Inputs: tag_index (TagIndex), query_tags (list of strings, strongest first), allowed (ordinals or None)
+# Output: (offsets, strengths) sorted by descending strength
+def tag_ranking(tag_index, query_tags, allowed=None):
+    ordinals = []
+    weights = []
+    for rank, tag in enumerate(query_tags):
+        postings = tag_index.postings(tag)
+        ordinals.append(postings)
+        weights.append(np.full(len(postings), len(query_tags) - rank, dtype=np.float32))
+    if not ordinals or sum(len(o) for o in ordinals) == 0:
+        return np.zeros(0, np.uint64), np.zeros(0, np.float32)
+
+    unique, inverse = np.unique(np.concatenate(ordinals), return_inverse=True)
+    strength = np.zeros(len(unique), dtype=np.float32)
+    np.add.at(strength, inverse, np.concatenate(weights))
+    if allowed is not None:
+        mask = np.isin(unique, allowed, assume_unique=True)
+        unique, strength = unique[mask], strength[mask]
+    # Stable sort keeps corpus order among equally strong matches
+    order = np.argsort(-strength, kind="stable")
+    return tag_index.offsets()[unique[order]], strength[order]
+
+
+class HybridRetriever:
+    # Inputs:
+    #   corpus_path (string): JSONL corpus
+    #   weights (dict): per-stage RRF weights, see DEFAULT_WEIGHTS
+    #   embed_fn (callable or None): passed through to VectorIndex
+    def __init__(self, corpus_path, weights=None, embed_fn=None):
+        self.corpus_path = str(corpus_path)
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.tag_index = TagIndex(corpus_path)
+        self.bm25 = BM25Index(corpus_path)
+        self.tag_index.sync()
+        self.bm25.sync()
+
+        # Vectors are only used if an embedding run already built the index and it still matches the corpus;
+        # searching must not trigger embedding of the whole corpus
+        self.vectors = None
+        if os.path.exists(os.path.join(self.corpus_path + ".vectors", "manifest.json")):
+            from embeddings import VectorIndex
+            vectors = VectorIndex(corpus_path, embed_fn=embed_fn)
+            problem = vector_index_problem(vectors, self.tag_index)
+            if problem:
+                print(f"Not using the vector index: {problem}; rebuild it with "
+                      f"python embeddings.py build {self.corpus_path}", file=sys.stderr)
+            else:
+                self.vectors = vectors
+
+    # --- Retrieve ---
+    # Inputs:
+    #   query (string): natural language, e.g. "memories about recovery and family"
+    #   k (int): number of results
+    #   tags (string or None): tag expression every result must satisfy (see TagIndex.query)
+    #   budget_ms (float): latency budget; stages that would start after it is spent are skipped
+    #   depth (int or None): initial candidates per stage, defaults to max(50, 5*k)
+    # Output: list of dicts {"offset", "score", "ranks"} sorted by fused score; ranks holds the 1-based
+    #         rank of the chunk in each stage that returned it
+    def search(self, query, k=10, tags=None, budget_ms=250, depth=None):
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000.0
+        depth = depth or max(50, 5 * k)
+
+        allowed = self.tag_index.query_ordinals(tags) if tags else None
+        query_tags = None
+        query_vector = None
+
+        # Stages run cheapest first: BM25 always runs, the tagger and the embedding model only while
+        # the budget lasts
+        while True:
+            rankings = {}
+            # Stages cut off at depth, where chunks below the cutoff may still add to their score
+            truncated = set()
+
+            ordinals, _ = self.bm25.search_ordinals(query, depth, allowed=allowed)
+            rankings["bm25"] = self.bm25.offsets()[ordinals]
+            if len(ordinals) >= depth:
+                truncated.add("bm25")
+
+            if query_tags is None and time.perf_counter() < deadline:
+                # Query tags come from the same tagger that tagged the corpus
+                query_tags = suggest_tags(query, top_n=QUERY_TAGS)
+            if query_tags:
+                offsets, _ = tag_ranking(self.tag_index, query_tags, allowed)
+                rankings["tags"] = offsets[:depth]
+                if len(offsets) > depth:
+                    truncated.add("tags")
+
+            if self.vectors is not None and len(self.vectors) and time.perf_counter() < deadline:
+                if query_vector is None:
+                    query_vector = self.vectors.embed_fn([query])[0]
+                candidates = None
+                if allowed is not None:
+                    # vector_index_problem() checked that vector ordinals are a prefix of the tag ordinals
+                    candidates = allowed[allowed < len(self.vectors)]
+                ordinals, _ = self.vectors.search_ordinals(query_vector, depth, candidates=candidates)
+                rankings["vector"] = self.vectors.offsets()[ordinals]
+                if len(ordinals) >= depth:
+                    truncated.add("vector")
+
+            results = self._fuse(rankings)
+            if not truncated or time.perf_counter() >= deadline:
+                break
+            if self._settled(results, k, truncated, depth):
+                break
+            depth *= 2
+
+        return results[:k]
+
+    # Whether deeper rankings could still change the top k or its order
+    # Inputs: results (fused, sorted), k (int), truncated (stages cut off at depth), depth (int)
+    # Output: bool, True when every chunk's best possible score leaves the top k as it is
+    def _settled(self, results, k, truncated, depth):
+        # Best score a chunk can still gain from a stage that has not returned it: just below the cutoff
+        gain = {stage: self.weights[stage] / (RRF_K + depth + 1) for stage in truncated}
+        if len(results) < k:
+            return False
+
+        def best(entry):
+            return entry["score"] + sum(g for stage, g in gain.items() if stage not in entry["ranks"])
+
+        kth = results[k - 1]["score"]
+        # A chunk no stage has returned yet
+        if sum(gain.values()) >= kth:
+            return False
+        # Chunks outside the top k that some stages have returned
+        if any(best(entry) > entry["score"] and best(entry) >= kth for entry in results[k:]):
+            return False
+        # Chunks in the top k, which must not overtake the chunk above them (a chunk that cannot gain
+        # anything keeps its place even when tied)
+        for i in range(1, k):
+            top = best(results[i])
+            if top > results[i]["score"] and top >= results[i - 1]["score"]:
+                return False
+        return True
+
+    # Reciprocal rank fusion of {stage: offsets in rank order}
+    def _fuse(self, rankings):
+        fused = {}
+        for stage, offsets in rankings.items():
+            weight = self.weights[stage]
+            for rank, offset in enumerate(offsets.tolist(), start=1):
+                entry = fused.setdefault(offset, {"offset": offset, "score": 0.0, "ranks": {}})
+                entry["score"] += weight / (RRF_K + rank)
+                entry["ranks"][stage] = rank
+        return sorted(fused.values(), key=lambda entry: -entry["score"])
+
+
+# --- Convenience function ---
+# One-shot hybrid search; see HybridRetriever.search for the arguments
+def retrieve(corpus_path, query, k=10, tags=None, budget_ms=250):
+    return HybridRetriever(corpus_path).search(query, k, tags, budget_ms)
+
+
+# --- CLI usage ---
+# python retrieve.py <corpus.jsonl> "<query>" [k] ["<tag expression>"]
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print('Usage: python retrieve.py <corpus.jsonl> "<query>" [k] ["<tag expression>"]')
+        sys.exit(1)
+
+    corpus_path = sys.argv[1]
+    if not os.path.exists(corpus_path):
+        print(f"Error: corpus not found: {corpus_path}")
+        sys.exit(1)
+
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    tags = sys.argv[4] if len(sys.argv) > 4 else None
+    try:
+        results = retrieve(corpus_path, sys.argv[2], k, tags)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    records = read_records(corpus_path, [result["offset"] for result in results])
+    for result, record in zip(results, records):
+        print(json.dumps({**result, "score": round(result["score"], 5), **record}, ensure_ascii=False))
@@ -0,0 +1,190 @@
+import sys
+import json
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import metrics
+import profiling
+from progress import Job, JobCancelled, bind
+
+# Long-running backend for the Electron app.
+# main.js starts this once and talks to it with JSON-lines RPC over stdio, so the interpreter start-up,
+# the compiled tag patterns, the OpenAI client and loaded Whisper models are paid for once instead of on
+# every button press.
+#
+# Requests (one JSON object per line on stdin):
+#   {"id": 1, "method": "process", "params": {"txt_path": ..., "title": ..., "instruction": ..., "mode": ..., "output_path": ...}}
+#   {"id": 2, "method": "transcribe", "params": {"mp3_path": ..., "title": ..., "instruction": ..., "mode": ..., "output_path": ...,
+#                                                "whisper": {"language": "en", "task": "transcribe", "initial_prompt": "taxonomy"}}}  (whisper optional)
+#   {"id": 3, "method": "cancel", "params": {"id": 2}}
+#   {"id": 4, "method": "ping"}
+#   {"id": 5, "method": "shutdown"}
+#   {"id": 6, "method": "suggest_tags", "params": {"key": ..., "text": ..., "top_n": 5}}  tags for text being edited
+# Responses (one JSON object per line on stdout):
+#   {"id": 1, "event": {"stage": "punctuate", "percent": 5.0, "elapsed": 0.4, ...}}  progress, any number
+#   {"id": 1, "result": ...}  or  {"id": 1, "error": "message"}  exactly one, last
+# On start-up the server writes {"event": "ready"}. Requests run on a thread pool, so several jobs can be
+# in flight; responses carry the request id and may arrive out of order.
+#
+# Usage: python server.py [--profile DIR]
+
+MAX_WORKERS = 4
+# Texts being edited that keep incremental tagging state, least recently used dropped first
+TAGGER_SESSIONS = 32
+# Quick methods that are not recorded in the metrics log
+UNMETERED = {"ping", "suggest_tags"}
+
+# The real stdout carries protocol messages only; anything the pipeline prints goes to stderr
+_protocol_out = sys.stdout
+_protocol_lock = threading.Lock()
+
+# Jobs that are queued or running, by request id (used by "cancel")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# IncrementalTagger per edited text, by the caller's key
+_taggers = OrderedDict()
+_taggers_lock = threading.Lock()
+
+
+# --- Send a protocol message ---
+# Input: message (dict) written as one JSON line on the protocol stream
+def send(message):
+    line = json.dumps(message, ensure_ascii=False)
+    with _protocol_lock:
+        _protocol_out.write(line + "\n")
+        _protocol_out.flush()
+
+
+# --- Methods ---
+def _process(params):
+    from process import process
+    return process(params["txt_path"], params["title"], params["instruction"], params["mode"], params["output_path"])
+
+
+def _transcribe(params):
+    from transcribe import transcribe_file, whisper_options
+    options = whisper_options(**(params.get("whisper") or {}))
+    return transcribe_file(params["mp3_path"], params["title"], params["instruction"], params["mode"], params["output_path"],
+                           options=options)
+
+
+# Tags for a text the user is editing; repeated calls with the same key only re-tag what changed
+def _suggest_tags(params):
+    from tagger import IncrementalTagger
+    key = params.get("key")
+    text = params.get("text") or ""
+    with _taggers_lock:
+        tagger = _taggers.pop(key, None)
+        if tagger is None:
+            tagger = IncrementalTagger(text)
+        else:
+            tagger.set_text(text)
+        _taggers[key] = tagger
+        while len(_taggers) > TAGGER_SESSIONS:
+            _taggers.popitem(last=False)
+        return tagger.suggest(params.get("top_n") or 5)
+
+
+def _ping(params):
+    return "pong"
+
+
+METHODS = {
+    "process": _process,
+    "transcribe": _transcribe,
+    "suggest_tags": _suggest_tags,
+    "ping": _ping,
+}
+
+
+# Runs one request and sends its response; progress events of the job are forwarded with the request id
+def handle(request, job):
+    request_id = request.get("id")
+    try:
+        method = METHODS.get(request.get("method"))
+        if method is None:
+            raise ValueError(f"Unknown method: {request.get('method')}")
+        if job.cancelled.is_set():
+            raise JobCancelled("Job cancelled before it started")
+        params = request.get("params") or {}
+        # Named after the request so py-spy dumps show which job a thread is running
+        threading.current_thread().name = f"{request.get('method')}-{request_id}"
+        recorder = nullcontext() if request.get("method") in UNMETERED else metrics.job(request.get("method"), mode=params.get("mode"))
+        with bind(job), recorder:
+            result = method(params)
+        send({"id": request_id, "result": result})
+    except JobCancelled as e:
+        send({"id": request_id, "error": str(e), "cancelled": True})
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        send({"id": request_id, "error": str(e)})
+    finally:
+        with _jobs_lock:
+            _jobs.pop(request_id, None)
+
+
+# Marks a queued or running job as cancelled; it stops at its next progress report
+def cancel(request_id):
+    with _jobs_lock:
+        job = _jobs.get(request_id)
+    if job is None:
+        return False
+    job.cancel()
+    return True
+
+
+# --- Warm-up ---
+# Compiles the tag patterns in the background so the first job does not pay for it
+def warm_up():
+    try:
+        from tagger import compiled_tag_patterns
+        compiled_tag_patterns()
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+
+
+def main():
+    # Optional: --profile DIR writes a cProfile dump per job stage (see profiling.py)
+    profiling.enable_from_argv(sys.argv)
+
+    # Route print() from the pipeline to stderr, keeping stdout for the protocol
+    sys.stdout = sys.stderr
+    threading.Thread(target=warm_up, daemon=True).start()
+
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    send({"event": "ready"})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            send({"id": None, "error": f"Invalid request: {line[:200]}"})
+            continue
+
+        request_id = request.get("id")
+        if request.get("method") == "shutdown":
+            send({"id": request_id, "result": "bye"})
+            break
+        if request.get("method") == "cancel":
+            # Handled inline so it is not queued behind the jobs it should stop
+            send({"id": request_id, "result": cancel((request.get("params") or {}).get("id"))})
+            continue
+
+        job = Job(lambda event, request_id=request_id: send({"id": request_id, "event": event}))
+        with _jobs_lock:
+            _jobs[request_id] = job
+        executor.submit(handle, request, job)
+
+    # stdin closed (Electron exited) or shutdown requested: let running jobs finish
+    executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
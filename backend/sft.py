@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import regex as re
+
+import metrics
+from cache import atomic_write
+from corpus import iter_records
+from dedup import normalize, content_hash
+
+# SFT export: turns the {instruction, response} records of an SFT corpus into fine-tuning shards.
+#   - tokens are counted with tiktoken the way the chat fine-tuning API counts them
+#   - responses too long for max_tokens are split at sentence boundaries (or, for a single overlong
+#     sentence, at token boundaries) into several examples with the same instruction
+#   - examples well under max_tokens are packed into multi-turn conversations up to max_tokens, so short
+#     memories do not each pay for a mostly empty context (turn off with --no-pack)
+#   - exact duplicates (same normalized instruction + response) are dropped
+#   - records are assigned to train or validation by a stable hash of their text, before splitting or
+#     packing, so parts of one transcript never end up on both sides and re-running gives the same split
+#   - shards are written as train-00000.jsonl, val-00000.jsonl, ... of at most shard_mb each, in the chat
+#     format: {"messages": [{"role": "user", ...}, {"role": "assistant", ...}, ...]}
+# manifest.json in the output directory lists the shards (with sha256) and token statistics.
+#
+# tiktoken is optional for the rest of the backend: pip install tiktoken
+#
+# Usage: python sft.py <corpus.jsonl> <output_dir> [max_tokens] [val_percent] [shard_mb] [--no-pack] [--encoding NAME]
+
+DEFAULT_ENCODING = "cl100k_base"
+MAX_TOKENS = 4096
+VAL_PERCENT = 5
+SHARD_MB = 100
+
+# Chat format overhead, as in OpenAI's token counting guide: each message costs its content plus 4 tokens,
+# and every conversation 3 more for the assistant reply primer
+MESSAGE_TOKENS = 4
+CONVERSATION_TOKENS = 3
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+# --- Tokenizer ---
+# Input: name (string) tiktoken encoding name
+# Output: tiktoken Encoding
+def load_encoding(name=DEFAULT_ENCODING):
+    try:
+        import tiktoken
+    except ImportError:
+        raise RuntimeError("SFT export needs the 'tiktoken' package. Install it with: pip install tiktoken")
+    return tiktoken.get_encoding(name)
+
+
+# Token ids of text; special-token strings in a transcript are counted as ordinary text
+def _encode(encoding, text):
+    return encoding.encode(text, disallowed_special=())
+
+
+# --- Token count of one conversation ---
+# Inputs: encoding, messages (list of {"role", "content"} dicts)
+# Output: int
+def count_tokens(encoding, messages):
+    return CONVERSATION_TOKENS + sum(MESSAGE_TOKENS + len(_encode(encoding, m["content"])) for m in messages)
+
+
+def _turn(instruction, response):
+    return [{"role": "user", "content": instruction}, {"role": "assistant", "content": response}]
+
+
+# --- Validation split ---
+# Stable per-record choice from the record's content hash
+# Inputs: digest (hex string), val_percent (number)
+# Output: "train" or "val"
+def assign_split(digest, val_percent):
+    return "val" if int(digest[:8], 16) % 10000 < val_percent * 100 else "train"
+
+
+# --- Fit text into a token budget ---
+# Cuts text into pieces of at most budget tokens by decoding consecutive token slices
+def _token_slices(encoding, text, budget):
+    tokens = _encode(encoding, text)
+    for start in range(0, len(tokens), budget):
+        piece = encoding.decode(tokens[start:start + budget]).strip()
+        if piece:
+            yield piece
+
+
+# --- Split an oversized response ---
+# Groups sentences greedily into pieces of at most budget tokens; a sentence longer than the budget on
+# its own is cut at token boundaries
+# Inputs: encoding, response (string), budget (int) tokens available for the response
+# Output: list of response strings
+def split_response(encoding, response, budget):
+    pieces = []
+    current = []
+    size = 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            text = " ".join(current)
+            # Token counts are not quite additive across joins; re-check the joined piece
+            if len(_encode(encoding, text)) > budget:
+                pieces.extend(_token_slices(encoding, text, budget))
+            else:
+                pieces.append(text)
+        current, size = [], 0
+
+    for sentence in SENTENCE_PATTERN.split(response.strip()):
+        if not sentence:
+            continue
+        tokens = len(_encode(encoding, sentence))
+        if tokens > budget:
+            flush()
+            pieces.extend(_token_slices(encoding, sentence, budget))
+            continue
+        if current and size + 1 + tokens > budget:
+            flush()
+        size += tokens + (1 if current else 0)
+        current.append(sentence)
+    flush()
+    return pieces
+
+
+# --- Examples from one record ---
+# Inputs: encoding, instruction, response (strings), max_tokens (int)
+# Output: list of (messages, tokens) for single-turn examples that each fit max_tokens, or an empty list
+#   if the instruction alone leaves no room for a response
+def record_examples(encoding, instruction, response, max_tokens):
+    messages = _turn(instruction, response)
+    tokens = count_tokens(encoding, messages)
+    if tokens <= max_tokens:
+        return [(messages, tokens)]
+
+    budget = max_tokens - count_tokens(encoding, _turn(instruction, ""))
+    if budget <= 0:
+        return []
+    examples = []
+    for piece in split_response(encoding, response, budget):
+        messages = _turn(instruction, piece)
+        examples.append((messages, count_tokens(encoding, messages)))
+    return examples
+
+
+# --- Packing ---
+# Next-fit packing of single-turn examples into conversations of at most max_tokens. Examples are packed in
+# corpus order as they stream past, so memory stays at one open conversation per split.
+class Packer:
+    def __init__(self, max_tokens, emit):
+        self.max_tokens = max_tokens
+        self.emit = emit
+        self.messages = []
+        self.tokens = 0
+
+    def add(self, messages, tokens):
+        # A conversation's token count is the sum of its turns' counts minus the shared primer
+        if self.messages and self.tokens + tokens - CONVERSATION_TOKENS > self.max_tokens:
+            self.flush()
+        if self.messages:
+            self.messages.extend(messages)
+            self.tokens += tokens - CONVERSATION_TOKENS
+        else:
+            self.messages, self.tokens = list(messages), tokens
+
+    def flush(self):
+        if self.messages:
+            self.emit(self.messages, self.tokens)
+        self.messages, self.tokens = [], 0
+
+
+# --- Sharded output ---
+# Writes JSONL lines to <prefix>-00000.jsonl, <prefix>-00001.jsonl, ... starting a new shard before a line
+# would take the current one over max_bytes
+class ShardWriter:
+    def __init__(self, directory, prefix, max_bytes):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.shards = []
+        self.tokens = []
+        self.file = None
+
+    def _open(self):
+        name = f"{self.prefix}-{len(self.shards):05d}.jsonl"
+        self.file = open(os.path.join(self.directory, name), "wb")
+        self.shards.append({"file": name, "examples": 0, "tokens": 0, "bytes": 0})
+        self.digest = hashlib.sha256()
+
+    def write(self, messages, tokens):
+        line = (json.dumps({"messages": messages}, ensure_ascii=False) + "\n").encode("utf-8")
+        if self.file is None or (self.shards[-1]["bytes"] and self.shards[-1]["bytes"] + len(line) > self.max_bytes):
+            self._close()
+            self._open()
+        self.file.write(line)
+        self.digest.update(line)
+        shard = self.shards[-1]
+        shard["examples"] += 1
+        shard["tokens"] += tokens
+        shard["bytes"] += len(line)
+        self.tokens.append(tokens)
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.shards[-1]["sha256"] = self.digest.hexdigest()
+            self.file = None
+
+    def close(self):
+        self._close()
+
+
+def _token_stats(tokens):
+    if not tokens:
+        return {"examples": 0, "tokens": 0}
+    tokens = sorted(tokens)
+    return {
+        "examples": len(tokens),
+        "tokens": sum(tokens),
+        "p50": round(metrics.percentile(tokens, 50)),
+        "p90": round(metrics.percentile(tokens, 90)),
+        "p99": round(metrics.percentile(tokens, 99)),
+        "max": tokens[-1],
+    }
+
+
+# --- Export ---
+# Inputs:
+#   corpus_path (string): SFT JSONL with instruction/response records (other records are ignored)
+#   output_dir (string): where shards and manifest.json are written; shards of an earlier export are replaced
+#   max_tokens (int): context length every example must fit, chat overhead included
+#   val_percent (number): share of records sent to the validation split
+#   shard_mb (number): maximum shard size
+#   pack (bool): pack short examples into multi-turn conversations
+#   encoding_name (string): tiktoken encoding; encoding (object with encode/decode) overrides it
+# Output: the manifest dict
+def export(corpus_path, output_dir, max_tokens=MAX_TOKENS, val_percent=VAL_PERCENT, shard_mb=SHARD_MB,
+           pack=True, encoding_name=DEFAULT_ENCODING, encoding=None):
+    encoding = encoding or load_encoding(encoding_name)
+    os.makedirs(output_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(output_dir, "train-*.jsonl")) + glob.glob(os.path.join(output_dir, "val-*.jsonl")):
+        os.remove(old)
+
+    max_bytes = int(shard_mb * 1024 * 1024)
+    writers = {split: ShardWriter(output_dir, split, max_bytes) for split in ("train", "val")}
+    packers = {split: Packer(max_tokens, writer.write) for split, writer in writers.items()}
+    counts = {"records": 0, "duplicates": 0, "skipped": 0, "split_records": 0, "parts": 0}
+    seen = set()
+
+    try:
+        for _, record, _ in iter_records(corpus_path):
+            instruction = str(record.get("instruction") or "").strip()
+            response = str(record.get("response") or "").strip()
+            if not response:
+                continue
+            counts["records"] += 1
+
+            digest = content_hash(normalize(f"{instruction}\n{response}"))
+            if digest in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(digest)
+
+            examples = record_examples(encoding, instruction, response, max_tokens)
+            if not examples:
+                # The instruction alone fills the context
+                counts["skipped"] += 1
+                continue
+            if len(examples) > 1:
+                counts["split_records"] += 1
+            counts["parts"] += len(examples)
+
+            split = assign_split(digest, val_percent)
+            for messages, tokens in examples:
+                if pack:
+                    packers[split].add(messages, tokens)
+                else:
+                    writers[split].write(messages, tokens)
+        for packer in packers.values():
+            packer.flush()
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    manifest = {
+        "source": os.path.abspath(corpus_path),
+        "encoding": getattr(encoding, "name", encoding_name),
+        "max_tokens": max_tokens,
+        "val_percent": val_percent,
+        "packed": pack,
+        **counts,
+        "splits": {split: _token_stats(writer.tokens) for split, writer in writers.items()},
+        "shards": writers["train"].shards + writers["val"].shards,
+    }
+    atomic_write(os.path.join(output_dir, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+# --- CLI usage ---
+# python sft.py <corpus.jsonl> <output_dir> [max_tokens] [val_percent] [shard_mb] [--no-pack] [--encoding NAME]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    pack = "--no-pack" not in args
+    if not pack:
+        args.remove("--no-pack")
+    encoding_name = DEFAULT_ENCODING
+    if "--encoding" in args:
+        index = args.index("--encoding")
+        if index + 1 >= len(args):
+            print("Error: --encoding needs a tiktoken encoding name")
+            sys.exit(1)
+        encoding_name = args[index + 1]
+        del args[index:index + 2]
+
+    if len(args) < 2:
+        print("Usage: python sft.py <corpus.jsonl> <output_dir> [max_tokens] [val_percent] [shard_mb] [--no-pack] [--encoding NAME]")
+        sys.exit(1)
+    if not os.path.exists(args[0]):
+        print(f"Error: corpus not found: {args[0]}")
+        sys.exit(1)
+
+    try:
+        with metrics.job("sft"):
+            with metrics.stage("export"):
+                manifest = export(
+                    args[0], args[1],
+                    max_tokens=int(args[2]) if len(args) > 2 else MAX_TOKENS,
+                    val_percent=float(args[3]) if len(args) > 3 else VAL_PERCENT,
+                    shard_mb=float(args[4]) if len(args) > 4 else SHARD_MB,
+                    pack=pack,
+                    encoding_name=encoding_name,
+                )
+                metrics.add(records=manifest["records"], examples=sum(s["examples"] for s in manifest["shards"]))
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"{manifest['records']} records, {manifest['duplicates']} duplicates dropped, "
+          f"{manifest['split_records']} split into {manifest['parts']} parts, {manifest['skipped']} skipped")
+    for split, stats in manifest["splits"].items():
+        if stats["examples"]:
+            print(f"{split}: {stats['examples']} examples, {stats['tokens']} tokens (p50 {stats['p50']}, max {stats['max']})")
+    print(f"{len(manifest['shards'])} shard(s) written to {args[1]}")
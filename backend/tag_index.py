@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import regex as re
+from collections import defaultdict
+
+import numpy as np
+
+from corpus import SEGMENT_RECORDS, iter_records, merge_window, read_records, save_concatenated, tail_digest, watermark_valid
+from writer import file_lock
+
+# Inverted tag index for the JSONL corpus.
+# Records are numbered in corpus order (their ordinal); for every `category.subcategory` tag the index
+# stores the sorted ordinals of the records carrying it, plus one array mapping ordinal -> byte offset.
+# Queries turn each tag's postings into a packed bitmap (cached), combine them with bitwise AND/OR/NOT,
+# and map the surviving ordinals back to offsets for direct seeks into the corpus.
+#
+# Layout (<corpus>.tags/):
+#   manifest.json            watermark + one entry per segment mapping tag -> [start, count]
+#   seg-NNNNNN.npy           the segment's postings, concatenated uint32 ordinals (memory-mapped on read)
+#   seg-NNNNNN.offsets.npy   uint64 byte offset of each record in the segment
+# Each sync() indexes the records appended since the watermark into a new segment (a new one every
+# SEGMENT_RECORDS records), and adjacent segments are merged in tiers (corpus.merge_window). Segments are
+# written in corpus order, so the concatenation of a tag's postings across segments is already sorted.
+
+TOKEN_RE = re.compile(r"\(|\)|[^\s()]+")
+
+
+class TagIndex:
+    # Inputs: corpus_path (string) JSONL corpus, index_dir (string) defaults to <corpus_path>.tags
+    def __init__(self, corpus_path, index_dir=None):
+        self.corpus_path = str(corpus_path)
+        self.index_dir = index_dir or self.corpus_path + ".tags"
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self._manifest = None
+        self._reset_caches()
+
+    def _reset_caches(self):
+        self._arrays = {}
+        self._postings = {}
+        self._bitmaps = {}
+        self._offsets = None
+
+    # --- Manifest ---
+    def _read_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"indexed_bytes": 0, "tail_digest": "", "records": 0, "next_segment": 0, "segments": []}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    # Number of indexed records
+    def __len__(self):
+        return self.manifest["records"]
+
+    # --- Segments ---
+    # Writes one segment from {tag: sorted ordinals} and the segment's record offsets
+    # Output: manifest entry for the segment
+    def _write_segment(self, manifest, postings, offsets, base):
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        directory = {}
+        arrays = []
+        start = 0
+        for tag in sorted(postings):
+            ordinals = np.asarray(postings[tag], dtype=np.uint32)
+            directory[tag] = [start, len(ordinals)]
+            arrays.append(ordinals)
+            start += len(ordinals)
+        np.save(os.path.join(self.index_dir, name + ".npy"), np.concatenate(arrays) if arrays else np.zeros(0, np.uint32))
+        np.save(os.path.join(self.index_dir, name + ".offsets.npy"), np.asarray(offsets, dtype=np.uint64))
+        return {"file": name, "base": base, "count": len(offsets), "tags": directory}
+
+    def _load(self, filename):
+        if filename not in self._arrays:
+            self._arrays[filename] = np.load(os.path.join(self.index_dir, filename), mmap_mode="r")
+        return self._arrays[filename]
+
+    # Merges the adjacent segments [start, stop) into one, copying each tag's postings from the memory-mapped
+    # segments straight into the memory-mapped output
+    # Output: file names of the replaced segments
+    def _merge(self, manifest, start, stop):
+        segments = manifest["segments"][start:stop]
+        total = sum(len(self._load(segment["file"] + ".npy")) for segment in segments)
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+
+        data = np.lib.format.open_memmap(os.path.join(self.index_dir, name + ".npy"), mode="w+", dtype=np.uint32,
+                                         shape=(total,))
+        directory = {}
+        position = 0
+        for tag in sorted(set().union(*(segment["tags"] for segment in segments))):
+            first = position
+            for segment in segments:
+                entry = segment["tags"].get(tag)
+                if entry:
+                    begin, count = entry
+                    data[position:position + count] = self._load(segment["file"] + ".npy")[begin:begin + count]
+                    position += count
+            directory[tag] = [first, position - first]
+        data.flush()
+        del data
+        save_concatenated(os.path.join(self.index_dir, name + ".offsets.npy"),
+                          [self._load(segment["file"] + ".offsets.npy") for segment in segments])
+
+        merged = {"file": name, "base": segments[0]["base"], "count": sum(segment["count"] for segment in segments),
+                  "tags": directory}
+        manifest["segments"][start:stop] = [merged]
+        return [segment["file"] for segment in segments]
+
+    # --- Catch up with the corpus ---
+    # Indexes records appended since the last sync (or rebuilds if the corpus was rewritten).
+    # Safe to call from several processes; updates are serialized by a lock on the manifest.
+    # Output: number of records indexed
+    def sync(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with file_lock(self.manifest_path):
+            manifest = self._read_manifest()
+            stale = []
+            if not watermark_valid(self.corpus_path, manifest["indexed_bytes"], manifest["tail_digest"]):
+                stale = [segment["file"] for segment in manifest["segments"]]
+                manifest.update(indexed_bytes=0, tail_digest="", records=0, segments=[])
+
+            added = 0
+            postings = defaultdict(list)
+            offsets = []
+
+            # Writes the buffered records as a segment, merges if a tier is full and advances the watermark
+            def commit(end):
+                nonlocal postings, offsets, added
+                if offsets:
+                    base = manifest["records"]
+                    manifest["segments"].append(self._write_segment(manifest, postings, offsets, base))
+                    manifest["records"] = base + len(offsets)
+                    added += len(offsets)
+                    window = merge_window([segment["count"] for segment in manifest["segments"]])
+                    while window:
+                        stale.extend(self._merge(manifest, *window))
+                        window = merge_window([segment["count"] for segment in manifest["segments"]])
+                manifest["indexed_bytes"] = end
+                manifest["tail_digest"] = tail_digest(self.corpus_path, end) if end else ""
+                self._write_manifest(manifest)
+                postings = defaultdict(list)
+                offsets = []
+
+            end = manifest["indexed_bytes"]
+            if os.path.exists(self.corpus_path):
+                for offset, record, end in iter_records(self.corpus_path, manifest["indexed_bytes"]):
+                    ordinal = manifest["records"] + len(offsets)
+                    offsets.append(offset)
+                    for tag in set(record.get("tags") or []):
+                        postings[tag].append(ordinal)
+                    if len(offsets) >= SEGMENT_RECORDS:
+                        commit(end)
+            commit(end)
+
+            self._reset_caches()
+            for name in stale:
+                os.remove(os.path.join(self.index_dir, name + ".npy"))
+                os.remove(os.path.join(self.index_dir, name + ".offsets.npy"))
+
+        self._manifest = manifest
+        return added
+
+    # --- Offsets ---
+    # Output: uint64 array mapping record ordinal -> byte offset in the corpus
+    def offsets(self):
+        if self._offsets is None:
+            parts = [self._load(segment["file"] + ".offsets.npy") for segment in self.manifest["segments"]]
+            self._offsets = np.concatenate(parts) if parts else np.zeros(0, np.uint64)
+        return self._offsets
+
+    # --- Postings ---
+    # Input: tag (string); "category.*" expands to every subcategory of the category
+    # Output: sorted uint32 array of the ordinals of records carrying the tag
+    def postings(self, tag):
+        if tag in self._postings:
+            return self._postings[tag]
+        if tag.endswith(".*"):
+            prefix = tag[:-1]
+            parts = [self.postings(t) for t in self.tags() if t.startswith(prefix)]
+            result = np.unique(np.concatenate(parts)) if parts else np.zeros(0, np.uint32)
+        else:
+            parts = []
+            for segment in self.manifest["segments"]:
+                if tag in segment["tags"]:
+                    start, count = segment["tags"][tag]
+                    parts.append(self._load(segment["file"] + ".npy")[start:start + count])
+            result = np.concatenate(parts) if parts else np.zeros(0, np.uint32)
+        self._postings[tag] = result
+        return result
+
+    # Packed bitmap (one bit per record) of the records carrying `tag`
+    def bitmap(self, tag):
+        if tag not in self._bitmaps:
+            bits = np.zeros(len(self), dtype=bool)
+            bits[self.postings(tag)] = True
+            self._bitmaps[tag] = np.packbits(bits)
+        return self._bitmaps[tag]
+
+    # Output: dict of tag -> number of records carrying it
+    def tags(self):
+        counts = defaultdict(int)
+        for segment in self.manifest["segments"]:
+            for tag, (_, count) in segment["tags"].items():
+                counts[tag] += count
+        return dict(counts)
+
+    # --- Query ---
+    # Evaluates a boolean tag expression, e.g.
+    #   "relationships.family AND (emotions.grief OR emotions.sadness) AND NOT drugs_recovery.*"
+    # Adjacent terms without an operator are ANDed.
+    # Input: expression (string)
+    # Output: sorted uint32 array of the ordinals of matching records
+    def query_ordinals(self, expression):
+        tokens = TOKEN_RE.findall(expression)
+        bits, pos = self._parse_or(tokens, 0)
+        if pos != len(tokens):
+            raise ValueError(f"Unexpected '{tokens[pos]}' in tag query: {expression}")
+        return np.flatnonzero(np.unpackbits(bits, count=len(self))).astype(np.uint32)
+
+    # Same as query_ordinals() but returns the records' byte offsets in the corpus
+    def query(self, expression):
+        return self.offsets()[self.query_ordinals(expression)]
+
+    def _parse_or(self, tokens, pos):
+        left, pos = self._parse_and(tokens, pos)
+        while pos < len(tokens) and tokens[pos].upper() == "OR":
+            right, pos = self._parse_and(tokens, pos + 1)
+            left = left | right
+        return left, pos
+
+    def _parse_and(self, tokens, pos):
+        left, pos = self._parse_not(tokens, pos)
+        while pos < len(tokens) and tokens[pos] != ")" and tokens[pos].upper() != "OR":
+            if tokens[pos].upper() == "AND":
+                pos += 1
+            right, pos = self._parse_not(tokens, pos)
+            left = left & right
+        return left, pos
+
+    def _parse_not(self, tokens, pos):
+        if pos < len(tokens) and tokens[pos].upper() == "NOT":
+            operand, pos = self._parse_not(tokens, pos + 1)
+            # Padding bits past the last record stay zero after unpackbits(count=...) so no masking is needed
+            return ~operand, pos
+        return self._parse_atom(tokens, pos)
+
+    def _parse_atom(self, tokens, pos):
+        if pos >= len(tokens):
+            raise ValueError("Tag query ended unexpectedly")
+        token = tokens[pos]
+        if token == "(":
+            result, pos = self._parse_or(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos] != ")":
+                raise ValueError("Missing ')' in tag query")
+            return result, pos + 1
+        if token == ")" or token.upper() in ("AND", "OR", "NOT"):
+            raise ValueError(f"Unexpected '{token}' in tag query")
+        return self.bitmap(token), pos + 1
+
+    # Evaluates a query and reads the matching records straight from the corpus
+    # Inputs: expression (string), limit (int or None)
+    # Output: list of (offset, record) tuples
+    def records(self, expression, limit=None):
+        offsets = self.query(expression)
+        if limit is not None:
+            offsets = offsets[:limit]
+        return list(zip(offsets.tolist(), read_records(self.corpus_path, offsets)))
+
+
+# --- CLI usage ---
+# python tag_index.py build <corpus.jsonl>
+# python tag_index.py tags <corpus.jsonl>
+# python tag_index.py query <corpus.jsonl> "<expression>" [limit]
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "tags", "query") or (sys.argv[1] == "query" and len(sys.argv) < 4):
+        print("Usage: python tag_index.py build <corpus.jsonl>")
+        print("       python tag_index.py tags <corpus.jsonl>")
+        print('       python tag_index.py query <corpus.jsonl> "<tag expression>" [limit]')
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if not os.path.exists(sys.argv[2]):
+        print(f"Error: corpus not found: {sys.argv[2]}")
+        sys.exit(1)
+    index = TagIndex(sys.argv[2])
+    added = index.sync()
+
+    if command == "build":
+        print(f"Indexed {added} new records ({index.manifest['indexed_bytes']} bytes of corpus)")
+    elif command == "tags":
+        for tag, count in sorted(index.tags().items(), key=lambda item: -item[1]):
+            print(f"{count:8d}  {tag}")
+    else:
+        limit = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        try:
+            matches = index.records(sys.argv[3], limit)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        for offset, record in matches:
+            print(json.dumps({"offset": offset, **record}, ensure_ascii=False))
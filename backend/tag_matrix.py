@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import hashlib
+import regex as re
+from multiprocessing import Pool
+
+import numpy as np
+
+from corpus import iter_records, record_text, tail_digest, watermark_valid
+from writer import file_lock
+import tagger
+
+# scipy is only needed by this tool: pip install scipy
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+# Corpus tag analytics for tuning regex_tag_patterns.
+# Runs the tagger over every record of the corpus and keeps the results as sparse matrices, one row per
+# record in corpus order:
+#   patterns  records x patterns  matches of each pattern in tagger.flat_tag_patterns()
+#   context   records x tags      the context-aware extra scores (tagger.context_scores)
+# The tag score matrix (records x tags) is patterns @ A + context, where A maps each pattern to its tag;
+# row r holds exactly the scores suggest_tags() ranks for record r. Frequencies, co-occurrence, per-title
+# profiles and pattern diagnostics are all computed on these matrices with sparse linear algebra, so they
+# take seconds on corpora where looping over records in Python does not.
+#
+# Layout (<corpus>.tagmatrix/):
+#   manifest.json      watermark, digest of the tag patterns, tag and pattern names
+#   patterns.npz       CSR int32 pattern matches
+#   context.npz        CSR int32 context scores
+#   offsets.npy        uint64 byte offset of each record
+#   titles.json        the title (RAG) or instruction (SFT) of each record
+# sync() tags only records appended since the last run; editing the patterns rebuilds the matrices.
+#
+# Usage: python tag_matrix.py build | tags | patterns | pairs | titles <corpus.jsonl> [limit]
+
+# Records handed to each tagging worker at a time
+TAG_BATCH = 32
+# Co-occurring tag pairs need at least this many records to be reported
+MIN_PAIR_COUNT = 5
+# Patterns matching more than this share of records are flagged as too broad
+BROAD_SHARE = 0.25
+
+PART_PATTERN = re.compile(r"\s+\(part \d+\)$")
+
+
+# --- Names ---
+# Output: (tags, pattern_tags, pattern_sources): tag names in regex_tag_patterns order, the tag column of
+#   every pattern column, and the pattern strings
+def tag_columns():
+    flat = tagger.flat_tag_patterns()
+    tags = list(dict.fromkeys(tag for tag, _ in flat))
+    column = {tag: i for i, tag in enumerate(tags)}
+    return tags, [column[tag] for tag, _ in flat], [pattern.pattern for _, pattern in flat]
+
+
+# Changes whenever a pattern is added, removed, edited or moved, which invalidates the stored matrices
+def patterns_digest(pattern_sources, tags):
+    return hashlib.sha256(json.dumps([tags, pattern_sources]).encode("utf-8")).hexdigest()
+
+
+# Groups the parts of one transcript: "Title (part 3)" -> "Title"
+def title_group(title):
+    return PART_PATTERN.sub("", title or "")
+
+
+# Runs in the worker processes
+def _tag_record(text):
+    return tagger.pattern_counts(text), tagger.context_scores(text)
+
+
+class TagMatrix:
+    # Inputs: corpus_path (string) JSONL corpus, index_dir (string) defaults to <corpus_path>.tagmatrix
+    def __init__(self, corpus_path, index_dir=None):
+        if sparse is None:
+            raise RuntimeError("Tag analytics need the 'scipy' package. Install it with: pip install scipy")
+        self.corpus_path = str(corpus_path)
+        self.index_dir = index_dir or self.corpus_path + ".tagmatrix"
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self.tags, self.pattern_tags, self.pattern_sources = tag_columns()
+        self.patterns = None
+        self.context = None
+        self.offsets = None
+        self.titles = None
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _read_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"indexed_bytes": 0, "tail_digest": "", "records": 0, "patterns_digest": ""}
+
+    def _load(self, manifest):
+        if manifest["records"]:
+            self.patterns = sparse.load_npz(self._path("patterns.npz")).tocsr()
+            self.context = sparse.load_npz(self._path("context.npz")).tocsr()
+            self.offsets = np.load(self._path("offsets.npy"))
+            with open(self._path("titles.json"), encoding="utf-8") as f:
+                self.titles = json.load(f)
+        else:
+            self.patterns = sparse.csr_matrix((0, len(self.pattern_sources)), dtype=np.int32)
+            self.context = sparse.csr_matrix((0, len(self.tags)), dtype=np.int32)
+            self.offsets = np.zeros(0, np.uint64)
+            self.titles = []
+
+    # --- Tag new records ---
+    # Input: start (int) byte offset in the corpus, workers (int) tagging processes
+    # Output: (pattern matrix, context matrix, offsets, titles, end offset) for the records after start
+    def _tag_from(self, start, workers):
+        offsets = []
+        titles = []
+        end = start
+
+        def texts():
+            nonlocal end
+            for offset, record, end in iter_records(self.corpus_path, start):
+                offsets.append(offset)
+                titles.append(record.get("title") or record.get("instruction") or "")
+                yield record_text(record)
+
+        tag_column = {tag: i for i, tag in enumerate(self.tags)}
+        pattern_entries = ([], [], [])
+        context_entries = ([], [], [])
+        if workers > 1:
+            pool = Pool(workers)
+            results = pool.imap(_tag_record, texts(), chunksize=TAG_BATCH)
+        else:
+            pool = None
+            results = map(_tag_record, texts())
+        try:
+            for row, (counts, extra) in enumerate(results):
+                for column, count in counts:
+                    pattern_entries[0].append(row)
+                    pattern_entries[1].append(column)
+                    pattern_entries[2].append(count)
+                for tag, score in extra.items():
+                    context_entries[0].append(row)
+                    context_entries[1].append(tag_column[tag])
+                    context_entries[2].append(score)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        def build(entries, columns):
+            rows, cols, data = (np.asarray(values, dtype=np.int32) for values in entries)
+            return sparse.csr_matrix((data, (rows, cols)), shape=(len(offsets), columns), dtype=np.int32)
+
+        return (build(pattern_entries, len(self.pattern_sources)), build(context_entries, len(self.tags)),
+                np.asarray(offsets, dtype=np.uint64), titles, end)
+
+    # --- Catch up with the corpus ---
+    # Tags the records appended since the last sync, or everything if the corpus was rewritten or the tag
+    # patterns changed. Updates are serialized by a lock on the manifest.
+    # Input: workers (int) tagging processes, defaults to the number of CPUs
+    # Output: number of records tagged
+    def sync(self, workers=None):
+        workers = workers or os.cpu_count() or 1
+        digest = patterns_digest(self.pattern_sources, self.tags)
+        os.makedirs(self.index_dir, exist_ok=True)
+        with file_lock(self.manifest_path):
+            manifest = self._read_manifest()
+            if (manifest["patterns_digest"] != digest
+                    or not watermark_valid(self.corpus_path, manifest["indexed_bytes"], manifest["tail_digest"])):
+                manifest = {"indexed_bytes": 0, "tail_digest": "", "records": 0, "patterns_digest": digest}
+            self._load(manifest)
+            if not os.path.exists(self.corpus_path):
+                return 0
+
+            patterns, context, offsets, titles, end = self._tag_from(manifest["indexed_bytes"], workers)
+            if len(offsets) or end != manifest["indexed_bytes"] or manifest["records"] == 0:
+                self.patterns = sparse.vstack([self.patterns, patterns], format="csr", dtype=np.int32)
+                self.context = sparse.vstack([self.context, context], format="csr", dtype=np.int32)
+                self.offsets = np.concatenate([self.offsets, offsets])
+                self.titles = self.titles + titles
+                sparse.save_npz(self._path("patterns.npz"), self.patterns)
+                sparse.save_npz(self._path("context.npz"), self.context)
+                np.save(self._path("offsets.npy"), self.offsets)
+                with open(self._path("titles.json"), "w", encoding="utf-8") as f:
+                    json.dump(self.titles, f, ensure_ascii=False)
+
+                manifest.update(indexed_bytes=end, tail_digest=tail_digest(self.corpus_path, end) if end else "",
+                                records=len(self.offsets), tags=self.tags, patterns=self.pattern_sources)
+                tmp_path = self.manifest_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+                os.replace(tmp_path, self.manifest_path)
+        return len(offsets)
+
+    # --- Matrices ---
+    # Output: CSR (patterns x tags) with a 1 where the pattern belongs to the tag
+    def pattern_to_tag(self):
+        count = len(self.pattern_sources)
+        return sparse.csr_matrix((np.ones(count, np.int32), (np.arange(count), self.pattern_tags)),
+                                 shape=(count, len(self.tags)))
+
+    # Output: CSR (records x tags) of the scores suggest_tags() ranks
+    def scores(self):
+        return (self.patterns @ self.pattern_to_tag() + self.context).tocsr()
+
+
+# --- Tag frequencies ---
+# Input: scores (records x tags sparse matrix)
+# Output: (records carrying each tag, total score of each tag) as arrays
+def frequencies(scores):
+    present = (scores > 0).astype(np.int32)
+    return np.asarray(present.sum(axis=0)).ravel(), np.asarray(scores.sum(axis=0)).ravel()
+
+
+# --- Co-occurrence ---
+# Inputs: scores (records x tags), min_count (int)
+# Output: list of (tag i, tag j, records with both, lift) for i < j with at least min_count records, by lift;
+#   lift is how much more often the pair occurs than if the tags were independent
+def cooccurrence(scores, min_count=MIN_PAIR_COUNT):
+    present = (scores > 0).astype(np.int32).tocsc()
+    records = scores.shape[0]
+    df = np.asarray(present.sum(axis=0)).ravel()
+    pairs = sparse.triu(present.T @ present, k=1).tocoo()
+    keep = pairs.data >= min_count
+    rows, cols, both = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    lift = both * float(records) / (df[rows].astype(np.float64) * df[cols])
+    order = np.lexsort((-both, -lift))
+    return [(int(rows[k]), int(cols[k]), int(both[k]), float(lift[k])) for k in order]
+
+
+# --- Per-title profiles ---
+# Sums the scores of all records with the same title (parts of one transcript count as one title) and
+# normalizes each title's row to shares of its total
+# Inputs: scores (records x tags), titles (list of strings, one per record)
+# Output: (title names, CSR titles x tags of score shares, records per title)
+def title_profiles(scores, titles):
+    names, group = np.unique(np.asarray([title_group(t) for t in titles], dtype=object), return_inverse=True)
+    records = scores.shape[0]
+    membership = sparse.csr_matrix((np.ones(records, np.int32), (group, np.arange(records))), shape=(len(names), records))
+    profile = (membership @ scores).astype(np.float64).tocsr()
+    totals = np.asarray(profile.sum(axis=1)).ravel()
+    totals[totals == 0] = 1
+    shares = sparse.diags(1.0 / totals) @ profile
+    return list(names), shares.tocsr(), np.asarray(membership.sum(axis=1)).ravel()
+
+
+# --- Pattern diagnostics ---
+# Inputs: patterns (records x patterns), pattern_to_tag (patterns x tags), pattern_tags (tag column of each pattern)
+# Output: (records each pattern matches, records where it is the only pattern of its tag that matches)
+#   A pattern that matches but is never the only one is redundant for tagging.
+def pattern_stats(patterns, pattern_to_tag, pattern_tags):
+    present = (patterns > 0).astype(np.int32).tocsr()
+    df = np.asarray(present.sum(axis=0)).ravel()
+    # Number of distinct patterns of each tag matching each record, gathered back per pattern column
+    per_tag = (present @ pattern_to_tag).tocsc()
+    alone = present.multiply(per_tag[:, pattern_tags] == 1)
+    return df, np.asarray(alone.sum(axis=0)).ravel()
+
+
+USAGE = "Usage: python tag_matrix.py build | tags | patterns | pairs | titles <corpus.jsonl> [limit]"
+
+
+# --- CLI usage ---
+# python tag_matrix.py build <corpus.jsonl>              tag new records
+# python tag_matrix.py tags <corpus.jsonl> [limit]       tag frequencies
+# python tag_matrix.py patterns <corpus.jsonl> [limit]   broadest, redundant and unused patterns
+# python tag_matrix.py pairs <corpus.jsonl> [limit]      tag pairs that occur together more than chance
+# python tag_matrix.py titles <corpus.jsonl> [limit]     top tags of each title
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "tags", "patterns", "pairs", "titles"):
+        print(USAGE)
+        sys.exit(1)
+    command, corpus_path = sys.argv[1], sys.argv[2]
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 25
+    if not os.path.exists(corpus_path):
+        print(f"Error: corpus not found: {corpus_path}")
+        sys.exit(1)
+
+    try:
+        matrix = TagMatrix(corpus_path)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    added = matrix.sync()
+    records = matrix.patterns.shape[0]
+
+    if command == "build":
+        print(f"Tagged {added} new records ({records} in total, {matrix.patterns.nnz} pattern matches)")
+    elif command == "tags":
+        df, total = frequencies(matrix.scores())
+        print(f"{'records':>8s} {'share':>7s} {'score':>8s}  tag")
+        for column in np.argsort(-df, kind="stable")[:limit]:
+            print(f"{df[column]:8d} {df[column] / max(records, 1):7.1%} {total[column]:8d}  {matrix.tags[column]}")
+        unused = [matrix.tags[column] for column in np.flatnonzero(df == 0)]
+        print(f"\n{len(unused)} of {len(matrix.tags)} tags never assigned" + (f": {', '.join(unused[:limit])}" if unused else ""))
+    elif command == "patterns":
+        df, alone = pattern_stats(matrix.patterns, matrix.pattern_to_tag(), matrix.pattern_tags)
+        share = df / max(records, 1)
+
+        def show(title, columns):
+            print(title)
+            print(f"  {'records':>8s} {'share':>7s} {'alone':>8s}  tag / pattern")
+            for column in columns[:limit]:
+                flag = "!" if share[column] > BROAD_SHARE else " "
+                print(f"{flag} {df[column]:8d} {share[column]:7.1%} {alone[column]:8d}  "
+                      f"{matrix.tags[matrix.pattern_tags[column]]}  {matrix.pattern_sources[column][:100]}")
+
+        show(f"Broadest patterns (! = over {BROAD_SHARE:.0%} of records):", np.argsort(-df, kind="stable"))
+        show("\nRedundant patterns (match, but always together with another pattern of the same tag):",
+             np.flatnonzero((df > 0) & (alone == 0)))
+        unused = np.flatnonzero(df == 0)
+        print(f"\n{len(unused)} of {len(df)} patterns never match")
+        for column in unused[:limit]:
+            print(f"  {matrix.tags[matrix.pattern_tags[column]]}  {matrix.pattern_sources[column][:100]}")
+    elif command == "pairs":
+        print(f"{'records':>8s} {'lift':>7s}  tags")
+        for i, j, both, lift in cooccurrence(matrix.scores())[:limit]:
+            print(f"{both:8d} {lift:7.2f}  {matrix.tags[i]} + {matrix.tags[j]}")
+    else:
+        names, shares, counts = title_profiles(matrix.scores(), matrix.titles)
+        for row in np.argsort(-counts, kind="stable")[:limit]:
+            start, end = shares.indptr[row], shares.indptr[row + 1]
+            columns, values = shares.indices[start:end], shares.data[start:end]
+            top = np.argsort(-values, kind="stable")[:5]
+            print(f"{names[row] or '(untitled)'} ({counts[row]} records): "
+                  + ", ".join(f"{matrix.tags[columns[k]]} {values[k]:.0%}" for k in top))
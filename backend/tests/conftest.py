@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules (python process.py ...), so put the backend
+# directory on the path the same way running a script from it does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Keeps tests from writing to the user's metrics log and caches, or loading an embedding model
+@pytest.fixture(autouse=True)
+def isolated_environment(monkeypatch):
+    monkeypatch.setenv("MEMORY_FORGE_METRICS", "off")
+    monkeypatch.setenv("MEMORY_FORGE_CACHE", "off")
+    monkeypatch.setenv("MEMORY_FORGE_EMBEDDINGS", "0")
+    monkeypatch.delenv("MEMORY_FORGE_PROFILE", raising=False)
@@ -0,0 +1,185 @@
+import os
+import json
+
+import pytest
+
+import batch_punctuate
+from batch_punctuate import LocalBatchClient, _echo_transcript, create, load_state, reconcile, run, submit, wait
+from transcript import iter_chunks, iter_text
+
+# Batch punctuation end to end against LocalBatchClient, the on-disk stand-in for the Batch API endpoints.
+# The stand-in "punctuates" by upper-casing the transcript part of each prompt, so every written record can
+# be traced back to the chunk it came from.
+
+
+def shout(body):
+    return _echo_transcript(body).upper()
+
+
+# Two transcripts: a short one (one chunk) and a long one (several chunks)
+@pytest.fixture
+def transcripts(tmp_path):
+    folder = tmp_path / "transcripts"
+    folder.mkdir()
+    (folder / "a_short.txt").write_text("[00:00.000 --> 00:02.000] we skipped school and went to brooklyn\n")
+    # Distinct words per line, so the corpus' near-duplicate check keeps every chunk
+    lines = [f"[00:{i % 60:02d}.000 --> 00:{i % 60:02d}.500] " + " ".join(f"word{(i * 37 + j) % 4999}" for j in range(12))
+             for i in range(400)]
+    (folder / "b_long.txt").write_text("\n".join(lines) + "\n")
+    return folder
+
+
+def expected_records(folder, title):
+    records = []
+    for path in sorted(folder.iterdir()):
+        chunks = list(iter_chunks(iter_text(str(path))))
+        name = path.stem
+        for part, chunk in enumerate(chunks, 1):
+            records.append({
+                "title": f"{title}: {name}" if len(chunks) == 1 else f"{title}: {name} (part {part})",
+                "content": chunk.upper(),
+            })
+    return records
+
+
+def written_records(output_path):
+    with open(output_path, encoding="utf-8") as f:
+        return [{"title": record["title"], "content": record["content"]} for record in map(json.loads, f)]
+
+
+def new_run(tmp_path, transcripts):
+    state_dir = str(tmp_path / "state")
+    output_path = str(tmp_path / "out.jsonl")
+    create(state_dir, [str(transcripts)], "rag", output_path, "Batch")
+    return state_dir, output_path
+
+
+def test_submit_poll_and_reconcile_by_custom_id(tmp_path, transcripts):
+    state_dir, output_path = new_run(tmp_path, transcripts)
+    client = LocalBatchClient(str(tmp_path / "api"), complete=shout, polls=2)
+    state = load_state(state_dir)
+    batch_punctuate.prepare(state_dir, state)
+    assert state["items"][1]["parts"] > 1
+    submit(state_dir, state, client)
+    wait(state_dir, state, client, poll_seconds=0)
+    assert [batch["status"] for batch in state["batches"]] == ["completed"]
+
+    # Results come back in any order; reverse the file so only the custom_ids can put them in place
+    results_path = os.path.join(state_dir, state["batches"][0]["results"])
+    with open(results_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(results_path, "w", encoding="utf-8") as f:
+        f.writelines(reversed(lines))
+
+    assert reconcile(state_dir, state) == set()
+    assert written_records(output_path) == expected_records(transcripts, "Batch")
+    assert all(item["written"] is True for item in load_state(state_dir)["items"])
+
+
+def test_failed_requests_are_resubmitted(tmp_path, transcripts):
+    state_dir, output_path = new_run(tmp_path, transcripts)
+    failed_once = set()
+
+    # The second chunk of the long transcript fails the first time it is sent
+    def fail(custom_id):
+        if custom_id == "1-1" and custom_id not in failed_once:
+            failed_once.add(custom_id)
+            return True
+        return False
+
+    client = LocalBatchClient(str(tmp_path / "api"), complete=shout, fail=fail)
+    state = run(state_dir, client, poll_seconds=0)
+
+    assert [batch["count"] for batch in state["batches"]][1:] == [1]
+    assert state["batches"][0]["errors"]
+    assert written_records(output_path) == expected_records(transcripts, "Batch")
+
+
+class ExpiringBatchClient(LocalBatchClient):
+    # The first batch expires without any output, as the Batch API does when the completion window runs out
+    expired = False
+
+    def _run(self, batch):
+        if not ExpiringBatchClient.expired:
+            ExpiringBatchClient.expired = True
+            batch["status"] = "expired"
+            return
+        super()._run(batch)
+
+
+def test_expired_batch_is_resubmitted(tmp_path, transcripts):
+    state_dir, output_path = new_run(tmp_path, transcripts)
+    ExpiringBatchClient.expired = False
+    client = ExpiringBatchClient(str(tmp_path / "api"), complete=shout)
+    state = run(state_dir, client, poll_seconds=0)
+
+    assert [batch["status"] for batch in state["batches"]] == ["expired", "completed"]
+    assert state["batches"][1]["count"] == state["batches"][0]["count"]
+    assert written_records(output_path) == expected_records(transcripts, "Batch")
+
+
+def test_resume_after_interruption_between_submit_and_reconcile(tmp_path, transcripts):
+    state_dir, output_path = new_run(tmp_path, transcripts)
+    api_dir = str(tmp_path / "api")
+    state = load_state(state_dir)
+    batch_punctuate.prepare(state_dir, state)
+    submit(state_dir, state, LocalBatchClient(api_dir, complete=shout, polls=3))
+    batch_id = state["batches"][0]["batch_id"]
+    # The process stops here: nothing was polled or written yet
+    assert not os.path.exists(output_path)
+
+    # A new process with a new client picks the run up from state.json alone
+    resumed = run(state_dir, LocalBatchClient(api_dir, complete=shout, polls=3), poll_seconds=0)
+    assert [batch["batch_id"] for batch in resumed["batches"]] == [batch_id]
+    assert written_records(output_path) == expected_records(transcripts, "Batch")
+
+    # Resuming a finished run neither submits nor writes anything again
+    again = run(state_dir, LocalBatchClient(api_dir, complete=shout), poll_seconds=0)
+    assert len(again["batches"]) == 1
+    assert written_records(output_path) == expected_records(transcripts, "Batch")
+
+
+class InterruptedClient(LocalBatchClient):
+    # Stops (like Ctrl-C) after the request file is uploaded but before the batch is created
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        raise KeyboardInterrupt
+
+
+def test_resume_after_interruption_between_upload_and_batch_create(tmp_path, transcripts):
+    state_dir, output_path = new_run(tmp_path, transcripts)
+    api_dir = str(tmp_path / "api")
+    with pytest.raises(KeyboardInterrupt):
+        run(state_dir, InterruptedClient(api_dir, complete=shout), poll_seconds=0)
+    file_id = load_state(state_dir)["batches"][0]["file_id"]
+    assert file_id is not None
+
+    # The uploaded file is reused rather than uploaded again
+    state = run(state_dir, LocalBatchClient(api_dir, complete=shout), poll_seconds=0)
+    assert [batch["file_id"] for batch in state["batches"]] == [file_id]
+    assert written_records(output_path) == expected_records(transcripts, "Batch")
+
+
+def test_empty_and_failing_transcripts_do_not_block_the_run(tmp_path, transcripts, monkeypatch):
+    (transcripts / "c_empty.txt").write_text("")
+    state_dir, output_path = new_run(tmp_path, transcripts)
+
+    # The short transcript fails inside process(), e.g. because its file cannot be read any more
+    real_process = batch_punctuate.process
+
+    def process(path, *args, **kwargs):
+        if path.endswith("a_short.txt"):
+            raise RuntimeError("disk on fire")
+        return real_process(path, *args, **kwargs)
+
+    monkeypatch.setattr(batch_punctuate, "process", process)
+    state = run(state_dir, LocalBatchClient(str(tmp_path / "api"), complete=shout), poll_seconds=0)
+
+    assert [item["written"] for item in state["items"]] == ["failed", True, "empty"]
+    assert state["items"][0]["error"] == "disk on fire"
+    assert written_records(output_path) == [record for record in expected_records(transcripts, "Batch")
+                                            if record["title"].startswith("Batch: b_long")]
+
+    # Resuming neither retries the failed transcript nor writes anything twice
+    again = run(state_dir, LocalBatchClient(str(tmp_path / "api"), complete=shout), poll_seconds=0)
+    assert [item["written"] for item in again["items"]] == ["failed", True, "empty"]
+    assert len(written_records(output_path)) == len(expected_records(transcripts, "Batch")) - 1
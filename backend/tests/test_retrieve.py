@@ -0,0 +1,77 @@
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+import retrieve
+from corpus import iter_records
+from embeddings import VectorIndex
+from retrieve import HybridRetriever
+from writer import JsonlWriter
+
+# Hybrid retrieval over a small corpus, with a deterministic stand-in for the embedding model
+
+
+def embed(texts):
+    vectors = np.zeros((len(texts), 32), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.split():
+            vectors[row, zlib.crc32(word.encode("utf-8")) % 32] += 1
+    return vectors + 1e-3
+
+
+def record(i):
+    return {"title": f"Memory {i}", "content": f"story{i} about river{i % 7} and family{i % 3}",
+            "tags": [f"topic.t{i % 4}"]}
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieve, "suggest_tags", lambda query, top_n=5: [])
+    path = str(tmp_path / "corpus.jsonl")
+    with JsonlWriter(path, dedup="replace") as writer:
+        writer.write_many(record(i) for i in range(20))
+    VectorIndex(path, embed_fn=embed).sync()
+    return path
+
+
+def offsets(path):
+    return {offset for offset, _, _ in iter_records(path)}
+
+
+def test_vector_stage_is_used_when_the_index_matches(corpus):
+    retriever = HybridRetriever(corpus, embed_fn=embed)
+    assert retriever.vectors is not None
+    results = retriever.search("story3 river3", k=5)
+    assert any("vector" in result["ranks"] for result in results)
+    assert {result["offset"] for result in results} <= offsets(corpus)
+
+
+def test_vector_stage_is_dropped_after_compaction(corpus, capsys):
+    # Replacing early records removes their lines, so every later record moves
+    with JsonlWriter(corpus, dedup="replace") as writer:
+        writer.write_many(record(i) for i in range(3))
+
+    retriever = HybridRetriever(corpus, embed_fn=embed)
+    assert retriever.vectors is None
+    assert "Not using the vector index" in capsys.readouterr().err
+
+    results = retriever.search("story3 river3", k=5, tags="topic.t3")
+    assert results and all("vector" not in result["ranks"] for result in results)
+    assert {result["offset"] for result in results} <= offsets(corpus)
+
+    # Re-embedding brings the vector stage back
+    VectorIndex(corpus, embed_fn=embed).sync()
+    assert HybridRetriever(corpus, embed_fn=embed).vectors is not None
+
+
+def test_vector_stage_is_dropped_when_the_index_was_built_with_another_model(corpus):
+    manifest_path = corpus + ".vectors/manifest.json"
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["model"] = "some/other-model"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    assert HybridRetriever(corpus, embed_fn=embed).vectors is None
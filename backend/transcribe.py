@@ -1,22 +1,275 @@
 import sys
 import os
+import json
+import types
 import tempfile
-import whisper
+import importlib
+import threading
+import subprocess
+from contextlib import contextmanager
 from process import process
+from cache import SAMPLE_RATE, PcmCache, TranscriptCache, transcript_entry
+from progress import Job, bind, report, scope, stderr_sink
+import metrics
+import profiling
 import traceback
 
+# Whisper model size used for transcription
+MODEL_SIZE = "tiny"
+WHISPER_TASKS = ("transcribe", "translate")
+# Whisper keeps at most ~220 tokens of the initial prompt; stay under that so the names are not cut
+PROMPT_CHARS = 800
+
+# Loaded Whisper models by size, so a long-running backend (server.py) loads each model only once
+_models = {}
+_models_lock = threading.Lock()
+# Whisper models are not safe to run from several threads at once
+_transcribe_lock = threading.Lock()
+# Whisper's mel frames per second of audio (10 ms hop at 16 kHz)
+FRAMES_PER_SECOND = 100
+
+
+# --- Load Whisper model ---
+# Loads (once per process) and returns the Whisper model of the given size
+# (whisper is imported only here: it pulls in torch, which takes seconds to load)
+# Input: size (string) Whisper model name, e.g. "tiny"
+# Output: loaded Whisper model
+def load_model(size=MODEL_SIZE):
+    with _models_lock:
+        if size not in _models:
+            import whisper
+            _models[size] = whisper.load_model(size)
+        return _models[size]
+
+
+# --- Whisper decoding options ---
+# Without a language Whisper detects it from the first 30 seconds of every file, and may then decode in a
+# different language than intended; with a task and an initial prompt it also knows whether to translate
+# and how names are spelled.
+# Inputs:
+#   language (string or None): language code or name, e.g. "en" or "english"; None, "" or "auto" detects it
+#   task (string or None): "transcribe" (default) or "translate" (to English)
+#   initial_prompt (string or None): text Whisper treats as preceding the audio; "taxonomy" uses
+#       taxonomy_prompt()
+# Output: dict of the options that are set, for model.transcribe(**options) and the transcript cache key
+def whisper_options(language=None, task=None, initial_prompt=None):
+    options = {}
+    if language and language.strip().lower() != "auto":
+        options["language"] = language.strip().lower()
+    if task and task not in WHISPER_TASKS:
+        raise ValueError(f"Unknown Whisper task: {task} (use {' or '.join(WHISPER_TASKS)})")
+    # "transcribe" is Whisper's default; leaving it out keeps cache keys of earlier runs valid
+    if task == "translate":
+        options["task"] = task
+    if initial_prompt:
+        options["initial_prompt"] = taxonomy_prompt() if initial_prompt == "taxonomy" else initial_prompt
+    return options
+
+
+# --- Prompt from the tag taxonomy ---
+# Lists the people and places the tagger looks for, so Whisper spells them the way the patterns expect
+# Output: prompt string of at most PROMPT_CHARS characters
+def taxonomy_prompt():
+    from tagger import proper_nouns
+    prompt = "Names and places:"
+    for name in proper_nouns():
+        if len(prompt) + len(name) + 2 > PROMPT_CHARS - 1:
+            break
+        prompt += (" " if prompt.endswith(":") else ", ") + name
+    return prompt + "."
+
+
+# --- Decode audio ---
+# Decodes an audio file to 16 kHz mono float32 samples with ffmpeg (as whisper.load_audio does), once per
+# file: the samples are kept in the PCM cache and memory-mapped on later runs
+# Input: mp3_path (string)
+# Output: float32 numpy array (a memory map when it comes from the cache)
+def load_audio(mp3_path):
+    import numpy as np
+    cache = PcmCache()
+    key = None
+    if cache.enabled:
+        key = cache.key(mp3_path)
+        samples = cache.get(key)
+        if samples is not None:
+            return samples
+
+    # ffmpeg writes raw 16-bit samples to a temporary file next to the cache (not into memory)
+    tmp_dir = cache.directory if key is not None else None
+    if tmp_dir:
+        os.makedirs(tmp_dir, exist_ok=True)
+    fd, raw_path = tempfile.mkstemp(dir=tmp_dir, suffix=".s16le")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            command = [
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0", "-i", mp3_path,
+                "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+            ]
+            try:
+                result = subprocess.run(command, stdout=raw, stderr=subprocess.PIPE)
+            except FileNotFoundError:
+                raise RuntimeError("ffmpeg not found. Please install it and make sure it is on PATH.")
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to decode audio: {result.stderr.decode(errors='replace').strip()}")
+
+        if key is None:
+            return np.fromfile(raw_path, dtype="<i2").astype(np.float32) / 32768.0
+        return cache.put_raw(key, raw_path)
+    finally:
+        os.remove(raw_path)
+
+
+# --- Progress inside Whisper ---
+# whisper.transcribe() has no segment callback. It does advance a tqdm bar over the audio frames after
+# every decoded window, even when the bar is hidden. While _transcribe_lock is held, the module's tqdm is
+# swapped for _FrameProgress, which turns those updates into report() calls. The transcribe stage then
+# shows progress, and a cancelled job stops at the next window instead of running to the end of the file.
+class _FrameProgress:
+    # start, end: overall percentages the transcription spans
+    def __init__(self, start, end, total=None, **kwargs):
+        self.start = start
+        self.end = end
+        self.total = total or 0
+        self.frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, frames=1):
+        self.frames += frames
+        done = min(self.frames / self.total, 1.0) if self.total else 0.0
+        report("transcribe", self.start + (self.end - self.start) * done,
+               audio_seconds=round(self.frames / FRAMES_PER_SECOND, 1))
+
+
+# Inputs: start, end (float) overall percentages the transcription spans
+# Output: context manager; does nothing if this Whisper version does not use tqdm
+@contextmanager
+def whisper_progress(start, end):
+    try:
+        module = importlib.import_module("whisper.transcribe")
+    except ImportError:
+        module = None
+    original = getattr(module, "tqdm", None)
+    if not hasattr(original, "tqdm"):
+        yield
+        return
+    module.tqdm = types.SimpleNamespace(tqdm=lambda *args, **kwargs: _FrameProgress(start, end, *args, **kwargs))
+    try:
+        yield
+    finally:
+        module.tqdm = original
+
+
+# --- Transcribe ---
+# Runs Whisper on an audio file, or reuses the cached result for the same audio, model and options
+# Inputs: mp3_path (string), model_size (string), options (dict or None) extra Whisper decoding options
+# Output: (path of the Whisper JSON transcript, whether it is a temporary file the caller must remove)
+def transcribe_audio(mp3_path, model_size=MODEL_SIZE, options=None):
+    options = options or {}
+    cache = TranscriptCache()
+    key = None
+    if cache.enabled:
+        report("cache", 0)
+        with metrics.stage("cache"):
+            key = cache.key(mp3_path, model_size, options)
+            cached = cache.get(key)
+        if cached:
+            print(f"Using cached transcription: {cached}")
+            report("transcribe", 50, cached=True)
+            return cached, False
+
+    # Initialize the Whisper speech recognition model
+    print("Transcribing with Whisper...")
+    report("load_model", 0, model=model_size)
+    with metrics.stage("load_model"):
+        model = load_model(model_size)
+
+    # Decode the audio (or map the cached samples)
+    report("decode", 3)
+    with metrics.stage("decode"):
+        audio = load_audio(mp3_path)
+
+    # Perform the actual transcription of the audio file
+    with _transcribe_lock:
+        report("transcribe", 5)
+        with metrics.stage("transcribe"), whisper_progress(5, 50):
+            result = model.transcribe(audio, **options)
+            metrics.add(model=model_size, audio_seconds=len(audio) / SAMPLE_RATE,
+                        language=result.get("language"), language_given="language" in options)
+    report("transcribe", 50, segments=len(result.get("segments", [])))
+
+    if key is not None:
+        return cache.put(key, result), False
+
+    # No cache: save the transcription to a temporary Whisper JSON file
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False, mode="w", encoding="utf-8") as tmp:
+        json.dump(transcript_entry(result), tmp, ensure_ascii=False)
+        return tmp.name, True
+
+
+# --- Transcribe and process ---
+# Transcribes an audio file with Whisper and processes the text according to the given mode
+# Inputs: mp3_path, title, instruction, mode, output_path (strings), model_size (string),
+#         options (dict or None) extra Whisper decoding options
+# Output: formatted text content returned by process()
+def transcribe_file(mp3_path, title, instruction, mode, output_path, model_size=MODEL_SIZE, options=None):
+    # Validate paths
+    if not os.path.exists(mp3_path):
+        raise FileNotFoundError(f"MP3 file not found: {mp3_path}")
+
+    # Ensure output directory exists
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        print(f"Creating output directory: {output_dir}")
+        os.makedirs(output_dir, exist_ok=True)
+
+    transcript_path, temporary = transcribe_audio(mp3_path, model_size, options)
+
+    # Process the transcription according to the specified mode
+    try:
+        with scope(50, 100):
+            return process(transcript_path, title, instruction, mode, output_path)
+    finally:
+        if temporary:
+            os.remove(transcript_path)
+
+
+# Removes "--name VALUE" from argv (so positional arguments keep their places)
+# Output: the value, or None if the option is absent
+def _pop_option(argv, name):
+    if name not in argv:
+        return None
+    index = argv.index(name)
+    if index + 1 >= len(argv):
+        print(f"Error: {name} needs a value")
+        sys.exit(1)
+    value = argv[index + 1]
+    del argv[index:index + 2]
+    return value
+
+
 # This script transcribes an MP3 audio file to text and processes it according to specified parameters.
 # It requires 5 command-line arguments to run properly.
 def main():
+    # Optional: --profile DIR writes a cProfile dump per stage (see profiling.py)
+    profiling.enable_from_argv(sys.argv)
+    # Optional Whisper hints: --language CODE, --task transcribe|translate, --prompt TEXT|taxonomy
+    hints = {name: _pop_option(sys.argv, flag) for name, flag in
+             [("language", "--language"), ("task", "--task"), ("initial_prompt", "--prompt")]}
     try:
         # Print arguments for debugging
         print(f"Received {len(sys.argv)} arguments:")
         for i, arg in enumerate(sys.argv):
             print(f"  Arg {i}: {arg}")
-            
+
         # Check if the correct number of command-line arguments is provided
         if len(sys.argv) < 6:
-            print("Usage: python transcribe.py <mp3_path> <title> <instruction> <mode> <output_path>")
+            print("Usage: python transcribe.py <mp3_path> <title> <instruction> <mode> <output_path> "
+                  "[--language CODE] [--task transcribe|translate] [--prompt TEXT|taxonomy] [--profile DIR]")
             sys.exit(1)
 
         # Extract command-line arguments
@@ -25,41 +278,24 @@ def main():
         instruction = sys.argv[3]
         mode = sys.argv[4]
         output_path = sys.argv[5]
-        
+
         # Validate paths
         if not os.path.exists(mp3_path):
             print(f"Error: MP3 file not found: {mp3_path}")
             sys.exit(1)
-            
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        if not os.path.exists(output_dir):
-            print(f"Creating output directory: {output_dir}")
-            os.makedirs(output_dir, exist_ok=True)
-
-        # Initialize the Whisper speech recognition model
-        print("Transcribing with Whisper...")
-        model = whisper.load_model("tiny")
-
-        # Perform the actual transcription of the audio file
-        result = model.transcribe(mp3_path)
 
-        # Save the transcribed text to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False, mode="w", encoding="utf-8") as tmp:
-            tmp.write(result["text"])
-            txt_path = tmp.name
-
-        # Process the transcription according to the specified mode
-        final_output = process(txt_path, title, instruction, mode, output_path)
+        with bind(Job(stderr_sink)), metrics.job("transcribe", mode=mode):
+            final_output = transcribe_file(mp3_path, title, instruction, mode, output_path,
+                                           options=whisper_options(**hints))
 
         # Indicate completion and show the result
         print("Done!")
         print(final_output)
-    
+
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import regex as re
+
+# Streaming transcript reader.
+# Transcripts are read lazily, a line (or one Whisper segment) at a time, and cleaned text is yielded as it
+# is found, so memory stays bounded by the chunk size however long the transcript is. Lines of plain text
+# are read at most READ_SIZE characters at a time, so a transcript saved as one huge line is streamed too. Supported formats,
+# chosen by extension:
+#   .txt   plain text or Whisper's verbose output; "[00:00.000 --> 00:05.000]" markers are removed
+#   .srt   SubRip: cue numbers and timing lines are dropped
+#   .vtt   WebVTT: header, NOTE/STYLE/REGION blocks, cue identifiers, timing lines and tags are dropped
+#   .json  Whisper JSON ({"text": ..., "segments": [{"text": ...}, ...]}): segments are decoded one at a
+#          time without loading the file
+# iter_chunks() groups the cleaned text into pieces of at most CHUNK_CHARS characters, which is what the
+# punctuation step sends to the model per call.
+
+CHUNK_CHARS = 4000
+READ_SIZE = 1 << 16
+# Longest timestamp marker, "[00:00:00.000 --> 00:00:00.000]"
+MARKER_CHARS = 31
+
+# Whisper's verbose timestamps; the hour part only appears in recordings over an hour
+TIMESTAMP_PATTERN = re.compile(r"\[(?:\d{2}:)?\d{2}:\d{2}\.\d{3} --> (?:\d{2}:)?\d{2}:\d{2}\.\d{3}\]")
+# SRT/VTT cue timing line, e.g. "00:00:01,000 --> 00:00:04,000 align:start"
+CUE_TIMING_PATTERN = re.compile(r"^\s*(?:\d+:)?\d{2}:\d{2}[.,]\d{3}\s+-->\s+(?:\d+:)?\d{2}:\d{2}[.,]\d{3}")
+# Inline markup in subtitles: <i>, </b>, <c.yellow>, <00:00:01.000>, <v Speaker>
+TAG_PATTERN = re.compile(r"<[^>\n]*>")
+SEGMENTS_PATTERN = re.compile(r'"segments"\s*:\s*\[')
+WHITESPACE_PATTERN = re.compile(r"\s+")
+SEPARATOR_PATTERN = re.compile(r"[\s,]*")
+
+FORMATS = {".txt": "txt", ".srt": "srt", ".vtt": "vtt", ".json": "json"}
+
+
+def detect_format(path):
+    return FORMATS.get(os.path.splitext(str(path))[1].lower(), "txt")
+
+
+# --- Plain text / Whisper verbose output ---
+# A line longer than READ_SIZE is split at its last whitespace (or before a timestamp marker that was cut
+# off), and the rest is carried over to the next read, so words and markers are never split
+def _iter_txt(f):
+    carry = ""
+    while True:
+        part = f.readline(READ_SIZE)
+        text = carry + part
+        carry = ""
+        if part and not part.endswith("\n"):
+            cut = max(text.rfind(" "), text.rfind("\t"))
+            if cut <= 0:
+                cut = len(text)
+            # Move the cut before a marker it would split
+            marker = text.rfind("[", max(cut - MARKER_CHARS, 0), cut)
+            if marker > text.rfind("]", 0, cut):
+                cut = marker
+            if 0 < cut < len(text):
+                text, carry = text[:cut], text[cut:]
+        line = TIMESTAMP_PATTERN.sub("", text).strip()
+        if line:
+            yield line
+        if not part:
+            return
+
+
+# --- SRT ---
+# A cue is: number line, timing line, text lines, blank line
+def _iter_srt(f):
+    cue_start = True
+    for line in f:
+        line = line.strip()
+        if not line:
+            cue_start = True
+            continue
+        # The cue number opens a cue; a number inside the cue text is kept
+        if (cue_start and line.isdigit()) or CUE_TIMING_PATTERN.match(line):
+            continue
+        cue_start = False
+        line = TAG_PATTERN.sub("", line).strip()
+        if line:
+            yield line
+
+
+# --- WebVTT ---
+# Cue identifiers are only recognisable by the timing line that follows them, so one line is held back
+def _iter_vtt(f):
+    block = None  # "header", "skip" (NOTE/STYLE/REGION) or "cue" for the block being read
+    held = None
+    for line in f:
+        line = line.strip()
+        if not line:
+            if held is not None and block == "cue":
+                yield held
+            held = None
+            block = None
+            continue
+        if block is None:
+            if line.startswith("WEBVTT"):
+                block = "header"
+            elif line.split(" ", 1)[0] in ("NOTE", "STYLE", "REGION"):
+                block = "skip"
+            else:
+                block = "cue"
+        if block != "cue":
+            continue
+        if CUE_TIMING_PATTERN.match(line):
+            # The held line was the cue identifier
+            held = None
+            continue
+        if held is not None:
+            yield held
+        held = TAG_PATTERN.sub("", line).strip() or None
+    if held is not None and block == "cue":
+        yield held
+
+
+# --- Whisper JSON ---
+# Finds the "segments" array and decodes its objects one at a time from a sliding buffer
+def _iter_json(f):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        data = f.read(READ_SIZE)
+        if not data:
+            eof = True
+        buffer += data
+
+    # Skip ahead to the segments array, keeping only a short tail in case the key straddles two reads
+    while True:
+        match = SEGMENTS_PATTERN.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            return
+        buffer = buffer[-32:]
+        fill()
+
+    position = 0
+    while True:
+        position = SEPARATOR_PATTERN.match(buffer, position).end()
+        if position == len(buffer):
+            if eof:
+                return
+            # Drop what was decoded already before reading on
+            buffer, position = buffer[position:], 0
+            fill()
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            segment, position_after = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                raise ValueError("Truncated or invalid Whisper JSON transcript")
+            # Segment not complete yet
+            buffer, position = buffer[position:], 0
+            fill()
+            continue
+        position = position_after
+        if isinstance(segment, dict):
+            text = str(segment.get("text", "")).strip()
+            if text:
+                yield text
+
+
+READERS = {"txt": _iter_txt, "srt": _iter_srt, "vtt": _iter_vtt, "json": _iter_json}
+
+
+# --- Cleaned text, incrementally ---
+# Inputs: path (string), fmt (string or None) one of FORMATS' values, detected from the extension if None
+# Output: generator of cleaned, non-empty text pieces (lines, cues or segments) in order
+def iter_text(path, fmt=None):
+    reader = READERS[fmt or detect_format(path)]
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        yield from reader(f)
+
+
+# --- Chunking ---
+# Joins pieces with spaces into chunks of at most max_chars, breaking oversized pieces at whitespace
+# (or hard, if a piece has none)
+# Inputs: pieces (iterable of strings), max_chars (int)
+# Output: generator of chunk strings
+def iter_chunks(pieces, max_chars=CHUNK_CHARS):
+    current = []
+    size = 0
+    for piece in pieces:
+        piece = WHITESPACE_PATTERN.sub(" ", piece).strip()
+        while len(piece) > max_chars:
+            cut = piece.rfind(" ", 0, max_chars + 1)
+            if cut <= 0:
+                cut = max_chars
+            head, piece = piece[:cut].strip(), piece[cut:].strip()
+            if current:
+                yield " ".join(current)
+                current, size = [], 0
+            yield head
+        if not piece:
+            continue
+        if current and size + 1 + len(piece) > max_chars:
+            yield " ".join(current)
+            current, size = [], 0
+        size += len(piece) + (1 if current else 0)
+        current.append(piece)
+    if current:
+        yield " ".join(current)
+
+
+# --- CLI usage ---
+# python transcript.py <transcript> [max_chars]
+# Prints the cleaned chunks, separated by blank lines
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python transcript.py <transcript.txt|.srt|.vtt|.json> [max_chars]")
+        sys.exit(1)
+    if not os.path.exists(sys.argv[1]):
+        print(f"Error: transcript not found: {sys.argv[1]}")
+        sys.exit(1)
+
+    max_chars = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_CHARS
+    for chunk in iter_chunks(iter_text(sys.argv[1]), max_chars):
+        print(chunk + "\n")
@@ -0,0 +1,646 @@
+import os
+import sys
+import time
+import select
+import signal
+import sqlite3
+import struct
+import threading
+import traceback
+
+import metrics
+from progress import Job, JobCancelled, bind
+from transcript import FORMATS
+
+# Watch-folder ingestion daemon.
+# Watches a directory (and its subdirectories) for new transcripts and audio files and feeds them through
+# process() / transcribe_file(), appending the results to one corpus, the same way batch ingestion in the
+# app does:
+#   - changes are picked up with inotify on Linux, falling back to polling elsewhere or with --poll
+#     (inotify does not see files written by other machines to a network share, so use --poll there).
+#     The whole tree is also rescanned every RESCAN_SECONDS to catch anything the events missed.
+#   - a file is only queued once its size and modification time have stayed the same for the settle time,
+#     so recordings still being copied in are not picked up half written
+#   - queued files are worked off by a bounded pool of worker threads, transcripts before audio, with at
+#     most AUDIO_WORKERS transcriptions at a time (Whisper runs one at a time anyway)
+#   - a ledger (<output>.watch.sqlite) remembers every file with its size, mtime and outcome, so a restart
+#     neither re-ingests finished files nor loses the backlog; a file that changes later is ingested again
+#     (the corpus' dedup index keeps repeated memories out). Failed files are retried MAX_ATTEMPTS times.
+#   - the output and its sidecars (<output>.tags/, .bm25/, the ledger, ...) are never picked up, so the output
+#     may live inside the watched folder
+# Ctrl-C (or SIGTERM) stops taking new files and waits for the running ones; a second Ctrl-C cancels them,
+# and they are picked up again on the next start.
+# --language, --task and --prompt pass Whisper hints for audio files, as in transcribe.py.
+#
+# Usage: python watch.py run <watch_dir> <rag|sft> <output.jsonl> ["<title or instruction>"] [--workers N] [--settle SECONDS] [--poll]
+#            [--language CODE|auto] [--task transcribe|translate] [--prompt taxonomy|TEXT]
+#        python watch.py status <output.jsonl>
+#        python watch.py retry <output.jsonl>    (queue failed files again; a running daemon picks them up)
+
+TEXT_EXTENSIONS = tuple(FORMATS)
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".m4a")
+
+WORKERS = 2
+AUDIO_WORKERS = 1
+SETTLE_SECONDS = 10.0
+POLL_SECONDS = 5.0
+RESCAN_SECONDS = 300.0
+MAX_ATTEMPTS = 2
+# How often the daemon checks settling files and writes its heartbeat
+TICK_SECONDS = 1.0
+HEARTBEAT_SECONDS = 5.0
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def file_kind(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        return "text"
+    if extension in AUDIO_EXTENSIONS:
+        return "audio"
+    return None
+
+
+# --- Directory scan ---
+# Inputs: root (string), skip (callable or None) returns True for absolute paths (files or directories) to leave out
+# Output: generator of absolute paths of supported files, skipping hidden files and directories
+def scan(root, skip=None):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames
+                       if not name.startswith(".") and not (skip and skip(os.path.abspath(os.path.join(dirpath, name))))]
+        for name in filenames:
+            path = os.path.abspath(os.path.join(dirpath, name))
+            if not name.startswith(".") and file_kind(name) and not (skip and skip(path)):
+                yield path
+
+
+# --- Change sources ---
+# wait(timeout) blocks up to timeout seconds and returns (paths that changed, whether to rescan everything)
+
+class PollWatcher:
+    name = "poll"
+
+    def __init__(self, root, interval=POLL_SECONDS, skip=None):
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        if time.monotonic() - self.last >= self.interval:
+            self.last = time.monotonic()
+            return [], True
+        return [], False
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    name = "inotify"
+
+    # Inputs: root (string), skip (callable or None) as for scan(); skipped directories are not watched
+    # Raises OSError if inotify is unavailable (not Linux, or out of watches)
+    def __init__(self, root, skip=None):
+        import ctypes
+        import ctypes.util
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}  # watch descriptor -> directory path
+        self.skip = skip or (lambda path: False)
+        self.add_tree(root)
+
+    def add_tree(self, root):
+        import ctypes
+        if self.skip(os.path.abspath(root)):
+            return
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames
+                           if not name.startswith(".") and not self.skip(os.path.abspath(os.path.join(dirpath, name)))]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath} (raise fs.inotify.max_user_watches or use --poll)")
+            self.directories[wd] = dirpath
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return [], False
+
+        paths = []
+        rescan = False
+        position = 0
+        while position + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, position)
+            position += EVENT_HEADER.size
+            name = os.fsdecode(data[position:position + length].rstrip(b"\0"))
+            position += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped by the kernel
+                rescan = True
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name or name.startswith("."):
+                continue
+            path = os.path.abspath(os.path.join(directory, name))
+            if self.skip(path):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # A new folder (possibly moved in with files already inside)
+                    try:
+                        self.add_tree(path)
+                    except OSError:
+                        traceback.print_exc(file=sys.stderr)
+                    paths.extend(scan(path, self.skip))
+                continue
+            if file_kind(name):
+                paths.append(path)
+        return paths, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+# --- Ledger ---
+# SQLite record of every file seen, shared by the daemon's threads and read by the status command
+class Ledger:
+    def __init__(self, output_path, ledger_path=None):
+        self.path = ledger_path or str(output_path) + ".watch.sqlite"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                queued_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                seconds REAL
+            );
+            CREATE INDEX IF NOT EXISTS files_status ON files(status, kind, queued_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, **values):
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                  [(key, str(value)) for key, value in values.items()])
+            self.conn.commit()
+
+    # Output: {path: (size, mtime_ns, status)} for every file in the ledger
+    def known(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT path, size, mtime_ns, status FROM files").fetchall()
+        return {path: (size, mtime_ns, status) for path, size, mtime_ns, status in rows}
+
+    # Files left running by a daemon that did not shut down cleanly go back to the queue
+    def requeue_running(self):
+        with self.lock:
+            self.conn.execute("UPDATE files SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            self.conn.commit()
+
+    # Gives failed files another MAX_ATTEMPTS attempts (e.g. after fixing the API key)
+    # Output: number of files queued again
+    def retry_failed(self):
+        with self.lock:
+            count = self.conn.execute(
+                "UPDATE files SET status = 'queued', attempts = 0, queued_at = ? WHERE status = 'failed'", (time.time(),)
+            ).rowcount
+            self.conn.commit()
+        return count
+
+    # Queues a settled file, unless it is already queued or running
+    # Output: True if it was queued
+    def enqueue(self, path, kind, size, mtime_ns):
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM files WHERE path = ?", (path,)).fetchone()
+            if row and row[0] in ("queued", "running"):
+                return False
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, kind, size, mtime_ns, status, attempts, queued_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 0, ?)",
+                (path, kind, size, mtime_ns, time.time()),
+            )
+            self.conn.commit()
+        return True
+
+    # Takes the next queued file for a worker: transcripts first, then the oldest
+    # Input: audio (bool) whether an audio file may be taken
+    # Output: (path, kind) or None
+    def claim(self, audio):
+        kinds = ("text", "audio") if audio else ("text",)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT path, kind FROM files WHERE status = 'queued' AND kind IN ({','.join('?' * len(kinds))}) "
+                "ORDER BY kind = 'audio', queued_at LIMIT 1",
+                kinds,
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE files SET status = 'running', started_at = ? WHERE path = ?", (time.time(), row[0]))
+            self.conn.commit()
+        return row
+
+    # Records the outcome of a run; a failed file is queued again until it has had MAX_ATTEMPTS attempts
+    # Inputs: path, error (string or None) failure message,
+    #         requeue (bool) put back in the queue without counting an attempt (cancelled)
+    def finish(self, path, error=None, requeue=False):
+        now = time.time()
+        with self.lock:
+            if requeue:
+                self.conn.execute("UPDATE files SET status = 'queued', started_at = NULL WHERE path = ?", (path,))
+            elif error is None:
+                self.conn.execute(
+                    "UPDATE files SET status = 'done', error = NULL, attempts = attempts + 1, finished_at = ?, "
+                    "seconds = ? - started_at WHERE path = ?",
+                    (now, now, path),
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE files SET status = CASE WHEN attempts + 1 < ? THEN 'queued' ELSE 'failed' END, "
+                    "error = ?, attempts = attempts + 1, finished_at = ?, started_at = NULL WHERE path = ?",
+                    (MAX_ATTEMPTS, error, now, path),
+                )
+            self.conn.commit()
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            return self.conn.execute(sql, parameters).fetchall()
+
+
+# --- Debounce ---
+# Tracks files that changed recently until their size and mtime have been stable for settle seconds
+class Settler:
+    def __init__(self, settle_seconds):
+        self.settle_seconds = settle_seconds
+        self.pending = {}  # path -> (size, mtime_ns, monotonic time of last change)
+
+    def touch(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        previous = self.pending.get(path)
+        if previous is None or previous[:2] != (stat.st_size, stat.st_mtime_ns):
+            self.pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    # Output: list of (path, size, mtime_ns) that have settled; they stop being tracked
+    def settled(self):
+        ready = []
+        now = time.monotonic()
+        for path, (size, mtime_ns, since) in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - since >= self.settle_seconds and size > 0:
+                del self.pending[path]
+                ready.append((path, size, mtime_ns))
+        return ready
+
+
+class Daemon:
+    # Inputs:
+    #   watch_dir (string), mode ("rag" or "sft"), output_path (string)
+    #   label (string or None): title prefix in RAG mode ("<label>: <file name>"), instruction in SFT mode
+    #   workers (int), settle_seconds (float), poll (bool) use polling instead of inotify
+    #   whisper (dict or None): Whisper decoding options for audio files (see transcribe.whisper_options)
+    def __init__(self, watch_dir, mode, output_path, label=None, workers=WORKERS, settle_seconds=SETTLE_SECONDS,
+                 poll=False, whisper=None):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.mode = mode
+        self.output_path = os.path.abspath(output_path)
+        self.label = label
+        self.workers = workers
+        self.poll = poll
+        self.whisper = whisper or {}
+        self.settler = Settler(settle_seconds)
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        self.ledger = Ledger(self.output_path)
+        self.stopping = threading.Event()
+        self.wake = threading.Condition()
+        self.running = {}  # path -> Job
+        self.running_audio = 0
+
+    # The output and everything the pipeline keeps next to it (<output>.tags/, .bm25/, .vectors/, .tagmatrix/,
+    # .dedup.sqlite, the ledger, ...), so an output inside the watched folder does not feed the daemon its own
+    # index files
+    def owned(self, path):
+        return path == self.output_path or path.startswith(self.output_path + ".")
+
+    # Same titles and instructions as batch ingestion in the app
+    def params(self, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if self.mode == "rag":
+            return (f"{self.label}: {name}" if self.label else name), "Transcribe this audio"
+        return name, self.label or "Transcribe this audio"
+
+    # --- Worker ---
+    def work(self):
+        from process import process
+        from transcribe import transcribe_file
+        while not self.stopping.is_set():
+            with self.wake:
+                claimed = self.ledger.claim(audio=self.running_audio < AUDIO_WORKERS)
+                if claimed is None:
+                    self.wake.wait(TICK_SECONDS)
+                    continue
+                path, kind = claimed
+                job = Job()
+                self.running[path] = job
+                if kind == "audio":
+                    self.running_audio += 1
+
+            title, instruction = self.params(path)
+            error = None
+            cancelled = False
+            started = time.monotonic()
+            try:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"File disappeared before it was processed: {path}")
+                with bind(job), metrics.job("process" if kind == "text" else "transcribe", mode=self.mode, source="watch"):
+                    if kind == "text":
+                        process(path, title, instruction, self.mode, self.output_path)
+                    else:
+                        transcribe_file(path, title, instruction, self.mode, self.output_path, options=self.whisper)
+            except JobCancelled:
+                cancelled = True
+            except Exception as e:
+                traceback.print_exc(file=sys.stderr)
+                error = str(e) or type(e).__name__
+            finally:
+                self.ledger.finish(path, error, requeue=cancelled)
+                with self.wake:
+                    del self.running[path]
+                    if kind == "audio":
+                        self.running_audio -= 1
+                    self.wake.notify_all()
+
+            outcome = "cancelled, requeued" if cancelled else f"failed: {error}" if error else "done"
+            print(f"{os.path.relpath(path, self.watch_dir)}: {outcome} ({time.monotonic() - started:.1f}s)", flush=True)
+
+    # Queues settled files that the ledger does not already have in the same state
+    def queue_settled(self, known):
+        queued = 0
+        for path, size, mtime_ns in self.settler.settled():
+            previous = known.get(path)
+            if previous and previous[:2] == (size, mtime_ns) and previous[2] in ("done", "failed"):
+                continue
+            if self.ledger.enqueue(path, file_kind(path), size, mtime_ns):
+                queued += 1
+            known[path] = (size, mtime_ns, "queued")
+        if queued:
+            with self.wake:
+                self.wake.notify_all()
+
+    # Starts tracking every file that is new or changed since the ledger last saw it
+    def rescan(self, known):
+        for path in scan(self.watch_dir, self.owned):
+            previous = known.get(path)
+            if previous is not None:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                    continue
+            self.settler.touch(path)
+
+    def heartbeat(self, watcher):
+        self.ledger.set_meta(pid=os.getpid(), watch_dir=self.watch_dir, mode=self.mode, watcher=watcher.name,
+                             workers=self.workers, settling=len(self.settler.pending), heartbeat=time.time())
+
+    # --- Main loop ---
+    def run(self):
+        watcher = None
+        if not self.poll:
+            try:
+                watcher = InotifyWatcher(self.watch_dir, self.owned)
+            except OSError as e:
+                print(f"inotify unavailable ({e}); polling every {POLL_SECONDS:g}s instead", file=sys.stderr)
+        watcher = watcher or PollWatcher(self.watch_dir, skip=self.owned)
+
+        self.ledger.requeue_running()
+        self.ledger.set_meta(started=time.time())
+        known = self.ledger.known()
+        self.rescan(known)
+
+        threads = [threading.Thread(target=self.work, name=f"watch-worker-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        print(f"Watching {self.watch_dir} ({watcher.name}, {self.workers} workers) into {self.output_path}", flush=True)
+
+        last_scan = last_heartbeat = time.monotonic()
+        try:
+            while not self.stopping.is_set():
+                paths, rescan = watcher.wait(TICK_SECONDS)
+                for path in paths:
+                    self.settler.touch(path)
+                if rescan or time.monotonic() - last_scan >= RESCAN_SECONDS:
+                    self.rescan(known)
+                    last_scan = time.monotonic()
+                self.queue_settled(known)
+                if time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                    self.heartbeat(watcher)
+                    last_heartbeat = time.monotonic()
+        finally:
+            self.stopping.set()
+            with self.wake:
+                self.wake.notify_all()
+            for thread in threads:
+                thread.join()
+            watcher.close()
+            self.ledger.set_meta(heartbeat=0, stopped=time.time())
+            self.ledger.close()
+
+    # First call: finish running files and stop; second call: cancel them too
+    def stop(self):
+        if self.stopping.is_set():
+            print("Cancelling running files...", file=sys.stderr)
+            with self.wake:
+                for job in self.running.values():
+                    job.cancel()
+        else:
+            print("Stopping after the running files finish (Ctrl-C again to cancel them)...", file=sys.stderr)
+            self.stopping.set()
+
+
+# --- Status ---
+# Prints whether a daemon is running for the corpus, the backlog, throughput and recent failures
+# Input: output_path (string) the corpus the daemon writes to
+def status(output_path):
+    ledger = Ledger(output_path)
+    try:
+        now = time.time()
+        heartbeat = float(ledger.get_meta("heartbeat", 0))
+        watch_dir = ledger.get_meta("watch_dir", "?")
+        if now - heartbeat < 3 * HEARTBEAT_SECONDS:
+            print(f"Watching {watch_dir} (pid {ledger.get_meta('pid')}, {ledger.get_meta('watcher')}, "
+                  f"{ledger.get_meta('workers')} workers), last heartbeat {now - heartbeat:.0f}s ago")
+        else:
+            stopped = float(ledger.get_meta("stopped", 0) or heartbeat)
+            last_seen = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stopped)) if stopped else "never"
+            print(f"Not running (watch directory {watch_dir}, last seen {last_seen})")
+
+        counts = dict(ledger.query("SELECT status, COUNT(*) FROM files GROUP BY status"))
+        settling = int(ledger.get_meta("settling", 0)) if now - heartbeat < 3 * HEARTBEAT_SECONDS else 0
+        backlog = counts.get("queued", 0) + counts.get("running", 0)
+        print(f"Backlog: {counts.get('queued', 0)} queued, {counts.get('running', 0)} running, {settling} settling")
+        print(f"Done: {counts.get('done', 0)}, failed: {counts.get('failed', 0)}")
+
+        for path, started_at in ledger.query("SELECT path, started_at FROM files WHERE status = 'running' ORDER BY started_at"):
+            print(f"  running {now - started_at:7.1f}s  {path}")
+
+        for label, window in (("last hour", 3600), ("last 24 hours", 86400)):
+            (finished,) = ledger.query("SELECT COUNT(*) FROM files WHERE status = 'done' AND finished_at >= ?", (now - window,))[0]
+            print(f"Throughput ({label}): {finished} files, {finished * 3600 / window:.1f} files/hour")
+
+        for kind in ("text", "audio"):
+            seconds = sorted(row[0] for row in ledger.query(
+                "SELECT seconds FROM files WHERE status = 'done' AND kind = ? AND seconds IS NOT NULL "
+                "ORDER BY finished_at DESC LIMIT 500", (kind,)))
+            if seconds:
+                print(f"Per {kind} file: p50 {metrics.percentile(seconds, 50):.1f}s, p90 {metrics.percentile(seconds, 90):.1f}s "
+                      f"(last {len(seconds)})")
+
+        # Rough time to clear the backlog from the recent mean time per file of each kind
+        if backlog:
+            eta = 0.0
+            known = True
+            for kind, workers in (("text", max(int(ledger.get_meta("workers", WORKERS)) - AUDIO_WORKERS, 1)), ("audio", AUDIO_WORKERS)):
+                (waiting,) = ledger.query("SELECT COUNT(*) FROM files WHERE status IN ('queued', 'running') AND kind = ?", (kind,))[0]
+                (mean,) = ledger.query("SELECT AVG(seconds) FROM (SELECT seconds FROM files WHERE status = 'done' AND kind = ? "
+                                       "AND seconds IS NOT NULL ORDER BY finished_at DESC LIMIT 50)", (kind,))[0]
+                if waiting and mean is None:
+                    known = False
+                elif waiting:
+                    eta = max(eta, waiting * mean / workers)
+            print(f"Estimated time to clear the backlog: {eta / 60:.1f} min" if known else
+                  "Estimated time to clear the backlog: unknown (no finished files yet)")
+
+        failures = ledger.query("SELECT path, error FROM files WHERE status = 'failed' ORDER BY finished_at DESC LIMIT 10")
+        if failures:
+            print("Recent failures:")
+            for path, error in failures:
+                print(f"  {path}: {error}")
+    finally:
+        ledger.close()
+
+
+# Removes "--name VALUE" from args
+# Output: the value (converted with cast), or default if the flag is absent
+def _pop_option(args, name, cast, default):
+    if name not in args:
+        return default
+    index = args.index(name)
+    if index + 1 >= len(args):
+        print(f"Error: {name} needs a value")
+        sys.exit(1)
+    value = cast(args[index + 1])
+    del args[index:index + 2]
+    return value
+
+
+USAGE = ('Usage: python watch.py run <watch_dir> <rag|sft> <output.jsonl> ["<title or instruction>"] '
+         "[--workers N] [--settle SECONDS] [--poll]\n"
+         "           [--language CODE|auto] [--task transcribe|translate] [--prompt taxonomy|TEXT]\n       python watch.py status | retry <output.jsonl>")
+
+
+# --- CLI usage ---
+# python watch.py run <watch_dir> <rag|sft> <output.jsonl> ["<title or instruction>"] [--workers N] [--settle SECONDS] [--poll]
+#                      [--language CODE|auto] [--task transcribe|translate] [--prompt taxonomy|TEXT]
+# python watch.py status | retry <output.jsonl>
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 2 and args[0] in ("status", "retry"):
+        if not os.path.exists(args[1] + ".watch.sqlite"):
+            print(f"Error: no watch ledger for {args[1]}")
+            sys.exit(1)
+        if args[0] == "status":
+            status(args[1])
+        else:
+            ledger = Ledger(args[1])
+            print(f"{ledger.retry_failed()} failed file(s) queued again")
+            ledger.close()
+        sys.exit(0)
+
+    workers = _pop_option(args, "--workers", int, WORKERS)
+    settle_seconds = _pop_option(args, "--settle", float, SETTLE_SECONDS)
+    hints = {
+        "language": _pop_option(args, "--language", str, None),
+        "task": _pop_option(args, "--task", str, None),
+        "initial_prompt": _pop_option(args, "--prompt", str, None),
+    }
+    poll = "--poll" in args
+    if poll:
+        args.remove("--poll")
+    if len(args) < 4 or args[0] != "run" or args[2] not in ("rag", "sft") or workers < 1:
+        print(USAGE)
+        sys.exit(1)
+    if not os.path.isdir(args[1]):
+        print(f"Error: watch directory not found: {args[1]}")
+        sys.exit(1)
+
+    from transcribe import whisper_options
+    try:
+        whisper = whisper_options(**hints)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    daemon = Daemon(args[1], args[2], args[3], args[4] if len(args) > 4 else None, workers, settle_seconds, poll,
+                    whisper)
+
+    # Refuse to start a second daemon on the same corpus
+    heartbeat = float(daemon.ledger.get_meta("heartbeat", 0))
+    if time.time() - heartbeat < 3 * HEARTBEAT_SECONDS:
+        print(f"Error: a watcher (pid {daemon.ledger.get_meta('pid')}) is already writing to {args[3]}")
+        sys.exit(1)
+
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    daemon.run()
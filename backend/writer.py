@@ -0,0 +1,247 @@
+import os
+import json
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Platform specific advisory locking (fcntl on Linux/macOS, msvcrt on Windows)
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# --- Advisory file lock ---
+# This context manager takes an exclusive advisory lock on a sidecar ".lock" file next to `path`.
+# The lock lives on a separate file so that it survives the temp-file + rename swap used in atomic mode.
+# Every writer (in any process) that appends to the same output file goes through this lock.
+# Input: path (string) of the file being protected
+# Output: yields once the lock is held, releases it on exit
+@contextmanager
+def file_lock(path):
+    lock_path = str(path) + ".lock"
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt locks a byte range; LK_LOCK retries for ~10s so loop until we get it
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# --- Directory fsync ---
+# Makes a rename durable by syncing the containing directory (no-op where unsupported, e.g. Windows)
+# Input: path (string) of a file inside the directory to sync
+def _fsync_dir(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# --- Trailing newline check ---
+# Returns True if the file is empty or ends with a newline.
+# A missing newline means an earlier writer died mid-line; the next batch then starts on a fresh line
+# instead of gluing its first record onto the torn one.
+def _ends_with_newline(f):
+    f.seek(0, os.SEEK_END)
+    if f.tell() == 0:
+        return True
+    f.seek(-1, os.SEEK_END)
+    return f.read(1) == b"\n"
+
+
+# --- Buffered JSONL writer ---
+# Collects records in memory and commits them to `path` in batches.
+# Each commit holds the advisory lock, writes the whole batch with a single write() call and fsyncs it,
+# so several processes can share one output file without interleaving or tearing lines.
+# With atomic=True the batch is written to a temp copy of the file which then replaces the original,
+# so readers only ever see the file before or after a whole batch (costs a copy of the file per commit).
+#
+# Usage:
+#   with JsonlWriter("rag_memory_chunks.jsonl") as writer:
+#       writer.write({"title": ..., "content": ..., "tags": [...]})
+class JsonlWriter:
+    # Inputs:
+    #   path (string): JSONL file to append to
+    #   batch_size (int): number of buffered records that triggers an automatic commit
+    #   fsync (bool): fsync the file after each commit
+    #   atomic (bool): commit through a temp file + rename instead of appending in place
+    #   dedup (string or None): consult the DedupIndex sidecar before appending;
+    #       "skip" drops duplicates of existing records, "replace" swaps the old record for the new one
+    def __init__(self, path, batch_size=100, fsync=True, atomic=False, dedup=None):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.atomic = atomic
+        self.dedup = dedup
+        self.skipped = 0
+        self._buffer = []
+        self._dedup_index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Queue one record for writing; commits automatically when the batch is full
+    # Input: record (dict) to serialize as one JSON line
+    def write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    # Queue several records at once
+    # Input: records (iterable of dicts)
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    # Commit all buffered records to disk
+    # Output: list aligned with the committed records giving the byte offset at which each one starts
+    #         in the file, or None for records dropped as duplicates
+    def flush(self):
+        if not self._buffer:
+            return []
+
+        records = self._buffer
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        with file_lock(self.path):
+            keep = [True] * len(records)
+            if self.dedup:
+                index = self._open_dedup_index()
+                index.sync()
+                keep, fps, replaced = index.filter(records)
+                if replaced:
+                    index.remove(self._remove_lines(replaced, directory))
+
+            lines = [
+                json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+                for record, kept in zip(records, keep) if kept
+            ]
+            offsets = []
+            if lines:
+                if self.atomic:
+                    offsets = self._commit_atomic(lines, directory)
+                else:
+                    offsets = self._commit_append(lines)
+
+            if self.dedup:
+                index.add(offsets, [fp for fp, kept in zip(fps, keep) if kept])
+                index.mark(os.path.getsize(self.path) if os.path.exists(self.path) else 0)
+
+        self._buffer = []
+        self.skipped += keep.count(False)
+        committed = iter(offsets)
+        return [next(committed) if kept else None for kept in keep]
+
+    # Commit any remaining records and release the dedup index; the writer can still be reused afterwards
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._dedup_index is not None:
+                self._dedup_index.close()
+                self._dedup_index = None
+
+    def _open_dedup_index(self):
+        if self._dedup_index is None:
+            # Imported here so plain appends do not pay for sqlite/regex setup
+            from dedup import DedupIndex
+            self._dedup_index = DedupIndex(self.path, on_duplicate=self.dedup)
+        return self._dedup_index
+
+    # Rewrite the file without the lines starting at `offsets` (lock must be held)
+    # Output: list of (offset, length) for every removed line
+    def _remove_lines(self, offsets, directory):
+        targets = set(offsets)
+        removed = []
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".jsonl", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as tmp, open(self.path, "rb") as src:
+                offset = 0
+                for line in src:
+                    if offset in targets:
+                        removed.append((offset, len(line)))
+                    else:
+                        tmp.write(line)
+                    offset += len(line)
+                tmp.flush()
+                if self.fsync:
+                    os.fsync(tmp.fileno())
+            shutil.copymode(self.path, tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.fsync:
+            _fsync_dir(self.path)
+        return removed
+
+    # Append the batch in place with one write() call (lock must be held)
+    def _commit_append(self, lines):
+        with open(self.path, "ab+") as f:
+            prefix = b"" if _ends_with_newline(f) else b"\n"
+            f.seek(0, os.SEEK_END)
+            start = f.tell() + len(prefix)
+            f.write(prefix + b"".join(lines))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        return _line_offsets(start, lines)
+
+    # Copy the file to a temp file, append the batch there and rename it over the original (lock must be held)
+    def _commit_atomic(self, lines, directory):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".jsonl", dir=directory)
+        try:
+            with os.fdopen(fd, "w+b") as tmp:
+                if os.path.exists(self.path):
+                    with open(self.path, "rb") as src:
+                        shutil.copyfileobj(src, tmp)
+                prefix = b"" if _ends_with_newline(tmp) else b"\n"
+                tmp.seek(0, os.SEEK_END)
+                start = tmp.tell() + len(prefix)
+                tmp.write(prefix + b"".join(lines))
+                tmp.flush()
+                if self.fsync:
+                    os.fsync(tmp.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.fsync:
+            _fsync_dir(self.path)
+        return _line_offsets(start, lines)
+
+
+# Turns the start offset of a batch and its encoded lines into per-record offsets
+def _line_offsets(start, lines):
+    offsets = []
+    for line in lines:
+        offsets.append(start)
+        start += len(line)
+    return offsets
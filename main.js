@@ -72,11 +72,15 @@ function createWindow() {
  * 
  * When the app is ready:
  * - Creates the main window
+ * - Starts the long-running Python backend
+ * - Requeues jobs that were still pending when the app last quit
  * - Sets up an event handler to recreate the window on macOS when the app icon is clicked
  *   (macOS apps typically stay running even when all windows are closed)
  */
 app.whenReady().then(() => {
   createWindow();
+  startBackend();
+  resumeSavedJobs();
   app.on("activate", () => {
     if (BrowserWindow.getAllWindows().length === 0) createWindow();
   });
@@ -99,7 +103,7 @@ app.on("window-all-closed", () => {
  * Inputs: None directly (triggered by a request from the renderer process)
  * Outputs: Returns the selected file path or null if canceled
  * 
- * Opens a file dialog allowing users to select text files (.txt) or 
+ * Opens a file dialog allowing users to select transcripts (.txt, .srt, .vtt, Whisper .json) or 
  * audio files (.mp3, .wav, .ogg, .m4a)
  */
 ipcMain.handle('dialog:openFile', async () => {
@@ -107,8 +111,8 @@ ipcMain.handle('dialog:openFile', async () => {
     defaultPath: defaultOpenDirectory,
     properties: ['openFile'],
     filters: [
-      { name: 'All Supported Files', extensions: ['txt', 'mp3', 'wav', 'ogg', 'm4a'] },
-      { name: 'Text Files', extensions: ['txt'] },
+      { name: 'All Supported Files', extensions: [...TEXT_EXTENSIONS, ...AUDIO_EXTENSIONS] },
+      { name: 'Transcripts', extensions: TEXT_EXTENSIONS },
       { name: 'Audio Files', extensions: ['mp3', 'wav', 'ogg', 'm4a'] }
     ]
   });
@@ -123,6 +127,33 @@ ipcMain.handle('dialog:openFile', async () => {
   }
 });
 
+/**
+ * Multiple file selection dialog handler
+ *
+ * Inputs: None directly (triggered by a request from the renderer process)
+ * Outputs: Returns the selected file paths (empty if canceled)
+ *
+ * Same as dialog:openFile but allows selecting several files for a batch
+ */
+ipcMain.handle('dialog:openFiles', async () => {
+  const { canceled, filePaths } = await dialog.showOpenDialog({
+    defaultPath: defaultOpenDirectory,
+    properties: ['openFile', 'multiSelections'],
+    filters: [
+      { name: 'All Supported Files', extensions: [...TEXT_EXTENSIONS, ...AUDIO_EXTENSIONS] },
+      { name: 'Transcripts', extensions: TEXT_EXTENSIONS },
+      { name: 'Audio Files', extensions: AUDIO_EXTENSIONS }
+    ]
+  });
+
+  if (canceled || filePaths.length === 0) {
+    return [];
+  }
+  defaultOpenDirectory = path.dirname(filePaths[0]);
+  saveDirectoryPreferences();
+  return filePaths;
+});
+
 /**
  * Set default directories handler
  */
@@ -174,15 +205,16 @@ ipcMain.handle('settings:getDefaultDirectories', async () => {
  * - title: Title for the memory chunk
  * - instruction: Processing instruction
  * - mode: Processing mode (e.g., "rag")
+ * - priority: Optional queue priority (higher runs first, default 1)
  * 
- * Outputs: Result message from the Python script or error message
+ * Outputs: Result message from the Python backend or error message
  * 
  * This handler:
  * 1. Opens a save dialog to get the output file location
- * 2. Calls the Python script (process.py) to process the text file
+ * 2. Queues a job for the Python backend to process the text file (process.py)
  * 3. Returns the result or error message
  */
-ipcMain.handle("process-transcript", async (event, filePath, title, instruction, mode) => {
+ipcMain.handle("process-transcript", async (event, filePath, title, instruction, mode, priority = 1) => {
   const defaultFileName = `${(mode === "rag" ? title : instruction).replace(/\s+/g, "_").toLowerCase()}.jsonl`;
   const defaultSavePath = path.join(defaultSaveDirectory, defaultFileName);
   
@@ -200,7 +232,13 @@ ipcMain.handle("process-transcript", async (event, filePath, title, instruction,
   defaultSaveDirectory = path.dirname(saveDialog.filePath);
   saveDirectoryPreferences();
 
-  return runPython("process.py", [filePath, title, instruction, mode, saveDialog.filePath]);
+  return enqueueJob("process", {
+    txt_path: filePath,
+    title,
+    instruction,
+    mode,
+    output_path: saveDialog.filePath,
+  }, priority);
 });
 
 /**
@@ -211,17 +249,19 @@ ipcMain.handle("process-transcript", async (event, filePath, title, instruction,
  * - title: Title for the transcription
  * - instruction: Processing instruction
  * - mode: Processing mode
+ * - priority: Optional queue priority (higher runs first, default 0)
+ * - whisper: Optional Whisper hints ({ language, task, initial_prompt }, see transcribe.whisper_options)
  * 
- * Outputs: Result message from the Python script or error message
+ * Outputs: Result message from the Python backend or error message
  * 
  * This handler:
  * 1. Logs the received parameters
  * 2. Validates the file path
  * 3. Opens a save dialog to get the output file location
- * 4. Calls the Python script (transcribe.py) to transcribe the audio
+ * 4. Queues a job for the Python backend to transcribe the audio (transcribe.py)
  * 5. Returns the result or error message
  */
-ipcMain.handle("transcribe-audio", async (event, filePath, title, instruction, mode) => {
+ipcMain.handle("transcribe-audio", async (event, filePath, title, instruction, mode, priority = 0, whisper = {}) => {
   console.log("Received file path:", filePath);
   console.log("Title:", title);
   console.log("Instruction:", instruction);
@@ -257,13 +297,14 @@ ipcMain.handle("transcribe-audio", async (event, filePath, title, instruction, m
   let outputPath = saveDialog.filePath;
 
   try {
-    return await runPython("transcribe.py", [
-      filePath,
+    return await enqueueJob("transcribe", {
+      mp3_path: filePath,
       title,
       instruction,
       mode,
-      outputPath,
-    ]);
+      output_path: outputPath,
+      whisper,
+    }, priority);
   } catch (error) {
     console.error("Error in transcribe-audio handler:", error);
     return `Error occurred during transcription: ${error}`;
@@ -272,73 +313,560 @@ ipcMain.handle("transcribe-audio", async (event, filePath, title, instruction, m
 
 
 /**
- * Python script execution function
- * 
+ * Batch ingestion
+ *
+ * Files and folders (selected together or dropped on the window) are ingested as one action: every
+ * supported file becomes a queued job and all of them append to a single .jsonl in the default save
+ * directory, so there is no save dialog per file.
+ */
+const TEXT_EXTENSIONS = ['txt', 'srt', 'vtt', 'json'];
+const AUDIO_EXTENSIONS = ['mp3', 'wav', 'ogg', 'm4a'];
+
+// Extension of a path without the dot, lowercased
+function fileExtension(filePath) {
+  return path.extname(filePath).slice(1).toLowerCase();
+}
+
+// Expands folders (recursively, skipping hidden entries) into the supported files they contain
+function collectFiles(paths) {
+  const files = [];
+  const visit = (entryPath) => {
+    let stat;
+    try {
+      stat = fs.statSync(entryPath);
+    } catch (error) {
+      console.error(`Skipping ${entryPath}: ${error.message}`);
+      return;
+    }
+    if (stat.isDirectory()) {
+      const names = fs.readdirSync(entryPath).filter(name => !name.startsWith(".")).sort();
+      names.forEach(name => visit(path.join(entryPath, name)));
+    } else if ([...TEXT_EXTENSIONS, ...AUDIO_EXTENSIONS].includes(fileExtension(entryPath))) {
+      files.push(entryPath);
+    }
+  };
+  paths.forEach(visit);
+  return [...new Set(files)];
+}
+
+// Deepest folder that contains all the given files
+function commonDirectory(files) {
+  let common = path.dirname(files[0]).split(path.sep);
+  for (const file of files.slice(1)) {
+    const parts = path.dirname(file).split(path.sep);
+    let i = 0;
+    while (i < common.length && i < parts.length && common[i] === parts[i]) i++;
+    common = common.slice(0, i);
+  }
+  return common.join(path.sep) || path.sep;
+}
+
+let nextBatchId = 1;
+
+/**
+ * Batch ingestion handler
+ *
  * Inputs:
- * - scriptName: Name of the Python script to run
- * - args: Array of arguments to pass to the script
- * 
- * Outputs: Promise that resolves with the script's output or rejects with an error
- * 
+ * - paths: Files and/or folders to ingest
+ * - title: RAG title prefix; each memory is titled "<title>: <file>" (or just "<file>" if empty), where <file> is
+ *   the file's path below the folder all the files share, without its extension
+
+ * - instruction: SFT instruction used for every file
+ * - mode: Processing mode ("rag" or "sft")
+ * - whisper: Optional Whisper hints for the audio files (as for "transcribe-audio")
+ *
+ * Outputs: Summary message with the output path and any files that failed
+ *
+ * This handler:
+ * 1. Expands folders into the supported files they contain
+ * 2. Queues a process (.txt) or transcribe (audio) job per file, all writing to one output in the
+ *    default save directory; the jobs carry the batch id so "batch:cancel" can stop them together
+ * 3. Sends "batch:progress" events (with the batch id) as files finish and returns a summary when all are done
+ */
+ipcMain.handle("batch:ingest", async (event, paths, title, instruction, mode, whisper = {}) => {
+  const files = collectFiles(paths || []);
+  if (files.length === 0) {
+    return "No supported files found (.txt, .srt, .vtt, .json, .mp3, .wav, .ogg, .m4a).";
+  }
+
+  mode = mode || "rag";
+  const baseName = (mode === "rag" ? title : instruction) || "batch";
+  const outputPath = path.join(defaultSaveDirectory, `${baseName.replace(/\s+/g, "_").toLowerCase()}.jsonl`);
+  console.log(`Ingesting ${files.length} files into ${outputPath}`);
+
+  const batchId = nextBatchId++;
+  let done = 0;
+  let cancelled = 0;
+  const failed = [];
+  const sendProgress = () => {
+    const progress = { batchId, done, failed: failed.length, cancelled, total: files.length, outputPath };
+    BrowserWindow.getAllWindows().forEach(win => win.webContents.send("batch:progress", progress));
+  };
+  sendProgress();
+
+  // Files with the same name in different folders get different titles
+  const root = commonDirectory(files);
+  const specs = files.map(filePath => {
+    const relative = path.relative(root, filePath);
+    const name = relative.slice(0, relative.length - path.extname(relative).length).split(path.sep).join("/");
+    const params = {
+      title: title ? `${title}: ${name}` : name,
+      instruction: instruction || "Transcribe this audio",
+      mode,
+      output_path: outputPath,
+    };
+    return TEXT_EXTENSIONS.includes(fileExtension(filePath))
+      ? { method: "process", params: { txt_path: filePath, ...params }, priority: 1, batchId }
+      : { method: "transcribe", params: { mp3_path: filePath, ...params, whisper }, priority: 0, batchId };
+  });
+
+  // Queued (and saved) in one go rather than rewriting the saved queue once per file
+  await Promise.all(enqueueJobs(specs).map((job, i) => {
+    const finished = (error) => {
+      if (error === "Job cancelled") cancelled++;
+      else if (error !== undefined) failed.push(`${files[i]}: ${error}`);
+      done++;
+      sendProgress();
+    };
+    return job.then(() => finished(), error => finished(error));
+  }));
+
+  let summary = `Ingested ${files.length - failed.length - cancelled} of ${files.length} files into ${outputPath}`;
+  if (cancelled > 0) {
+    summary += ` (${cancelled} cancelled)`;
+  }
+  if (failed.length > 0) {
+    summary += `\n\nFailed:\n${failed.join("\n")}`;
+  }
+  return summary;
+});
+
+
+/**
+ * Python backend service
+ *
+ * Instead of spawning a new Python process for every action, the app starts backend/server.py once
+ * and keeps it running. The Whisper model, OpenAI client and compiled tag patterns stay loaded between
+ * jobs. Requests and responses are JSON lines over the process's stdin/stdout; every request carries an
+ * id so several jobs can be in flight and finish in any order.
+ */
+let backend = null;
+let quitting = false; // set on before-quit; no backend is started and no queued job starts after that
+let nextRequestId = 1;
+const pendingRequests = new Map(); // request id -> { method, jobId, resolve, reject }
+
+// Backend directory: next to main.js in development, in the resources folder of a packaged app
+// (forge.config.js copies backend/ there as an extra resource, since Python can't read from the asar)
+function backendDirectory() {
+  return app.isPackaged
+    ? path.join(process.resourcesPath, "backend")
+    : path.join(__dirname, "backend");
+}
+
+// Correct venv Python path based on OS
+function venvPythonPath() {
+  return process.platform === "win32"
+    ? path.join(backendDirectory(), "venv", "Scripts", "python.exe")
+    : path.join(backendDirectory(), "venv", "bin", "python3.10");
+}
+
+/**
+ * Starts the backend if it is not running
+ *
+ * Outputs: the backend child process
+ *
  * This function:
- * 1. Normalizes file paths to avoid issues on different operating systems
- * 2. Spawns a Python process from the virtual environment
- * 3. Captures stdout and stderr from the process
- * 4. Returns a promise that resolves with the output when the process completes
+ * 1. Spawns backend/server.py with the virtual environment's Python (with --profile if the app was
+ *    started with --profile, writing per-stage cProfile dumps to userData/profiles)
+ * 2. Splits stdout into JSON lines and settles the matching pending request
+ * 3. Logs stderr (everything the pipeline prints)
+ * 4. Rejects in-flight requests if the backend exits; the next call starts a fresh one
+ *
+ * Once the app is quitting no new backend is started (returns null if none is running).
  */
-function runPython(scriptName, args) {
+function startBackend() {
+  if (backend || quitting) return backend;
+
+  const backendDir = backendDirectory();
+  const venvPython = venvPythonPath();
+  const args = [path.join(backendDir, "server.py")];
+  if (app.commandLine.hasSwitch("profile")) {
+    args.push("--profile", app.commandLine.getSwitchValue("profile") || path.join(userDataPath, "profiles"));
+  }
+  console.log(`Starting Python backend: ${venvPython} ${args.join(" ")}`);
+
+  // Don't use shell: true to avoid quoting issues
+  // Per-stage timings of every job go to userData/metrics.jsonl (see backend/metrics.py) and cached
+  // transcriptions to userData/cache (see backend/cache.py)
+  const proc = spawn(venvPython, args, {
+    cwd: backendDir,
+    env: {
+      ...process.env,
+      MEMORY_FORGE_METRICS: process.env.MEMORY_FORGE_METRICS || path.join(userDataPath, "metrics.jsonl"),
+      MEMORY_FORGE_CACHE: process.env.MEMORY_FORGE_CACHE || path.join(userDataPath, "cache"),
+    },
+  });
+  backend = proc;
+
+  let buffer = "";
+  proc.stdout.on("data", data => {
+    buffer += data.toString();
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) handleBackendMessage(line);
+    }
+  });
+
+  proc.stderr.on("data", data => {
+    console.error(`Python stderr: ${data.toString()}`);
+  });
+
+  const failPending = (reason) => {
+    if (backend === proc) backend = null;
+    for (const { reject } of pendingRequests.values()) reject(reason);
+    pendingRequests.clear();
+  };
+
+  proc.on("exit", code => {
+    console.log(`Python backend exited with code: ${code}`);
+    failPending(`Python backend exited with code ${code}`);
+  });
+
+  proc.on("error", err => {
+    console.error(`Failed to start Python backend: ${err}`);
+    failPending(`Failed to start Python backend: ${err}`);
+  });
+
+  return proc;
+}
+
+// Settles the pending request a backend message belongs to, or forwards its progress event to the windows
+function handleBackendMessage(line) {
+  let message;
+  try {
+    message = JSON.parse(line);
+  } catch (error) {
+    console.log(`Python stdout: ${line}`);
+    return;
+  }
+
+  const pending = pendingRequests.get(message.id);
+
+  if (message.event) {
+    if (message.id === undefined) {
+      console.log(`Python backend event: ${message.event}`);
+    } else if (pending) {
+      const job = runningJobs.get(pending.jobId);
+      const progress = job
+        ? { ...jobFields(job), ...message.event }
+        : { id: message.id, method: pending.method, ...message.event };
+      BrowserWindow.getAllWindows().forEach(win => win.webContents.send("job:progress", progress));
+    }
+    return;
+  }
+
+  if (!pending) return;
+  pendingRequests.delete(message.id);
+  if (message.error !== undefined) pending.reject(message.error);
+  else pending.resolve(message.result);
+}
+
+/**
+ * Backend call function
+ *
+ * Inputs:
+ * - method: Backend method to run ("process", "transcribe" or "suggest_tags")
+ * - params: Object of named parameters for the method
+ * - jobId: Optional queue job the request runs (progress events are reported under this id)
+ *
+ * Outputs: Promise that resolves with the method's result or rejects with its error message
+ */
+function callBackend(method, params, jobId) {
+  // Normalize path arguments to avoid path issues (especially on Windows)
+  const normalizedParams = {};
+  for (const [key, value] of Object.entries(params)) {
+    normalizedParams[key] = key.endsWith("_path") && typeof value === "string" && (value.includes("/") || value.includes("\\"))
+      ? path.normalize(value)
+      : value;
+  }
+
+  const proc = startBackend();
+  if (!proc) return Promise.reject("The app is quitting");
+  const id = nextRequestId++;
+  console.log(`Backend request ${id}: ${method} ${JSON.stringify(normalizedParams).slice(0, 500)}`);
+
   return new Promise((resolve, reject) => {
-    const path = require("path");
-    const { spawn } = require("child_process");
-
-    // Normalize arguments to avoid path issues (especially on Windows)
-    const normalizedArgs = args.map(arg =>
-      typeof arg === "string" && (arg.includes("/") || arg.includes("\\"))
-        ? path.normalize(arg)
-        : arg
-    );
-
-    // Correct venv Python path based on OS
-    const venvPython = process.platform === "win32"
-      ? path.join(__dirname, "backend", "venv", "Scripts", "python.exe")
-      : path.join(__dirname, "backend", "venv", "bin", "python3.10");
-
-    const scriptPath = path.join(__dirname, "backend", scriptName);
-
-    console.log(`Running Python script with arguments:`);
-    console.log(`Python: ${venvPython}`);
-    console.log(`Script: ${scriptPath}`);
-    console.log(`Args: ${JSON.stringify(normalizedArgs)}`);
-
-    // Don't use shell: true to avoid quoting issues
-    const subprocess = spawn(venvPython, [scriptPath, ...normalizedArgs], {
-      cwd: path.join(__dirname, "backend"),
-    });
-
-    let output = "";
-    let errorOutput = "";
-
-    subprocess.stdout.on("data", data => {
-      const chunk = data.toString();
-      console.log(`Python stdout: ${chunk}`);
-      output += chunk;
-    });
-    
-    subprocess.stderr.on("data", data => {
-      const chunk = data.toString();
-      console.error(`Python stderr: ${chunk}`);
-      errorOutput += chunk;
-    });
-
-    subprocess.on("close", code => {
-      console.log(`Python script exited with code: ${code}`);
-      if (code === 0) resolve(output.trim());
-      else reject(errorOutput || `Script exited with code ${code}`);
-    });
-    
-    subprocess.on("error", (err) => {
-      console.error(`Failed to start subprocess: ${err}`);
-      reject(`Failed to start subprocess: ${err}`);
-    });
+    pendingRequests.set(id, { method, jobId, resolve, reject });
+    proc.stdin.write(JSON.stringify({ id, method, params: normalizedParams }) + "\n");
   });
 }
+
+/**
+ * Job queue
+ *
+ * Every process/transcribe request becomes a job. Jobs wait in a priority queue and only start when their
+ * type has a free slot, so several uploads don't fight over CPU, RAM and the Whisper model. Queued and
+ * running jobs are saved to userData. Quitting waits for the running jobs to finish; jobs still queued (or
+ * running when the app was killed) are requeued on the next start.
+ *
+ * Concurrency per job type can be overridden in userData/queue-config.json:
+ *   { "concurrency": { "transcribe": 1, "process": 2 } }
+ */
+const JOB_CONCURRENCY = { transcribe: 1, process: 2 };
+const CANCEL_GRACE_MS = 5000; // how long a cancelled job may take to stop before the backend is restarted
+const MAX_ATTEMPTS = 2; // runs of a job that keep losing the backend (e.g. it crashed) before giving up
+
+const savedJobsPath = path.join(userDataPath, "pending-jobs.json");
+const queueConfigPath = path.join(userDataPath, "queue-config.json");
+
+try {
+  if (fs.existsSync(queueConfigPath)) {
+    const queueConfig = JSON.parse(fs.readFileSync(queueConfigPath, 'utf8'));
+    Object.assign(JOB_CONCURRENCY, queueConfig.concurrency || {});
+  }
+} catch (error) {
+  console.error("Error loading queue config:", error);
+}
+
+let nextJobId = 1;
+const queuedJobs = []; // waiting jobs, highest priority first, then in submission order
+const runningJobs = new Map(); // job id -> job
+
+// Writes the queued and running jobs to userData so they survive a restart
+function saveJobs() {
+  const jobs = [...runningJobs.values(), ...queuedJobs].map(({ method, params, priority }) => ({ method, params, priority }));
+  try {
+    fs.writeFileSync(savedJobsPath, JSON.stringify(jobs, null, 2));
+  } catch (error) {
+    console.error("Error saving pending jobs:", error);
+  }
+}
+
+// Fields every progress event of a job carries: its id, method, batch (if any) and file name
+function jobFields(job) {
+  const file = job.params.txt_path || job.params.mp3_path;
+  return { id: job.id, method: job.method, batchId: job.batchId, file: file && path.basename(file) };
+}
+
+// Sends a queue state change to the windows on the same channel as backend progress events; "finished"
+// is sent when a job settles (done, failed or cancelled)
+function broadcastJob(job, stage, fields = {}) {
+  const progress = { ...jobFields(job), stage, elapsed: 0, ...fields };
+  BrowserWindow.getAllWindows().forEach(win => win.webContents.send("job:progress", progress));
+}
+
+// Inserts a job behind every job of the same or higher priority; quiet skips the "queued" event (jobs of a
+// batch, whose progress is reported per batch until they start)
+function insertJob(job, quiet = false) {
+  let index = queuedJobs.findIndex(queued => queued.priority < job.priority);
+  if (index < 0) index = queuedJobs.length;
+  queuedJobs.splice(index, 0, job);
+  if (!quiet) broadcastJob(job, "queued", { position: index + 1 });
+}
+
+/**
+ * Queues a backend job
+ *
+ * Inputs:
+ * - method: Backend method to run ("process", "transcribe" or "suggest_tags")
+ * - params: Object of named parameters for the method
+ * - priority: Higher runs first; jobs of equal priority run in submission order
+ *
+ * Outputs: Promise that resolves with the method's result or rejects with its error message
+ */
+function enqueueJob(method, params, priority = 0) {
+  return enqueueJobs([{ method, params, priority }])[0];
+}
+
+/**
+ * Queues several backend jobs at once, saving the queue once
+ *
+ * Inputs:
+ * - specs: Array of { method, params, priority, batchId } (priority defaults to 0, batchId is optional)
+ *
+ * Outputs: Array of promises, one per spec, as enqueueJob returns them
+ */
+function enqueueJobs(specs) {
+  const promises = specs.map(({ method, params, priority = 0, batchId }) => new Promise((resolve, reject) => {
+    const job = { id: nextJobId++, method, params, priority, batchId, attempts: 0, cancelled: false, resolve, reject };
+    insertJob(job, batchId !== undefined);
+  }));
+  saveJobs();
+  pumpQueue();
+  return promises;
+}
+
+// Starts queued jobs while their type has free slots
+function pumpQueue() {
+  if (quitting) return;
+  for (let i = 0; i < queuedJobs.length; ) {
+    const job = queuedJobs[i];
+    const running = [...runningJobs.values()].filter(other => other.method === job.method).length;
+    if (running < (JOB_CONCURRENCY[job.method] ?? 1)) {
+      queuedJobs.splice(i, 1);
+      runJob(job);
+    } else {
+      i++;
+    }
+  }
+}
+
+// Runs a job on the backend and settles it, or requeues it if the backend went away underneath it
+function runJob(job) {
+  const proc = startBackend();
+  job.attempts++;
+  runningJobs.set(job.id, job);
+  saveJobs();
+
+  const settle = (settleFn, value) => {
+    clearTimeout(job.cancelTimer);
+    runningJobs.delete(job.id);
+    saveJobs();
+    broadcastJob(job, "finished");
+    settleFn(value);
+    pumpQueue();
+    quitIfIdle();
+  };
+
+  callBackend(job.method, job.params, job.id).then(
+    result => settle(job.resolve, result),
+    error => {
+      const backendLost = backend !== proc;
+      if (backendLost && !job.cancelled) {
+        // A restart to stop some other cancelled job doesn't count against this one
+        if (proc.killedForCancel) job.attempts--;
+        if (job.attempts < MAX_ATTEMPTS) {
+          console.log(`Requeueing job ${job.id} after the backend stopped`);
+          clearTimeout(job.cancelTimer);
+          runningJobs.delete(job.id);
+          insertJob(job);
+          saveJobs();
+          pumpQueue();
+          quitIfIdle();
+          return;
+        }
+      }
+      settle(job.reject, job.cancelled ? "Job cancelled" : error);
+    }
+  );
+}
+
+/**
+ * Cancels a job
+ *
+ * Inputs:
+ * - id: Job id, as carried by its "job:progress" events
+ *
+ * Outputs: true if the job was queued or running, false otherwise
+ *
+ * Queued jobs are simply dropped. Running jobs are asked to stop (the backend checks at every progress
+ * report); if one is still running after CANCEL_GRACE_MS, e.g. inside Whisper, the backend is killed and
+ * restarted, and the other jobs it was running are requeued.
+ */
+function cancelJob(id) {
+  const index = queuedJobs.findIndex(job => job.id === id);
+  if (index >= 0) {
+    const [job] = queuedJobs.splice(index, 1);
+    saveJobs();
+    broadcastJob(job, "finished");
+    job.reject("Job cancelled");
+    return true;
+  }
+
+  const job = runningJobs.get(id);
+  if (!job) return false;
+  if (job.cancelled) return true;
+  job.cancelled = true;
+
+  for (const [requestId, pending] of pendingRequests) {
+    if (pending.jobId === id) {
+      callBackend("cancel", { id: requestId }).catch(() => {});
+    }
+  }
+
+  job.cancelTimer = setTimeout(() => {
+    if (runningJobs.has(id) && backend) {
+      console.log(`Job ${id} did not stop within ${CANCEL_GRACE_MS} ms, restarting the Python backend`);
+      backend.killedForCancel = true;
+      backend.kill();
+    }
+  }, CANCEL_GRACE_MS);
+  return true;
+}
+
+/**
+ * Cancels every job of a batch
+ *
+ * Inputs:
+ * - batchId: Batch id, as carried by its "batch:progress" events
+ *
+ * Outputs: true if the batch still had queued or running jobs
+ *
+ * Its queued jobs are dropped (saving the queue once) and its running jobs are cancelled as by cancelJob.
+ */
+function cancelBatch(batchId) {
+  const dropped = queuedJobs.filter(job => job.batchId === batchId);
+  if (dropped.length > 0) {
+    queuedJobs.splice(0, queuedJobs.length, ...queuedJobs.filter(job => job.batchId !== batchId));
+    saveJobs();
+    dropped.forEach(job => job.reject("Job cancelled"));
+  }
+  const running = [...runningJobs.values()].filter(job => job.batchId === batchId);
+  running.forEach(job => cancelJob(job.id));
+  return dropped.length + running.length > 0;
+}
+
+// Requeues the jobs saved when the app last quit; nobody is waiting on them, so results are only logged
+function resumeSavedJobs() {
+  let saved = [];
+  try {
+    if (fs.existsSync(savedJobsPath)) {
+      saved = JSON.parse(fs.readFileSync(savedJobsPath, 'utf8'));
+    }
+  } catch (error) {
+    console.error("Error loading pending jobs:", error);
+  }
+
+  for (const { method, params, priority } of saved) {
+    console.log(`Resuming ${method} job: ${JSON.stringify(params)}`);
+    enqueueJob(method, params, priority)
+      .then(() => console.log(`Resumed ${method} job finished: ${params.output_path}`))
+      .catch(error => console.error(`Resumed ${method} job failed: ${error}`));
+  }
+}
+
+// Tag suggestions for text being edited; bypasses the job queue since the backend only re-tags the
+// part of the text that changed since the last call with the same key
+ipcMain.handle("tags:suggest", async (event, key, text, topN = 5) =>
+  callBackend("suggest_tags", { key: String(key), text: text || "", top_n: topN }));
+
+// Job cancellation handler (id from a "job:progress" event)
+ipcMain.handle("job:cancel", async (event, id) => cancelJob(id));
+
+// Batch cancellation handler (batch id from a "batch:progress" event)
+ipcMain.handle("batch:cancel", async (event, batchId) => cancelBatch(batchId));
+
+// Quitting waits for the running jobs, so none of them is run (and written, and billed) a second time on the
+// next start; queued jobs stay saved in pending-jobs.json and are resumed then
+app.on("before-quit", event => {
+  quitting = true;
+  if (runningJobs.size > 0) {
+    console.log(`Waiting for ${runningJobs.size} running job(s) to finish before quitting`);
+    event.preventDefault();
+  }
+});
+
+// Quits once the last running job settled, if a quit was waiting for it
+function quitIfIdle() {
+  if (quitting && runningJobs.size === 0) app.quit();
+}
+
+// Stop the backend when the app quits (no job is running any more; closing stdin makes it exit)
+app.on("will-quit", () => {
+  if (backend) {
+    backend.stdin.end();
+    backend = null;
+  }
+});
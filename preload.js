@@ -1,18 +1,49 @@
-const { contextBridge, ipcRenderer } = require("electron");
+const { contextBridge, ipcRenderer, webUtils } = require("electron");
 
 // Expose specific functions from the main process to the renderer process
 // This creates a safe bridge for communication between processes
 contextBridge.exposeInMainWorld("electronAPI", {
   // Function to process a transcript file
-  // Inputs: filePath (string), title (string), instruction (string), mode (string)
+  // Inputs: filePath (string), title (string), instruction (string), mode (string), priority (optional number)
   // Output: Returns the result from the main process after processing the transcript
-  processTranscript: (filePath, title, instruction, mode) =>
-    ipcRenderer.invoke("process-transcript", filePath, title, instruction, mode),
+  processTranscript: (filePath, title, instruction, mode, priority) =>
+    ipcRenderer.invoke("process-transcript", filePath, title, instruction, mode, priority),
   
   // Function to open a file selection dialog
   // Inputs: None
   // Output: Returns the selected file path from the main process
   selectFile: () => ipcRenderer.invoke('dialog:openFile'),
+
+  // Function to open a file selection dialog that allows several files
+  // Inputs: None
+  // Output: Returns the selected file paths (empty array if canceled)
+  selectFiles: () => ipcRenderer.invoke('dialog:openFiles'),
+
+  // Function to get the path of a dropped or chosen File object (File.path no longer exists)
+  // Inputs: file (File)
+  // Output: Returns the file's path on disk
+  getPathForFile: (file) => webUtils.getPathForFile(file),
+
+  // Function to ingest several files and/or folders into one output in the default save directory
+  // Inputs: paths (array of strings), title (string), instruction (string), mode (string),
+  //   whisper (optional object: language, task, initial_prompt) used for audio files
+  // Output: Returns a summary of the batch once every file is done
+  ingestFiles: (paths, title, instruction, mode, whisper) =>
+    ipcRenderer.invoke('batch:ingest', paths, title, instruction, mode, whisper),
+
+  // Function to listen for batch progress
+  // Inputs: callback (function) called with { batchId, done, failed, cancelled, total, outputPath }
+  // Output: Returns a function that removes the listener
+  onBatchProgress: (callback) => {
+    const listener = (event, progress) => callback(progress);
+    ipcRenderer.on('batch:progress', listener);
+    return () => ipcRenderer.removeListener('batch:progress', listener);
+  },
+
+  // Function to cancel every queued and running job of a batch
+  // Inputs: batchId (number) from a batch progress event
+  // Output: Returns true if the batch still had jobs to drop or stop
+  cancelBatch: (batchId) => ipcRenderer.invoke('batch:cancel', batchId),
   
   // Function to open a file selection dialog specifically for audio files
   // Inputs: None
@@ -20,10 +51,11 @@ contextBridge.exposeInMainWorld("electronAPI", {
   selectAudioFile: () => ipcRenderer.invoke('dialog:openAudioFile'),
   
   // Function to transcribe an audio file
-  // Inputs: filePath (string), title (string), instruction (string), mode (string)
+  // Inputs: filePath (string), title (string), instruction (string), mode (string), priority (optional number),
+  //   whisper (optional object: language, task, initial_prompt)
   // Output: Returns the transcription result from the main process
-  transcribeAudio: (filePath, title, instruction, mode) => 
-    ipcRenderer.invoke('transcribe-audio', filePath, title, instruction, mode),
+  transcribeAudio: (filePath, title, instruction, mode, priority, whisper) => 
+    ipcRenderer.invoke('transcribe-audio', filePath, title, instruction, mode, priority, whisper),
     
   // Function to set default directories for file operations
   // Inputs: None
@@ -33,5 +65,25 @@ contextBridge.exposeInMainWorld("electronAPI", {
   // Function to get current default directories
   // Inputs: None
   // Output: Returns the current directory settings
-  getDefaultDirectories: () => ipcRenderer.invoke('settings:getDefaultDirectories')
+  getDefaultDirectories: () => ipcRenderer.invoke('settings:getDefaultDirectories'),
+
+  // Function to listen for progress of running jobs
+  // Inputs: callback (function) called with { id, method, batchId, file, stage, percent, elapsed, eta, ... };
+  //   stage is "queued" while the job waits and "finished" once it is done, failed or cancelled
+  // Output: Returns a function that removes the listener
+  onProgress: (callback) => {
+    const listener = (event, progress) => callback(progress);
+    ipcRenderer.on('job:progress', listener);
+    return () => ipcRenderer.removeListener('job:progress', listener);
+  },
+
+  // Function to cancel a queued or running job
+  // Inputs: id (number) job id from a progress event
+  // Output: Returns true if the job was found and dropped or asked to stop
+  cancelJob: (id) => ipcRenderer.invoke('job:cancel', id),
+
+  // Function to get tag suggestions for a text while it is being edited
+  // Inputs: key (string) identifies the text across calls, text (string) its current contents, topN (number)
+  // Output: Returns a promise resolving to the list of suggested tags
+  suggestTags: (key, text, topN) => ipcRenderer.invoke('tags:suggest', key, text, topN)
 });